@@ -0,0 +1,337 @@
+"""Benchmarks of the server and player hot paths.
+
+With the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_server.py --output bench.json
+    python benchmarks/bench_server.py --compare bench.json
+
+Results are written as JSON so runs of different commits can be compared.
+With ``--compare``, benchmarks slower than the baseline by more than
+``--threshold`` are listed and the script exits with status 1. The default
+sizes take under a minute; ``--quick`` takes seconds, and larger runs can be
+asked for with ``--players`` and ``--repeat``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional, List, Dict, Callable, TextIO, Any
+
+from spade.message import Message
+
+from spade_game import Server, Player
+from spade_game.codec import get_codec
+
+SERVER_JID = "server@localhost"
+
+
+class BenchServer(Server):
+    """Real-time game where every player moves and sees a shared map."""
+
+    def __init__(self, num_players: int, state_size: int, update_mode: str) -> None:
+        self.update_mode = update_mode
+        super().__init__(
+            SERVER_JID,
+            "password",
+            num_players,
+            {"map": list(range(state_size))},
+            {"name": None, "position": [0, 0], "map": []},
+            ["dx", "dy"],
+        )
+        self._tick = 0
+
+    def step(self) -> None:
+        self._tick += 1
+        world_map = self.world_model["map"]
+        world_map[self._tick % len(world_map)] = self._tick
+        for player in self.world_model["players"]:
+            action = player.action
+            if action is not None:
+                position = player["position"]
+                player["position"] = [
+                    position[0] + action["dx"],
+                    position[1] + action["dy"],
+                ]
+            # players see the map itself, not a copy
+            player["map"] = world_map
+
+    def end_condition(self) -> bool:
+        return False
+
+
+def player_jid(index: int) -> str:
+    return "player_{}@localhost".format(index)
+
+
+def message(sender: str, body: Dict[str, Any], codec_name: str = "json") -> Message:
+    return Message(
+        to=SERVER_JID,
+        sender=sender,
+        body=get_codec(codec_name).encode(body),
+        metadata={"performative": "inform", "codec": codec_name},
+    )
+
+
+def connected_server(
+    num_players: int, state_size: int = 16, update_mode: str = "full"
+) -> BenchServer:
+    server = BenchServer(num_players, state_size, update_mode)
+    for index in range(num_players):
+        server._process_connection(player_jid(index), {"name": str(index)})
+    server.run_steps_init()
+    return server
+
+
+def measure(function: Callable[[], Any], repeat: int, number: int) -> List[float]:
+    # seconds per call, one sample per repetition
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def result(name: str, params: Dict[str, Any], samples: List[float]) -> Dict[str, Any]:
+    samples = sorted(samples)
+    return {
+        "name": name,
+        "params": params,
+        "mean": statistics.mean(samples),
+        "min": samples[0],
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+        "ops_per_sec": 1 / statistics.mean(samples),
+    }
+
+
+def bench_server_decode(players: int, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    server = connected_server(players)
+    action = message(player_jid(0), {"type": "action", "info": {"dx": 1, "dy": 0}})
+    results.append(
+        result(
+            "server.decode_message[action]",
+            {"players": players},
+            measure(lambda: server.decode_message(action), repeat, 1000),
+        )
+    )
+
+    def connect_and_disconnect():
+        server.running_steps = False
+        server._process_connection("new@localhost", {"name": "new"})
+        server._process_disconnection("new@localhost")
+
+    results.append(
+        result(
+            "server._process_connection",
+            {"players": players},
+            measure(connect_and_disconnect, repeat, 200),
+        )
+    )
+    server.running_steps = True
+    results.append(
+        result(
+            "server._process_action",
+            {"players": players},
+            measure(
+                lambda: server._process_action(player_jid(0), {"dx": 1, "dy": 0}),
+                repeat,
+                1000,
+            ),
+        )
+    )
+    last_jid = player_jid(players - 1)
+    results.append(
+        result(
+            "server._find_player",
+            {"players": players},
+            measure(lambda: server._find_player(last_jid), repeat, 10000),
+        )
+    )
+    return results
+
+
+def bench_update_payload(
+    players: int, state_size: int, update_mode: str, repeat: int
+) -> Dict[str, Any]:
+    server = connected_server(players, state_size, update_mode)
+    player = server._find_player(player_jid(0))
+    server._update_message(player)  # first update is always a keyframe
+
+    def build():
+        server.step()
+        server._update_message(player)
+
+    return result(
+        "server._update_message",
+        {"state_size": state_size, "update_mode": update_mode},
+        measure(build, repeat, 100),
+    )
+
+
+def bench_player_decode(state_size: int, repeat: int) -> Dict[str, Any]:
+    player = Player(player_jid(0), "password", SERVER_JID)
+    update = message(
+        SERVER_JID,
+        {
+            "type": "update",
+            "info": {"position": [0, 0], "map": list(range(state_size))},
+        },
+    )
+    loop = asyncio.new_event_loop()
+
+    def decode():
+        loop.run_until_complete(player.decode_message(update))
+
+    try:
+        return result(
+            "player.decode_message",
+            {"state_size": state_size},
+            measure(decode, repeat, 100),
+        )
+    finally:
+        loop.close()
+
+
+def bench_tick(
+    players: int, state_size: int, update_mode: str, repeat: int
+) -> List[Dict[str, Any]]:
+    # one tick: every player acts, the server ingests, steps and builds the
+    # updates, and every player decodes its update
+    server = connected_server(players, state_size, update_mode)
+    codec = get_codec("json")
+    actions = [
+        message(player_jid(index), {"type": "action", "info": {"dx": 1, "dy": 1}})
+        for index in range(players)
+    ]
+    latencies = []
+
+    def tick():
+        start = time.perf_counter()
+        server.ingest(actions)
+        server.on_step_start()
+        server.step()
+        server.on_step_end()
+        for update in server._update_messages(server.can_receive_update):
+            codec.decode(update.body)
+            latencies.append(time.perf_counter() - start)
+
+    tick()  # first updates are keyframes
+    latencies.clear()
+    samples = measure(tick, repeat, 1)
+    params = {"players": players, "state_size": state_size, "update_mode": update_mode}
+    return [
+        result("tick", params, samples),
+        result("action_to_update_latency", params, latencies),
+    ]
+
+
+def run(sizes: List[int], state_sizes: List[int], repeat: int) -> Dict[str, Any]:
+    # what the server prints while it is measured must not end in the JSON
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = _run(sizes, state_sizes, repeat)
+    return {"meta": meta(), "results": results}
+
+
+def _run(sizes: List[int], state_sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for players in sizes:
+        results.extend(bench_server_decode(players, repeat))
+    for state_size in state_sizes:
+        for update_mode in ("full", "delta"):
+            results.append(bench_update_payload(2, state_size, update_mode, repeat))
+        results.append(bench_player_decode(state_size, repeat))
+    for players in sizes:
+        for state_size in state_sizes:
+            for update_mode in ("full", "delta"):
+                results.extend(bench_tick(players, state_size, update_mode, repeat))
+    return results
+
+
+def meta() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def key(entry: Dict[str, Any]) -> str:
+    return "{} {}".format(entry["name"], json.dumps(entry["params"], sort_keys=True))
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    file: TextIO = sys.stdout,
+) -> List[str]:
+    baseline_results = {key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        old = baseline_results.get(key(entry))
+        if old is None:
+            continue
+        ratio = entry["p50"] / old["p50"]
+        line = "{:<90} {:>8.3f}x".format(key(entry), ratio)
+        print(line, file=file)
+        if ratio > 1 + threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[2, 100, 1000])
+    parser.add_argument("--state-sizes", type=int, nargs="+", default=[16, 4096])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--compare", help="results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.players = [2, 100]
+        args.state_sizes = [16]
+        args.repeat = 5
+
+    current = run(args.players, args.state_sizes, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        # the report must not end in the JSON written to stdout
+        report = sys.stdout if args.output else sys.stderr
+        regressions = compare(current, baseline, args.threshold, report)
+        if regressions:
+            print("Regressions:", file=report)
+            print("\n".join(regressions), file=report)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
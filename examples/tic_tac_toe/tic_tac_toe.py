@@ -1,12 +1,23 @@
 import random
+import sys
 import numpy as np
 from typing import Union, Any, Dict, List
 
 import spade
-from spade_game import TurnBasedServer, Player
+from spade_game import TurnBasedServer, Player, LocalTransport
+from spade_game.schema import TupleSchema, Field
 
 
 class GameServer(TurnBasedServer):
+    # players only receive the board cells that changed
+    update_mode = "delta"
+
+    # a turn ends as soon as the player marks a cell
+    event_driven_turns = True
+
+    # actions are the [row, column] of a cell
+    action_schema = TupleSchema([Field(int, 0, 2), Field(int, 0, 2)])
+
     def __init__(
         self,
         jid: str,
@@ -29,6 +40,7 @@ class GameServer(TurnBasedServer):
         )
         self.counter = 0
         self.world_model["game_state"] = np.zeros((3, 3)).tolist()
+        self.winner = None
 
     def step(self) -> None:
         last_action_player_jid = self.world_model["_last_action_player"]
@@ -56,11 +68,8 @@ class GameServer(TurnBasedServer):
                 or np.trace(game_state) == 3
                 or np.trace(np.fliplr(game_state)) == 3
             ):
-                print(
-                    "[{}] Player {} won!".format(
-                        str(self.jid), self._find_player_by_type(+1)["jid"]
-                    )
-                )
+                self.winner = self._find_player_by_type(+1)["jid"]
+                print("[{}] Player {} won!".format(str(self.jid), self.winner))
                 return True
             if (
                 -3 in np.sum(game_state, axis=0)
@@ -68,22 +77,21 @@ class GameServer(TurnBasedServer):
                 or np.trace(game_state) == -3
                 or np.trace(np.fliplr(game_state)) == -3
             ):
-                print(
-                    "[{}] Player {} won!".format(
-                        str(self.jid), self._find_player_by_type(-1)["jid"]
-                    )
-                )
+                self.winner = self._find_player_by_type(-1)["jid"]
+                print("[{}] Player {} won!".format(str(self.jid), self.winner))
                 return True
             return False
         else:
             print("[{}] The game ended in a draw!".format(str(self.jid)))
             return True
 
+    def game_result(self) -> Union[str, None]:
+        # jid of the winner, None for a draw
+        return self.winner
+
     def _is_action_valid(self, content: list) -> bool:
-        is_tuple = isinstance(content, list)
-        size_is_valid = len(content) == 2
-        value_is_valid = self.world_model["game_state"][content[0]][content[1]] == 0
-        return is_tuple and size_is_valid and value_is_valid
+        # the action schema already checked the form of the action
+        return self.world_model["game_state"][content[0]][content[1]] == 0
 
     def _find_player_by_type(self, type_: int) -> Union[Dict[str, Any], None]:
         for player in self.world_model["players"]:
@@ -105,7 +113,10 @@ class GamePlayer(Player):
         print(self.action)
 
 
-async def main():
+async def main(local: bool = False):
+    # with a local transport the game runs without an XMPP server
+    transport = LocalTransport() if local else None
+
     server = GameServer(
         "exec_0@localhost",
         "caio123",
@@ -113,18 +124,21 @@ async def main():
         {},
         {"type": None, "state": np.zeros((3, 3)).tolist()},
     )
-    await server.start()
+    await server.start(transport=transport)
 
     player_1 = GamePlayer(
         "exec_1@localhost", "caio123", "exec_0@localhost", {"type": 1}
     )
-    await player_1.start()
+    await player_1.start(transport=transport)
 
     player_2 = GamePlayer(
         "exec_2@localhost", "caio123", "exec_0@localhost", {"type": -1}
     )
-    await player_2.start()
+    await player_2.start(transport=transport)
+
+    if local:
+        await spade.wait_until_finished([server, player_1, player_2])
 
 
 if __name__ == "__main__":
-    spade.run(main())
+    spade.run(main(local="--local" in sys.argv))
@@ -38,6 +38,7 @@ setup(
     ],
     description="Plugin for SPADE 3 MAS platform to implement games.",
     install_requires=requirements,
+    extras_require={"msgpack": ["msgpack"]},
     license="MIT License v3",
     # long_description=readme + '\n\n' + history, # TO-DO
     include_package_data=True,
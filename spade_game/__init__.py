@@ -7,4 +7,21 @@ __email__ = 'csbc326@gmail.com'
 __version__ = '0.0.1'
 
 from .player import Player
-from .server import Server, TurnBasedServer
\ No newline at end of file
+from .server import Server, TurnBasedServer
+from .registry import PlayerRecord, PlayerRegistry
+from .codec import Codec, JSONCodec, MsgPackCodec, register_codec, get_codec
+from .transport import GameAgent, LocalTransport
+from .rooms import RoomServer
+from .tournament import Tournament, TournamentReport, GameResult, play_game
+from .metrics import Metrics, MetricsHTTPServer
+from .columnar import ColumnarPlayerRecord, ColumnarPlayerRegistry
+from .interest import SpatialGrid
+from .schema import Schema, TupleSchema, Field
+from .replay import ReplayRecorder, ReplayReader, Replay
+from .checkpoint import CheckpointStore, Checkpointer
+from .turns import TurnOrder, RoundRobinTurnOrder, InitiativeTurnOrder
+from .cache import DecisionCache, shared_cache
+from .pool import PlayerPool
+from .stepping import StepView
+from .clock import Clock, SystemClock, VirtualClock
+from .shared import SharedSection
@@ -0,0 +1,121 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Any
+
+from .codec import _to_builtin
+
+_encoder = json.JSONEncoder(
+    separators=(",", ":"), sort_keys=True, default=_to_builtin, ensure_ascii=False
+)
+
+
+class DecisionCache:
+    """LRU cache of the actions decided for each state.
+
+    States are keyed by a hash of their canonical JSON, so equal states get
+    the same key whatever their key order. The least recently used entries
+    are evicted past ``max_size``. With a ``path``, the cache is loaded from
+    that file when it exists, and ``save`` writes it back (at exit too, with
+    ``autosave``). The cache can be used from decision threads.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100000,
+        path: Optional[str] = None,
+        autosave: bool = False,
+    ) -> None:
+        self.max_size = max_size
+        self.path = path
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+        if autosave:
+            atexit.register(self.save)
+
+    @staticmethod
+    def key(state: Any) -> str:
+        data = _encoder.encode(state).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        # (found, action): actions can be None, so a miss is told apart
+        with self._lock:
+            try:
+                action = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, action
+
+    def put(self, key: str, action: Any) -> None:
+        with self._lock:
+            self._entries[key] = action
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save the decision cache to.")
+        with self._lock:
+            # least recently used first, so loading keeps the LRU order
+            data = {"version": 1, "entries": list(self._entries.items())}
+        # write aside and rename, so a crash does not leave half a file
+        temporary_path = "{}.tmp".format(path)
+        with open(temporary_path, "w") as file:
+            json.dump(data, file, separators=(",", ":"), default=_to_builtin)
+        os.replace(temporary_path, path)
+
+    def load(self, path: Optional[str] = None) -> None:
+        with open(path or self.path) as file:
+            data = json.load(file)
+        for key, action in data["entries"]:
+            self.put(key, action)
+
+
+_caches: Dict[str, DecisionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def shared_cache(name: str = "default", **kwargs: Any) -> DecisionCache:
+    # cache shared by every player of the process that asks for `name`. The
+    # arguments are those of DecisionCache, used when the cache is created.
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = DecisionCache(**kwargs)
+        return cache
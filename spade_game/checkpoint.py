@@ -0,0 +1,166 @@
+import json
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Iterable, Any
+
+from .codec import _to_builtin
+from .delta import apply_patch, is_empty
+from .tracking import apply_changes
+
+
+class CheckpointStore:
+    """Append-only SQLite log of a game state.
+
+    The log holds a full snapshot followed by the delta patches written
+    after it. Compaction writes a new snapshot and drops the rows before it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoint_log ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "tick INTEGER NOT NULL, "
+            "kind TEXT NOT NULL, "
+            "data TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def append_delta(self, tick: int, patch: str) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO checkpoint_log (tick, kind, data) VALUES (?, 'delta', ?)",
+                (tick, patch),
+            )
+
+    def compact(self, tick: int, state: str) -> None:
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO checkpoint_log (tick, kind, data) "
+                "VALUES (?, 'snapshot', ?)",
+                (tick, state),
+            )
+            self._connection.execute(
+                "DELETE FROM checkpoint_log WHERE id < ?", (cursor.lastrowid,)
+            )
+
+    def clear(self) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM checkpoint_log")
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        # last snapshot with its deltas applied, None when there is none
+        row = self._connection.execute(
+            "SELECT id, data FROM checkpoint_log WHERE kind = 'snapshot' "
+            "ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        snapshot_id, data = row
+        state = json.loads(data)
+        for (patch,) in self._connection.execute(
+            "SELECT data FROM checkpoint_log WHERE kind = 'delta' AND id > ? "
+            "ORDER BY id",
+            (snapshot_id,),
+        ):
+            state = apply_patch(state, json.loads(patch))
+        return state
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class Checkpointer:
+    """Writes the checkpoints of a game to a ``CheckpointStore`` from a worker
+    thread.
+
+    ``checkpoint`` only encodes what it is given on the calling thread:
+    callers can pass the players that changed since the previous checkpoint
+    instead of all of them. Merging, diffing and writing happen on the
+    worker, one checkpoint at a time and in order. Every ``compact_interval``
+    checkpoints, a full snapshot replaces the log (see ``compaction_due``).
+    """
+
+    def __init__(self, path: str, compact_interval: int = 100) -> None:
+        self.path = path
+        self.compact_interval = compact_interval
+        self.closed = False
+        self._encoder = json.JSONEncoder(
+            separators=(",", ":"), default=_to_builtin, ensure_ascii=False
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="checkpoint"
+        )
+        self._count = 0
+        # only used from the worker thread
+        self._store = None
+        self._state = None
+
+    @property
+    def compaction_due(self) -> bool:
+        # whether the next checkpoint is a full snapshot, which needs every
+        # player
+        return self._count % self.compact_interval == 0
+
+    def checkpoint(
+        self,
+        tick: int,
+        state: Dict[str, Any],
+        players: Optional[Dict[str, Any]] = None,
+        removed: Iterable[str] = (),
+    ) -> Future:
+        # `state` is the whole game state, with its players by jid under
+        # "players". With `players`, it is the state without its players,
+        # `players` holds the players that changed since the previous
+        # checkpoint and `removed` the jids of those that left.
+        compact = self.compaction_due
+        self._count += 1
+        if players is None:
+            data = self._encoder.encode([state, None, None])
+        else:
+            data = self._encoder.encode([state, players, list(removed)])
+        future = self._executor.submit(self._write, tick, data, compact)
+        future.add_done_callback(self._report)
+        return future
+
+    def close(self, finished: bool = False) -> Future:
+        # a finished game leaves no checkpoint to restore. Pending writes are
+        # still done, but this does not wait for them.
+        self.closed = True
+        future = self._executor.submit(self._close, finished)
+        future.add_done_callback(self._report)
+        self._executor.shutdown(wait=False)
+        return future
+
+    def _write(self, tick: int, data: str, compact: bool) -> None:
+        if self._store is None:
+            self._store = CheckpointStore(self.path)
+        world, players, removed = json.loads(data)
+        if players is None:
+            players = world.pop("players")
+            removed = [] if self._state is None else self._state["players"].keys()
+            removed = [jid for jid in removed if jid not in players]
+        state, patch = apply_changes(self._state, world, players, removed)
+        if compact or self._state is None:
+            self._store.compact(tick, json.dumps(state, separators=(",", ":")))
+        elif not is_empty(patch):
+            self._store.append_delta(tick, json.dumps(patch, separators=(",", ":")))
+        self._state = state
+
+    def _close(self, finished: bool) -> None:
+        if finished:
+            if self._store is None:
+                self._store = CheckpointStore(self.path)
+            self._store.clear()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    @staticmethod
+    def _report(future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            print("[checkpoint] Could not write checkpoint: {}".format(error))
@@ -0,0 +1,59 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+
+class Clock(ABC):
+    """Time source of a server: ``monotonic`` for tick and turn timing, and
+    ``now`` for the timestamps stored in the world model."""
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        raise NotImplementedError("Subclasses must implement this.")
+
+    @abstractmethod
+    def now(self) -> datetime:
+        raise NotImplementedError("Subclasses must implement this.")
+
+
+class SystemClock(Clock):
+    """Wall time."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class VirtualClock(Clock):
+    """Clock that only moves when it is advanced.
+
+    Time starts at ``start`` seconds, and ``now`` counts from ``epoch``, so
+    the timestamps are the same on every run. Timestamps taken at the same
+    time are a microsecond apart, in the order they were taken.
+    """
+
+    def __init__(
+        self, start: float = 0.0, epoch: datetime = datetime(2000, 1, 1)
+    ) -> None:
+        self.time = start
+        self.epoch = epoch
+        self._last_now = None
+
+    def monotonic(self) -> float:
+        return self.time
+
+    def now(self) -> datetime:
+        now = self.epoch + timedelta(seconds=self.time)
+        if self._last_now is not None and now <= self._last_now:
+            now = self._last_now + timedelta(microseconds=1)
+        self._last_now = now
+        return now
+
+    def advance(self, seconds: float) -> None:
+        self.time += seconds
+
+    def advance_to(self, time: float) -> None:
+        # time never goes back
+        self.time = max(self.time, time)
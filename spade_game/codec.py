@@ -0,0 +1,134 @@
+import base64
+import json
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any
+
+from .exceptions import UnknownCodecError
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional
+    msgpack = None
+
+
+def _to_builtin(obj: Any) -> Any:
+    # NumPy arrays and scalars (or anything alike) are sent as plain values
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError("Object of type {} can not be encoded.".format(type(obj).__name__))
+
+
+class Codec(ABC):
+    """Encoding of message bodies. Bodies are always text, so they can be
+    carried by XMPP messages."""
+
+    name = None
+
+    @abstractmethod
+    def encode(self, content: Any) -> str:
+        raise NotImplementedError("Subclasses must implement this.")
+
+    @abstractmethod
+    def decode(self, body: str) -> Any:
+        raise NotImplementedError("Subclasses must implement this.")
+
+    def encode_part(self, content: Any) -> Any:
+        # `content` encoded once, to be spliced into many bodies
+        return content
+
+    def splice(self, body: Dict[str, Any], key: str, part: Any) -> str:
+        # encodes `body` with `key` set to the content `part` was encoded from.
+        # Codecs that can not splice encoded parts encode the whole body.
+        content = dict(body)
+        content[key] = part
+        return self.encode(content)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Codec":
+        # codecs are shared: copies of the world model keep the same ones
+        return self
+
+    def __reduce__(self):
+        # registered codecs are sent to worker processes by name
+        return get_codec, (self.name,)
+
+
+class JSONCodec(Codec):
+    name = "json"
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(
+            separators=(",", ":"), default=_to_builtin, ensure_ascii=False
+        )
+        self._decoder = json.JSONDecoder()
+
+    def encode(self, content: Any) -> str:
+        return self._encoder.encode(content)
+
+    def decode(self, body: str) -> Any:
+        return self._decoder.decode(body)
+
+    def encode_part(self, content: Any) -> str:
+        return self._encoder.encode(content)
+
+    def splice(self, body: Dict[str, Any], key: str, part: str) -> str:
+        # the body is a non-empty object: the part goes before its last brace
+        encoded = self._encoder.encode(body)
+        return "{},{}:{}}}".format(encoded[:-1], self._encoder.encode(key), part)
+
+
+class MsgPackCodec(Codec):
+    """msgpack wrapped in base64. Requires the ``msgpack`` package."""
+
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError("MsgPackCodec requires the 'msgpack' package.")
+        self._packer = msgpack.Packer(default=_to_builtin, use_bin_type=True)
+
+    def encode(self, content: Any) -> str:
+        return base64.b64encode(self._packer.pack(content)).decode("ascii")
+
+    def decode(self, body: str) -> Any:
+        return msgpack.unpackb(base64.b64decode(body), raw=False, strict_map_key=False)
+
+    def encode_part(self, content: Any) -> bytes:
+        return self._packer.pack(content)
+
+    def splice(self, body: Dict[str, Any], key: str, part: bytes) -> str:
+        packer = self._packer
+        chunks = [packer.pack_map_header(len(body) + 1)]
+        for item_key, value in body.items():
+            chunks.append(packer.pack(item_key))
+            chunks.append(packer.pack(value))
+        chunks.append(packer.pack(key))
+        chunks.append(part)
+        return base64.b64encode(b"".join(chunks)).decode("ascii")
+
+
+_codecs: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    _codecs[codec.name] = codec
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return _codecs[name]
+    except KeyError:
+        raise UnknownCodecError(name) from None
+
+
+def available_codecs() -> List[str]:
+    return list(_codecs.keys())
+
+
+# codec used when nothing was negotiated
+DEFAULT_CODEC = "json"
+
+register_codec(JSONCodec())
+if msgpack is not None:
+    register_codec(MsgPackCodec())
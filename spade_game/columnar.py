@@ -0,0 +1,222 @@
+from datetime import datetime
+from typing import Optional, Union, List, Dict, Tuple, Iterator, Any
+
+from .registry import PlayerRecord, PlayerRegistry
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+
+class ColumnarPlayerRecord(PlayerRecord):
+    """Player record whose numeric attributes live in the columns of a
+    ``ColumnarPlayerRegistry``, at row ``slot``.
+
+    Reading a scalar column gives a Python value, reading a vector column
+    gives a view on the registry array (see also ``view``). A record that is
+    not in a registry keeps every attribute in its own dict.
+    """
+
+    __slots__ = ("_registry", "slot")
+
+    def __init__(
+        self,
+        jid: str,
+        attributes: Dict[str, Any],
+        action: Any = None,
+        action_datetime: Optional[datetime] = None,
+    ) -> None:
+        super().__init__(jid, attributes, action, action_datetime)
+        self._registry = None
+        self.slot = None
+
+    def _column(self, key: str) -> Any:
+        if self._registry is None:
+            return None
+        return self._registry.columns.get(key)
+
+    def __getitem__(self, key: str) -> Any:
+        column = self._column(key)
+        if column is None:
+            return super().__getitem__(key)
+        value = column[self.slot]
+        return value.item() if value.ndim == 0 else value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        column = self._column(key)
+        if column is None:
+            return super().peek(key, default)
+        value = column[self.slot]
+        return value.item() if value.ndim == 0 else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        column = self._column(key)
+        if column is None:
+            super().__setitem__(key, value)
+        else:
+            column[self.slot] = value
+
+    def __delitem__(self, key: str) -> None:
+        if self._column(key) is not None:
+            raise KeyError("Column '{}' can not be removed from a player.".format(key))
+        super().__delitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self._column(key) is not None or super().__contains__(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.attributes
+        if self._registry is not None:
+            yield from self._registry.columns
+        yield from PlayerRecord._FIELDS
+
+    def __len__(self) -> int:
+        columns = len(self._registry.columns) if self._registry is not None else 0
+        return super().__len__() + columns
+
+    def view(self, key: str) -> Any:
+        # zero-copy view on the row of the player in a column
+        return self._registry.columns[key][self.slot]
+
+    def _column_values(self) -> Dict[str, Any]:
+        if self._registry is None:
+            return {}
+        return {
+            name: column[self.slot].tolist()
+            for name, column in self._registry.columns.items()
+        }
+
+    def copy(self) -> Dict[str, Any]:
+        data = self.attributes.copy()
+        data.update(self._column_values())
+        data["jid"] = self.jid
+        data["action"] = self.action
+        data["_action_datetime"] = self._action_datetime
+        return data
+
+    def public_data(self) -> Dict[str, Any]:
+        # columns are converted to plain values, as the codecs would do
+        data = {
+            key: value
+            for key, value in self.attributes.items()
+            if not key.startswith("_")
+        }
+        data.update(
+            (key, value)
+            for key, value in self._column_values().items()
+            if not key.startswith("_")
+        )
+        data["action"] = self.action
+        return data
+
+    def _attach(self, registry: "ColumnarPlayerRegistry", slot: int) -> None:
+        self._registry = registry
+        self.slot = slot
+        for name, column in registry.columns.items():
+            if name in self.attributes:
+                column[slot] = self.attributes.pop(name)
+
+    def _detach(self) -> None:
+        self.attributes.update(self._column_values())
+        self._registry = None
+        self.slot = None
+
+
+class ColumnarPlayerRegistry(PlayerRegistry):
+    """Player registry keeping numeric attributes in NumPy arrays.
+
+    Row ``i`` of every column belongs to the player in slot ``i``. Slots are
+    kept contiguous, so ``column(name)`` is a view over the players in slot
+    order, ready for vectorized updates::
+
+        positions = players.column("position")
+        positions += players.column("velocity") * dt
+
+    Column views are invalidated when players join or leave. Requires the
+    ``numpy`` package.
+    """
+
+    __slots__ = ("columns", "size", "capacity", "_slots")
+
+    def __init__(
+        self, columns: Dict[str, Tuple[Any, Tuple[int, ...]]], capacity: int = 16
+    ) -> None:
+        if np is None:
+            raise ImportError("ColumnarPlayerRegistry requires the 'numpy' package.")
+        super().__init__()
+        self.size = 0
+        self.capacity = max(1, capacity)
+        self.columns: Dict[str, "np.ndarray"] = {
+            name: np.zeros((self.capacity,) + tuple(shape), dtype=dtype)
+            for name, (dtype, shape) in columns.items()
+        }
+        self._slots: List[ColumnarPlayerRecord] = []
+
+    @classmethod
+    def from_attributes(
+        cls, player_attributes: Dict[str, Any], capacity: int = 16
+    ) -> "ColumnarPlayerRegistry":
+        # numeric defaults (numbers, nested lists of numbers, arrays) become
+        # columns. Attributes received on connection stay in the records.
+        if np is None:
+            raise ImportError("ColumnarPlayerRegistry requires the 'numpy' package.")
+        columns = {}
+        for name, value in player_attributes.items():
+            if value is None or isinstance(value, str):
+                continue
+            try:
+                array = np.asarray(value)
+            except ValueError:  # ragged lists
+                continue
+            if array.dtype.kind in "biuf":
+                columns[name] = (array.dtype, array.shape)
+        return cls(columns, capacity)
+
+    def new_record(
+        self,
+        jid: str,
+        attributes: Dict[str, Any],
+        action_datetime: Optional[datetime] = None,
+    ) -> ColumnarPlayerRecord:
+        return ColumnarPlayerRecord(jid, attributes, action_datetime=action_datetime)
+
+    def append(self, player: PlayerRecord) -> None:
+        if not isinstance(player, ColumnarPlayerRecord):
+            raise TypeError("Columnar registries only hold columnar player records.")
+        super().append(player)
+        if self.size == self.capacity:
+            self._grow()
+        player._attach(self, self.size)
+        self._slots.append(player)
+        self.size += 1
+
+    def remove(self, player: Union[str, PlayerRecord]) -> None:
+        player_jid = player.jid if isinstance(player, PlayerRecord) else player
+        record = self.get(player_jid)
+        super().remove(player_jid)
+
+        slot, last = record.slot, self.size - 1
+        record._detach()
+        if slot != last:
+            # keep slots contiguous: the last player takes the free slot
+            moved = self._slots[last]
+            for column in self.columns.values():
+                column[slot] = column[last]
+            self._slots[slot] = moved
+            moved.slot = slot
+        self._slots.pop()
+        self.size -= 1
+
+    def column(self, name: str) -> "np.ndarray":
+        return self.columns[name][: self.size]
+
+    def by_slot(self) -> List[ColumnarPlayerRecord]:
+        return list(self._slots)
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros((self.capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            self.columns[name] = grown
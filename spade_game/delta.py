@@ -0,0 +1,178 @@
+import copy
+from typing import Optional, Union, List, Dict, Tuple, Any
+
+# A patch is {"set": [[path, value], ...], "del": [path, ...]}, where a path
+# is the list of dict keys and list indices leading to the changed value.
+# An empty path replaces the whole state.
+Patch = Dict[str, List[Any]]
+
+# values that are never changed in place: containers holding only these are
+# copied and diffed without going through each of their values
+_ATOMS = frozenset((type(None), bool, int, float, complex, str, bytes))
+# length of the slices flat lists are compared by
+_SLICE = 64
+
+
+class DiffCache:
+    """Copies and diffs shared by the updates of a round.
+
+    Players often see the same objects, e.g. a map that every player record
+    references. Within a round, such an object is copied once, and diffed
+    once against the previous copy, however many players see it. The objects
+    must not change while the cache is in use.
+    """
+
+    # containers smaller than this are diffed again rather than looked up
+    min_size = 32
+
+    def __init__(self) -> None:
+        # deepcopy memo, which also keeps the copied objects alive
+        self.copies: Dict[int, Any] = {}
+        # (id(old), id(new)) -> (patch relative to the container, old, new)
+        self.diffs: Dict[Tuple[int, int], Tuple[Patch, Any, Any]] = {}
+
+    def copy(self, value: Any) -> Any:
+        return _copy(value, self.copies)
+
+
+def _is_flat(container: Union[Dict[Any, Any], List[Any]]) -> bool:
+    values = container.values() if type(container) is dict else container
+    return _ATOMS.issuperset(map(type, values))
+
+
+def _copy(value: Any, memo: Dict[int, Any]) -> Any:
+    # deepcopy, with flat lists and dicts copied in one go
+    value_type = type(value)
+    if value_type in _ATOMS:
+        return value
+    if value_type is not list and value_type is not dict:
+        return copy.deepcopy(value, memo)
+    key = id(value)
+    if key in memo:
+        return memo[key]
+    if _is_flat(value):
+        result = value.copy()
+    elif value_type is list:
+        result = [_copy(item, memo) for item in value]
+    else:
+        result = {name: _copy(item, memo) for name, item in value.items()}
+    memo[key] = result
+    # as deepcopy does, keep the original alive so that its id is not reused
+    memo.setdefault(id(memo), []).append(value)
+    return result
+
+
+def diff(old: Any, new: Any, cache: Optional[DiffCache] = None) -> Patch:
+    patch = {"set": [], "del": []}
+    _diff(old, new, (), patch, cache)
+    return patch
+
+
+def _diff(
+    old: Any,
+    new: Any,
+    path: Tuple[Any, ...],
+    patch: Patch,
+    cache: Optional[DiffCache] = None,
+) -> None:
+    if (
+        cache is not None
+        and path
+        and isinstance(new, (dict, list))
+        and len(new) >= cache.min_size
+    ):
+        key = (id(old), id(new))
+        entry = cache.diffs.get(key)
+        if entry is None:
+            entry = cache.diffs[key] = (diff(old, new, cache), old, new)
+        prefix = list(path)
+        patch["set"].extend(
+            [prefix + sub_path, value] for sub_path, value in entry[0]["set"]
+        )
+        patch["del"].extend(prefix + sub_path for sub_path in entry[0]["del"])
+    elif isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, path + (key,), patch, cache)
+            else:
+                patch["set"].append([list(path + (key,)), value])
+        for key in old:
+            if key not in new:
+                patch["del"].append(list(path + (key,)))
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        old_types = list(map(type, old))
+        new_types = list(map(type, new))
+        if _ATOMS.issuperset(old_types) and _ATOMS.issuperset(new_types):
+            _diff_flat(old, new, old_types, new_types, path, patch)
+        else:
+            for index, (old_value, new_value) in enumerate(zip(old, new)):
+                _diff(old_value, new_value, path + (index,), patch, cache)
+    elif type(old) is not type(new) or old != new:
+        # 0 and 0.0 are equal but not encoded the same way
+        patch["set"].append([list(path), new])
+
+
+def _diff_flat(
+    old: List[Any],
+    new: List[Any],
+    old_types: List[type],
+    new_types: List[type],
+    path: Tuple[Any, ...],
+    patch: Patch,
+) -> None:
+    # lists of atoms are compared a slice at a time, and only the slices that
+    # differ are gone through
+    size = len(new)
+    changed = []
+    for start in range(0, size, _SLICE):
+        end = start + _SLICE
+        if (
+            old[start:end] != new[start:end]
+            or old_types[start:end] != new_types[start:end]
+        ):
+            changed.extend(
+                index
+                for index in range(start, min(end, size))
+                if old[index] != new[index] or old_types[index] is not new_types[index]
+            )
+    prefix = list(path)
+    if len(changed) * 2 > size:
+        # most of the list changed: it is smaller sent whole
+        patch["set"].append([prefix, new])
+    else:
+        patch["set"].extend([prefix + [index], new[index]] for index in changed)
+
+
+def is_empty(patch: Patch) -> bool:
+    return not patch["set"] and not patch["del"]
+
+
+def apply_patch(target: Any, patch: Patch) -> Any:
+    # target is changed in place; the (possibly replaced) root is returned
+    for path in patch.get("del", []):
+        container = _resolve(target, path[:-1])
+        del container[_key(container, path[-1])]
+    for path, value in patch.get("set", []):
+        if not path:
+            target = value
+            continue
+        container = _resolve(target, path[:-1])
+        container[_key(container, path[-1])] = value
+    return target
+
+
+def _resolve(target: Any, path: List[Any]) -> Any:
+    for key in path:
+        target = target[_key(target, key)]
+    return target
+
+
+def _key(container: Any, key: Union[str, int]) -> Union[str, int]:
+    # dict keys that were not strings come back as strings after encoding
+    if (
+        isinstance(container, dict)
+        and key not in container
+        and not isinstance(key, str)
+    ):
+        return str(key)
+    return key
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class MessageTypeError(Exception):
     def __init__(self, message_type: str) -> None:
         message = "Message of type '{}' can not be handled.".format(message_type)
@@ -30,3 +33,29 @@ class InvalidContentError(Exception):
             message_type, content_keys, expected_content_keys
         )
         super().__init__(message)
+
+
+class UpdateOutOfOrderError(Exception):
+    def __init__(self, seq: int, last_seq: Optional[int]) -> None:
+        message = "Update {} received after update {}. Waiting for a keyframe.".format(
+            seq, last_seq
+        )
+        super().__init__(message)
+
+
+class UnknownCodecError(Exception):
+    def __init__(self, codec_name: str) -> None:
+        message = "Codec '{}' is not available.".format(codec_name)
+        super().__init__(message)
+
+
+class UnknownRecipientError(Exception):
+    def __init__(self, jid: str) -> None:
+        message = "No agent '{}' attached to the local transport.".format(jid)
+        super().__init__(message)
+
+
+class AgentAlreadyAttachedError(Exception):
+    def __init__(self, jid: str) -> None:
+        message = "Agent '{}' already attached to the local transport.".format(jid)
+        super().__init__(message)
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Optional, List, Callable, Awaitable
+
+from spade.message import Message
+
+
+class SendReport:
+    """Outcome of sending one batch of messages."""
+
+    __slots__ = ("sent", "slow", "timed_out", "failed", "duration")
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.slow: List[str] = []
+        self.timed_out: List[str] = []
+        self.failed: List[str] = []
+        self.duration = 0.0
+
+    def __repr__(self) -> str:
+        return "SendReport(sent={}, slow={}, timed_out={}, failed={}, duration={:.4f})".format(
+            self.sent, self.slow, self.timed_out, self.failed, self.duration
+        )
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and not self.failed
+
+
+async def fan_out(
+    send: Callable[[Message], Awaitable[None]],
+    messages: List[Message],
+    concurrency: int = 32,
+    timeout: Optional[float] = None,
+    slow_threshold: Optional[float] = None,
+) -> SendReport:
+    # send messages concurrently, at most `concurrency` at a time. A send that
+    # takes longer than `timeout` is abandoned so it can't stall the others.
+    report = SendReport()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    start = time.monotonic()
+
+    async def send_one(msg: Message) -> None:
+        async with semaphore:
+            send_start = time.monotonic()
+            try:
+                await asyncio.wait_for(send(msg), timeout=timeout)
+            except asyncio.TimeoutError:
+                report.timed_out.append(str(msg.to))
+            except Exception:
+                report.failed.append(str(msg.to))
+            else:
+                report.sent += 1
+                elapsed = time.monotonic() - send_start
+                if slow_threshold is not None and elapsed > slow_threshold:
+                    report.slow.append(str(msg.to))
+
+    await asyncio.gather(*(send_one(msg) for msg in messages))
+    report.duration = time.monotonic() - start
+    return report
@@ -0,0 +1,68 @@
+import math
+from typing import List, Dict, Tuple, Iterable, Sequence, Hashable
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    """Uniform grid index over 2D positions.
+
+    Keys are bucketed by the cell their position falls in, so a radius query
+    only looks at the cells the circle overlaps. With a cell size close to
+    the query radius, a query costs about the number of neighbors found.
+    """
+
+    def __init__(self, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError("Cell size must be positive, got {}.".format(cell_size))
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, List[Hashable]] = {}
+        self.positions: Dict[Hashable, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.positions
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.positions.clear()
+
+    def insert(self, key: Hashable, position: Sequence[float]) -> None:
+        if key in self.positions:
+            self.remove(key)
+        x, y = float(position[0]), float(position[1])
+        self.positions[key] = (x, y)
+        self.cells.setdefault(self._cell(x, y), []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        x, y = self.positions.pop(key)
+        cell = self._cell(x, y)
+        keys = self.cells[cell]
+        keys.remove(key)
+        if not keys:
+            del self.cells[cell]
+
+    def rebuild(self, items: Iterable[Tuple[Hashable, Sequence[float]]]) -> None:
+        self.clear()
+        for key, position in items:
+            self.insert(key, position)
+
+    def query(self, position: Sequence[float], radius: float) -> List[Hashable]:
+        # keys within `radius` of `position`, borders included
+        x, y = float(position[0]), float(position[1])
+        min_x, min_y = self._cell(x - radius, y - radius)
+        max_x, max_y = self._cell(x + radius, y + radius)
+        squared_radius = radius * radius
+        found = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                for key in self.cells.get((cell_x, cell_y), ()):
+                    key_x, key_y = self.positions[key]
+                    if (key_x - x) ** 2 + (key_y - y) ** 2 <= squared_radius:
+                        found.append(key)
+        return found
@@ -0,0 +1,225 @@
+import asyncio
+import bisect
+import contextlib
+import json
+import time
+from typing import List, Dict, Tuple, Callable, Iterator, Any
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    # seconds, from 50 microseconds to 5 seconds
+    DEFAULT_BOUNDS = (
+        0.00005,
+        0.0001,
+        0.0005,
+        0.001,
+        0.005,
+        0.01,
+        0.05,
+        0.1,
+        0.5,
+        1.0,
+        5.0,
+    )
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BOUNDS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.total, "buckets": buckets}
+
+
+class Metrics:
+    """Counters, gauges and histograms of an agent.
+
+    Every method returns right away when the metrics are disabled, so the
+    instrumentation can stay in the hot paths.
+    """
+
+    def __init__(self, enabled: bool = False, prefix: str = "spade_game") -> None:
+        self.enabled = enabled
+        self.prefix = prefix
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def timed(self, name: str, **labels: str):
+        # context manager recording the time spent in its block
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed(name, labels)
+
+    @contextlib.contextmanager
+    def _timed(self, name: str, labels: Dict[str, str]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "counters": _by_name(self.counters),
+            "gauges": _by_name(self.gauges),
+            "histograms": _by_name(
+                {
+                    key: histogram.snapshot()
+                    for key, histogram in self.histograms.items()
+                }
+            ),
+        }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+            for name, items in _group(values).items():
+                metric = "{}_{}".format(self.prefix, name)
+                lines.append("# TYPE {} {}".format(metric, kind))
+                for labels, value in items:
+                    lines.append("{}{} {}".format(metric, _render(labels), value))
+        for name, items in _group(self.histograms).items():
+            metric = "{}_{}".format(self.prefix, name)
+            lines.append("# TYPE {} histogram".format(metric))
+            for labels, histogram in items:
+                snapshot = histogram.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    bucket_labels = _render(labels + (("le", bound),))
+                    lines.append("{}_bucket{} {}".format(metric, bucket_labels, count))
+                lines.append(
+                    "{}_sum{} {}".format(metric, _render(labels), snapshot["sum"])
+                )
+                lines.append(
+                    "{}_count{} {}".format(metric, _render(labels), snapshot["count"])
+                )
+        return "\n".join(lines) + "\n"
+
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _render(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, value) for key, value in labels) + "}"
+
+
+def _group(
+    values: Dict[Tuple[str, Labels], Any],
+) -> Dict[str, List[Tuple[Labels, Any]]]:
+    grouped = {}
+    for (name, labels), value in sorted(values.items(), key=lambda item: item[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _by_name(values: Dict[Tuple[str, Labels], Any]) -> Dict[str, Dict[str, Any]]:
+    # {"name": {"label=value,...": value}}, "" when there are no labels
+    return {
+        name: {
+            ",".join("{}={}".format(key, value) for key, value in labels): value
+            for labels, value in items
+        }
+        for name, items in _group(values).items()
+    }
+
+
+class MetricsHTTPServer:
+    """Minimal HTTP endpoint serving ``/metrics`` (Prometheus text format) and
+    ``/stats`` (JSON) on a local port."""
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        stats: Callable[[], Dict[str, Any]],
+        host: str = "127.0.0.1",
+        port: int = 9100,
+    ) -> None:
+        self.metrics = metrics
+        self.stats = stats
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await reader.readline()
+            # skip headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path == "/metrics":
+                status, content_type = "200 OK", "text/plain; version=0.0.4"
+                body = self.metrics.render_prometheus()
+            elif path == "/stats":
+                status, content_type = "200 OK", "application/json"
+                body = json.dumps(self.stats(), default=str)
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", ""
+            data = body.encode("utf-8")
+            writer.write(
+                "HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n"
+                "Connection: close\r\n\r\n".format(
+                    status, content_type, len(data)
+                ).encode("latin-1")
+                + data
+            )
+            await writer.drain()
+        finally:
+            writer.close()
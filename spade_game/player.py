@@ -1,11 +1,22 @@
-import json
-from typing import Optional, Union, List, Dict, Any
+import asyncio
+import copy
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Union, List, Dict, Tuple, Any
 
-from spade.agent import Agent
 from spade.message import Message
 from spade.behaviour import FSMBehaviour, State
 
-from .exceptions import MessageTypeError, UnauthorizedSenderError
+from .exceptions import (
+    MessageTypeError,
+    UnauthorizedSenderError,
+    UpdateOutOfOrderError,
+)
+from .delta import apply_patch
+from .codec import Codec, get_codec, DEFAULT_CODEC
+from .stepping import StepView
+from .transport import GameAgent
 
 # State definitions
 STATE_CONNECT = "STATE_CONNECT"
@@ -20,39 +31,65 @@ class Connect(State):
         body = {
             "type": "connect",
             "info": self.agent.initial_attributes,
+            "codecs": list(self.agent.codecs),
         }
 
-        msg = Message(
-            to=str(self.agent.server_jid),
-            sender=str(self.agent.jid),
-            body=json.dumps(body),
-            metadata={"performative": "inform"},
-        )
+        # the codec is not negotiated yet, so the default one is used
+        msg = self.agent._build_message(body, get_codec(DEFAULT_CODEC))
 
-        await self.send(msg)
+        await self.agent.send_message(self, msg)
         self.set_next_state(STATE_INPUT)
 
 
 class Input(State):
     async def run(self):
-        msg = await self.receive()
-        if msg:
-            try:
-                await self.agent.decode_message(msg)
-            except Exception as e:
-                print(
-                    "[{}] Error in message received: {}".format(str(self.agent.jid), e)
-                )
-                self.set_next_state(STATE_INPUT)
-            else:
-                self.set_next_state(STATE_ACTION)
-        else:
+        if self.agent._undecided_update:
+            # updates came during the last decision: act on them
+            self.agent._undecided_update = False
+            self.set_next_state(STATE_ACTION)
+            return
+
+        # sleep until a message arrives
+        msg = await self.receive(timeout=self.agent.idle_timeout)
+        if msg is None:
             self.set_next_state(STATE_INPUT)
+            return
+
+        message_type = await self.agent._handle_message(self, msg)
+        if message_type == "shared":
+            # players act on their own updates
+            self.set_next_state(STATE_INPUT)
+            return
+        handled = message_type is not None
+        if self.agent.input_mode == "conflate":
+            handled = await self._drain(handled)
+        self.set_next_state(STATE_ACTION if handled else STATE_INPUT)
+
+    async def _drain(self, handled: bool) -> bool:
+        # apply every queued message, so the action is decided once, on the
+        # latest world model
+        applied = 1 if handled else 0
+        if not handled:
+            self.agent.dropped_updates += 1
+        while True:
+            msg = await self.receive()
+            if msg is None:
+                break
+            message_type = await self.agent._handle_message(self, msg)
+            if message_type is None:
+                self.agent.dropped_updates += 1
+            elif message_type != "shared":
+                applied += 1
+        self.agent.superseded_updates += max(0, applied - 1)
+        return applied > 0
 
 
 class Action(State):
     async def run(self):
-        self.agent.decide_action()
+        if self.agent.decision_mode == "inline":
+            self.agent._next_action()
+        else:
+            await self.agent._decide_off_loop(self)
         self.set_next_state(STATE_OUTPUT)
 
 
@@ -60,19 +97,64 @@ class Output(State):
     async def run(self):
         body = {"type": "action", "info": self.agent.action}
 
-        msg = Message(
-            to=str(self.agent.server_jid),
-            sender=str(self.agent.jid),
-            body=json.dumps(body),
-            metadata={"performative": "inform"},
-        )
+        msg = self.agent._build_message(body)
 
-        await self.send(msg)
+        await self.agent.send_message(self, msg)
         self.set_next_state(STATE_INPUT)
 
 
+def _discard_result(future: asyncio.Future) -> None:
+    # retrieves the error of a timed out decision, so it is not reported
+    if not future.cancelled():
+        future.exception()
+
+
+def _decide_on_view(view: StepView) -> Union[Dict[str, Any], Any]:
+    # decide_action may return the action or set it on the view
+    action = view.decide_action()
+    return view.action if action is None else action
+
+
 # Player Agent
-class Player(Agent):
+class Player(GameAgent):
+    # Codecs the player can talk, by order of preference. The server picks one
+    # during the connection and the player answers with the same codec.
+    codecs = ("json",)
+
+    # Longest time, in seconds, the Input state waits for a message.
+    idle_timeout = 1.0
+
+    # "every" decides an action for each update received. "conflate" applies
+    # every queued update first and decides once, on the latest world model.
+    input_mode = "every"
+
+    # Where decide_action runs: "inline" (on the event loop), "thread" or
+    # "process". In "process" mode, `decision_function(world_model)` is called
+    # instead, or `decision_function(world_model, shared_state)` when the
+    # server sends a shared section, so it must be a picklable module-level
+    # function. Off the loop, updates received during a decision are applied
+    # once it is done, and a decision that takes more than `decision_timeout`
+    # seconds is replaced by the last action passed to propose_action() or by
+    # default_action(). Attributes a thread decision sets on the player are
+    # kept only when it ends in time.
+    decision_mode = "inline"
+    decision_function = None
+    decision_timeout = None
+    decision_workers = 1
+
+    # Jid, besides the server, that may send the shared section of the
+    # updates, e.g. an agent that forwards the messages sent to the
+    # `shared_recipient` of the server. Updates of a round whose shared
+    # section is sent apart wait for that section.
+    shared_sender = None
+    # Most shared sections kept while their updates have not arrived
+    max_early_shared = 16
+
+    # Cache of the actions decided for each world model (see cache_state), as
+    # a DecisionCache, e.g. shared_cache(). Only for players whose decision
+    # depends on that state alone.
+    decision_cache = None
+
     def __init__(
         self,
         jid: str,
@@ -87,6 +169,51 @@ class Player(Agent):
         self.world_model = {}
         self.action = None
 
+        # part of the world model that is the same for every player, when the
+        # server sends one (see Server.shared_state)
+        self.shared_state = None
+        # relayed shared sections: round of the last update applied, whether
+        # that update waits for its section, and the sections received before
+        # their update, by round
+        self._update_round = None
+        self._awaiting_shared = False
+        self._early_shared = {}
+
+        # sequence number of the last update applied to the world model
+        self._update_seq = None
+        self._resync_requested = False
+
+        # codec chosen by the server
+        self.codec = get_codec(DEFAULT_CODEC)
+
+        # game session the player is in, when the server hosts many rooms
+        self.room_id = None
+
+        # PlayerPool hosting the player, if any, and the id of the player in it
+        self.pool = None
+        self.player_id = None
+
+        # off-loop decisions: world model built from the updates received
+        # during the current decision, and the best action proposed so far
+        self.decision_deadline = None
+        self.decisions_timed_out = 0
+        self.conflated_updates = 0
+
+        # updates applied without an action decided on them, and updates that
+        # could not be applied, in "conflate" input mode
+        self.superseded_updates = 0
+        self.dropped_updates = 0
+        self._decision_executor = None
+        # timed out decisions still running in a worker
+        self._abandoned_decisions = set()
+        self._deciding = False
+        self._pending_world = None
+        self._pending_shared = None
+        # the world model changed during the last decision
+        self._undecided_update = False
+        self._proposed_action = None
+        self._proposal_lock = threading.Lock()
+
     async def setup(self) -> None:
         fsm = FSMBehaviour()
         fsm.add_state(name=STATE_CONNECT, state=Connect(), initial=True)
@@ -100,25 +227,334 @@ class Player(Agent):
         fsm.add_transition(source=STATE_OUTPUT, dest=STATE_INPUT)
         self.add_behaviour(fsm)
 
+    async def stop(self) -> None:
+        if self._decision_executor is not None:
+            self._decision_executor.shutdown(wait=False)
+            self._decision_executor = None
+        await super().stop()
+
     def decide_action(self) -> Union[Dict[str, Any], Any]:
         raise NotImplementedError("Subclasses must implement this")
 
-    async def decode_message(self, message: Message) -> None:
+    def default_action(self) -> Union[Dict[str, Any], Any]:
+        # action sent when a decision times out with nothing proposed
+        return self.action
+
+    def propose_action(self, action: Union[Dict[str, Any], Any]) -> None:
+        # best action found so far by an anytime decide_action, used if the
+        # decision times out. Safe to call from the decision thread.
+        with self._proposal_lock:
+            self._proposed_action = action
+
+    def time_left(self) -> Optional[float]:
+        # seconds left before the current decision times out
+        if self.decision_deadline is None:
+            return None
+        return max(0.0, self.decision_deadline - time.monotonic())
+
+    def cache_state(self) -> Any:
+        # part of the world model the decision depends on
+        if self.shared_state is None:
+            return self.world_model
+        return {"world": self.world_model, "shared": self.shared_state}
+
+    def _next_action(self) -> Union[Dict[str, Any], Any]:
+        hit, key = self._lookup_decision()
+        if hit:
+            return self.action
+        # decide_action may return the action or set self.action itself
+        action = self.decide_action()
+        if action is not None:
+            self.action = action
+        self._cache_decision(key)
+        return self.action
+
+    def _lookup_decision(self) -> Tuple[bool, Optional[str]]:
+        # (hit, cache key of the state). On a hit, the cached action is set.
+        cache = self.decision_cache
+        if cache is None:
+            return False, None
+        key = cache.key(self.cache_state())
+        found, action = cache.lookup(key)
+        if found:
+            self.action = action
+        return found, key
+
+    def _cache_decision(self, key: Optional[str]) -> None:
+        if key is not None:
+            self.decision_cache.put(key, self.action)
+
+    def _new_decision_executor(self) -> Executor:
+        if self.decision_mode == "thread":
+            return ThreadPoolExecutor(
+                max_workers=self.decision_workers,
+                thread_name_prefix="decide-{}".format(str(self.jid)),
+            )
+        if self.decision_mode == "process":
+            if self.decision_function is None:
+                raise ValueError("Process decisions need a decision_function.")
+            return ProcessPoolExecutor(max_workers=self.decision_workers)
+        raise ValueError("Unknown decision mode '{}'.".format(self.decision_mode))
+
+    async def _decide_off_loop(self, behaviour: State) -> None:
+        hit, key = self._lookup_decision()
+        if hit:
+            return
+        if self._decision_executor is None or self._abandoned_decisions:
+            # a timed out decision may still hold a worker: later decisions
+            # must not queue behind it
+            if self._decision_executor is not None:
+                self._decision_executor.shutdown(wait=False)
+            self._decision_executor = self._new_decision_executor()
+            self._abandoned_decisions = set()
+        loop = asyncio.get_running_loop()
+        timeout = self.decision_timeout
+        self.decision_deadline = None if timeout is None else time.monotonic() + timeout
+
+        # threads decide on a view of the player, so a decision that times
+        # out can not change the action or the proposals of the next ones
+        context = {
+            "action": self.action,
+            "decision_deadline": self.decision_deadline,
+            "_proposed_action": None,
+            "_proposal_lock": threading.Lock(),
+        }
+        view = StepView(type(self), self.world_model, context, self)
+        if self.decision_mode == "process":
+            # plain function: getting it from the class does not bind it
+            arguments = [self.world_model]
+            if self.shared_state is not None:
+                arguments.append(self.shared_state)
+            decision = loop.run_in_executor(
+                self._decision_executor, type(self).decision_function, *arguments
+            )
+        else:
+            decision = loop.run_in_executor(
+                self._decision_executor, _decide_on_view, view
+            )
+
+        self._deciding = True
+        try:
+            await self._wait_decision(behaviour, decision)
+        finally:
+            self._deciding = False
+            if self._pending_world is not None:
+                self.world_model = self._pending_world
+                self._pending_world = None
+                self._undecided_update = True
+            if self._pending_shared is not None:
+                self.shared_state = self._pending_shared
+                self._pending_shared = None
+                self._undecided_update = True
+
+        if decision.done():
+            try:
+                action = decision.result()
+            except Exception as e:
+                print("[{}] Error in decision: {}".format(str(self.jid), e))
+            else:
+                if action is not None:
+                    self.action = action
+                # other attributes decide_action set, on the view of a thread
+                for name in view.assigned - context.keys():
+                    setattr(self, name, view.__dict__[name])
+                self._cache_decision(key)
+                return
+        else:
+            # the decision goes on in its worker, but its result is discarded
+            decision.add_done_callback(_discard_result)
+            self._abandoned_decisions.add(decision)
+            decision.add_done_callback(self._abandoned_decisions.discard)
+            self.decisions_timed_out += 1
+            print("[{}] Decision timed out after {}s.".format(str(self.jid), timeout))
+
+        with view._proposal_lock:
+            action = view._proposed_action
+        self.action = action if action is not None else self.default_action()
+
+    async def _wait_decision(self, behaviour: State, decision: asyncio.Future) -> None:
+        # keeps handling messages until the decision is done or timed out
+        receiving = None
+        try:
+            while not decision.done():
+                remaining = self.time_left()
+                if remaining == 0.0:
+                    return
+                if receiving is None:
+                    receiving = asyncio.ensure_future(
+                        behaviour.receive(timeout=self.idle_timeout)
+                    )
+                done, _ = await asyncio.wait(
+                    {decision, receiving},
+                    timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if receiving in done:
+                    msg = receiving.result()
+                    receiving = None
+                    if msg:
+                        await self._handle_message(behaviour, msg)
+        finally:
+            if receiving is not None:
+                receiving.cancel()
+
+    async def _handle_message(
+        self, behaviour: State, msg: Message, content: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        # type of the message, or None when it could not be handled
+        try:
+            return await self.decode_message(msg, content)
+        except Exception as e:
+            print("[{}] Error in message received: {}".format(str(self.jid), e))
+            if isinstance(e, UpdateOutOfOrderError):
+                await self._request_resync(behaviour)
+            return None
+
+    async def _request_resync(self, behaviour: State) -> None:
+        # ask for a keyframe only once per gap
+        if self._resync_requested:
+            return
+        body = {"type": "resync"}
+        await self.send_message(behaviour, self._build_message(body))
+        self._resync_requested = True
+
+    def _build_message(
+        self, body: Dict[str, Any], codec: Optional[Codec] = None
+    ) -> Message:
+        codec = codec or self.codec
+        metadata = {"performative": "inform", "codec": codec.name}
+        if self.room_id is not None:
+            metadata["room"] = self.room_id
+        sender = self.jid
+        if self.pool is not None:
+            # pooled players talk through the pool connection
+            sender = self.pool.jid
+            metadata["player_id"] = self.player_id
+        return Message(
+            to=str(self.server_jid),
+            sender=str(sender),
+            body=codec.encode(body),
+            metadata=metadata,
+        )
+
+    async def send_message(self, behaviour, msg: Message) -> None:
+        if self.pool is not None:
+            await self.pool.send_message(behaviour, msg)
+        else:
+            await super().send_message(behaviour, msg)
+
+    async def decode_message(
+        self, message: Message, content: Optional[Dict[str, Any]] = None
+    ) -> str:
+        # type of the message, as far as acting goes: an update that waits
+        # for the shared section of its round counts as "shared", and the
+        # section that completes it as an "update". `content` is the body
+        # when it was already decoded, e.g. by a PlayerPool.
         sender_jid = str(message.sender)
-        content = json.loads(message.body)
+        codec = get_codec(message.get_metadata("codec") or DEFAULT_CODEC)
+        if content is None:
+            content = codec.decode(message.body)
+        if sender_jid == self.server_jid:
+            self.codec = codec
+            self.room_id = message.get_metadata("room") or self.room_id
 
-        if content["type"] == "update":
-            self._process_update(sender_jid, content["info"])
-        elif content["type"] == "disconnect":
+        message_type = content["type"]
+        if message_type == "update":
+            self._process_update(sender_jid, content["info"], content.get("seq"))
+        elif message_type == "delta":
+            self._process_delta(sender_jid, content["info"], content["seq"])
+        elif message_type == "disconnect":
             await self._process_disconnection(sender_jid)
+        elif message_type == "shared":
+            if self._process_shared(sender_jid, content["info"], content.get("round")):
+                message_type = "update"
         else:
-            raise MessageTypeError(content["type"])
+            raise MessageTypeError(message_type)
+        if "shared" in content and message_type != "shared":
+            self._process_shared(sender_jid, content["shared"])
+        if "round" in content and content["type"] in ("update", "delta"):
+            if not self._match_shared(content["round"]):
+                message_type = "shared"
+        return message_type
 
-    def _process_update(self, sender_jid: str, content: Dict[str, Any]) -> None:
+    def _process_update(
+        self, sender_jid: str, content: Dict[str, Any], seq: Optional[int] = None
+    ) -> None:
         if sender_jid == self.server_jid:
-            self.world_model = content
+            if self._deciding:
+                # the decision reads the world model: keep the update aside
+                self.conflated_updates += 1
+                self._pending_world = content
+            else:
+                self.world_model = content
+            self._update_seq = seq
+            self._resync_requested = False
+        else:
+            raise UnauthorizedSenderError(sender_jid)
+
+    def _process_delta(
+        self, sender_jid: str, content: Dict[str, List[Any]], seq: int
+    ) -> None:
+        if sender_jid != self.server_jid:
+            raise UnauthorizedSenderError(sender_jid)
+        if self._update_seq is None or seq != self._update_seq + 1:
+            raise UpdateOutOfOrderError(seq, self._update_seq)
+        if self._deciding:
+            self.conflated_updates += 1
+            if self._pending_world is None:
+                self._pending_world = copy.deepcopy(self.world_model)
+            self._pending_world = apply_patch(self._pending_world, content)
         else:
+            self.world_model = apply_patch(self.world_model, content)
+        self._update_seq = seq
+
+    def _process_shared(
+        self,
+        sender_jid: str,
+        content: Dict[str, Any],
+        round_id: Optional[int] = None,
+    ) -> bool:
+        # whether the section completes an update that waited for it
+        if sender_jid != self.server_jid and (
+            self.shared_sender is None or sender_jid.split("/")[0] != self.shared_sender
+        ):
             raise UnauthorizedSenderError(sender_jid)
+        if round_id is None:
+            self._set_shared(content)
+            return False
+        if self._update_round is not None and round_id < self._update_round:
+            # older than the world model
+            return False
+        if self._update_round is None or round_id > self._update_round:
+            # the update of its round did not arrive yet
+            self._early_shared[round_id] = content
+            while len(self._early_shared) > self.max_early_shared:
+                del self._early_shared[min(self._early_shared)]
+            return False
+        self._set_shared(content)
+        completes = self._awaiting_shared
+        self._awaiting_shared = False
+        return completes
+
+    def _match_shared(self, round_id: int) -> bool:
+        # whether the shared section of the round of the update just applied
+        # is there. Sections of earlier rounds are of no use anymore.
+        self._update_round = round_id
+        content = self._early_shared.pop(round_id, None)
+        self._early_shared = {
+            r: section for r, section in self._early_shared.items() if r > round_id
+        }
+        if content is not None:
+            self._set_shared(content)
+        self._awaiting_shared = content is None
+        return not self._awaiting_shared
+
+    def _set_shared(self, content: Dict[str, Any]) -> None:
+        if self._deciding:
+            # the decision reads the shared state: keep the section aside
+            self._pending_shared = content
+        else:
+            self.shared_state = content
 
     async def _process_disconnection(self, sender_jid: str) -> None:
         if sender_jid == self.server_jid:
@@ -127,6 +563,9 @@ class Player(Agent):
                     str(self.jid)
                 )
             )
-            await self.stop()
+            if self.pool is not None:
+                await self.pool.remove_player(self.player_id)
+            else:
+                await self.stop()
         else:
             raise UnauthorizedSenderError(sender_jid)
@@ -0,0 +1,197 @@
+from functools import partial
+from typing import Optional, List, Dict, Any
+
+from spade.message import Message
+from spade.behaviour import FSMBehaviour, State
+
+from .codec import get_codec, DEFAULT_CODEC
+from .fanout import fan_out
+from .player import Player
+from .transport import GameAgent
+
+# State definitions
+STATE_CONNECT = "STATE_CONNECT"
+STATE_INPUT = "STATE_INPUT"
+STATE_ACTION = "STATE_ACTION"
+STATE_OUTPUT = "STATE_OUTPUT"
+
+
+# Player Pool States
+class Connect(State):
+    async def run(self):
+        messages = []
+        for player in self.agent.players.values():
+            body = {
+                "type": "connect",
+                "info": player.initial_attributes,
+                "codecs": list(player.codecs),
+            }
+            # the codec is not negotiated yet, so the default one is used
+            messages.append(player._build_message(body, get_codec(DEFAULT_CODEC)))
+        await self.agent._send_all(self, messages)
+        self.set_next_state(STATE_INPUT)
+
+
+class Input(State):
+    async def run(self):
+        # sleep until a message arrives, then take every queued one
+        msg = await self.receive(timeout=self.agent.idle_timeout)
+        if msg is None:
+            self.set_next_state(STATE_INPUT)
+            return
+        messages = [msg]
+        while len(messages) < self.agent.max_batch_size:
+            msg = await self.receive()
+            if msg is None:
+                break
+            messages.append(msg)
+
+        # players act once per batch, on their latest world model
+        ready = self.agent._ready
+        for msg in messages:
+            player_id = msg.get_metadata("player_id")
+            content = None
+            if player_id is None:
+                # sent to the pool itself, e.g. the shared section of the
+                # updates: every player gets it, decoded once. Players must
+                # not change it.
+                players = list(self.agent.players.values())
+                content = self.agent._decode(msg)
+                if content is None:
+                    continue
+            elif player_id in self.agent.players:
+                players = [self.agent.players[player_id]]
+            else:
+                print(
+                    "[{}] Message received for unknown player {}.".format(
+                        str(self.agent.jid), player_id
+                    )
+                )
+                continue
+            for player in players:
+                message_type = await player._handle_message(self, msg, content)
+                if message_type is None:
+                    player.dropped_updates += 1
+                elif message_type != "shared":
+                    if player.player_id in ready:
+                        player.superseded_updates += 1
+                    ready[player.player_id] = player
+        # players disconnected by the server do not act
+        for player_id in list(ready):
+            if player_id not in self.agent.players:
+                del ready[player_id]
+        self.set_next_state(STATE_ACTION if ready else STATE_INPUT)
+
+
+class Action(State):
+    async def run(self):
+        for player in self.agent._ready.values():
+            # a failing player must not stop the others
+            try:
+                player._next_action()
+            except Exception as e:
+                print(
+                    "[{}] Error in decision of player {}: {}".format(
+                        str(self.agent.jid), player.player_id, e
+                    )
+                )
+                player.action = player.default_action()
+        self.set_next_state(STATE_OUTPUT)
+
+
+class Output(State):
+    async def run(self):
+        messages = [
+            player._build_message({"type": "action", "info": player.action})
+            for player in self.agent._ready.values()
+        ]
+        self.agent._ready.clear()
+        await self.agent._send_all(self, messages)
+        self.set_next_state(STATE_INPUT)
+
+
+# Player Pool Agent
+class PlayerPool(GameAgent):
+    """Agent hosting many players behind one connection.
+
+    The players are ``Player`` instances that are never started: the pool
+    connects them, routes the messages of the server to them by their
+    ``player_id`` metadata and sends their actions. The server sees each of
+    them as a distinct participant. Decisions run inline, one per player and
+    batch of messages. The pool stops when its last player is disconnected.
+    """
+
+    # Longest time, in seconds, the Input state waits for a message.
+    idle_timeout = 1.0
+    max_batch_size = 1024
+
+    send_concurrency = 32
+    send_timeout = 5.0
+
+    def __init__(
+        self,
+        jid: str,
+        password: str,
+        players: Optional[List[Player]] = None,
+        verify_security: Optional[bool] = False,
+    ) -> None:
+        super().__init__(jid, password, verify_security)
+        self.players: Dict[str, Player] = {}
+        self._next_player_id = 0
+        # players with new updates to act on, by player id
+        self._ready: Dict[str, Player] = {}
+        for player in players or []:
+            self.add_player(player)
+
+    async def setup(self) -> None:
+        fsm = FSMBehaviour()
+        fsm.add_state(name=STATE_CONNECT, state=Connect(), initial=True)
+        fsm.add_state(name=STATE_INPUT, state=Input())
+        fsm.add_state(name=STATE_ACTION, state=Action())
+        fsm.add_state(name=STATE_OUTPUT, state=Output())
+        fsm.add_transition(source=STATE_CONNECT, dest=STATE_INPUT)
+        fsm.add_transition(source=STATE_INPUT, dest=STATE_INPUT)
+        fsm.add_transition(source=STATE_INPUT, dest=STATE_ACTION)
+        fsm.add_transition(source=STATE_ACTION, dest=STATE_OUTPUT)
+        fsm.add_transition(source=STATE_OUTPUT, dest=STATE_INPUT)
+        self.add_behaviour(fsm)
+
+    def add_player(self, player: Player, player_id: Optional[str] = None) -> str:
+        # players must be added before the pool starts
+        if player_id is None:
+            player_id = str(self._next_player_id)
+            self._next_player_id += 1
+        player.pool = self
+        player.player_id = player_id
+        self.players[player_id] = player
+        return player_id
+
+    async def remove_player(self, player_id: str) -> None:
+        player = self.players.pop(player_id, None)
+        if player is not None:
+            player.pool = None
+        if not self.players:
+            print("[{}] No players left. Stopping pool...".format(str(self.jid)))
+            await self.stop()
+
+    def _decode(self, msg: Message) -> Optional[Dict[str, Any]]:
+        codec = get_codec(msg.get_metadata("codec") or DEFAULT_CODEC)
+        try:
+            return codec.decode(msg.body)
+        except Exception as e:
+            print("[{}] Error in message received: {}".format(str(self.jid), e))
+            return None
+
+    async def _send_all(self, behaviour: State, messages: List[Message]) -> None:
+        report = await fan_out(
+            partial(self.send_message, behaviour),
+            messages,
+            concurrency=self.send_concurrency,
+            timeout=self.send_timeout,
+        )
+        if not report.ok:
+            print(
+                "[{}] Could not send messages. Timed out: {}. Failed: {}.".format(
+                    str(self.jid), report.timed_out, report.failed
+                )
+            )
@@ -0,0 +1,187 @@
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Optional, Union, List, Dict, Iterator, Any
+
+from .exceptions import PlayerAlreadyConnectedError, PlayerNotFoundError
+
+# values that can not be changed in place once read from a record
+_IMMUTABLE = (int, float, complex, str, bytes, bool, type(None), datetime)
+
+
+def participant_jid(address: str, player_id: Optional[str] = None) -> str:
+    # key of a player: its jid, or "pool jid#player id" for pooled players
+    return address if player_id is None else "{}#{}".format(address, player_id)
+
+
+class PlayerRecord(MutableMapping):
+    """Compact record of a connected player.
+
+    The record behaves like the player dict the world model used to hold:
+    ``player["jid"]``, ``player["action"]``, ``player["_action_datetime"]`` and
+    every game-defined attribute can be read and written by key.
+
+    ``version`` goes up whenever a key is written, or a value that could be
+    changed in place (a list, a dict, an array...) is read, so checkpoints and
+    replays only encode the players that may have changed.
+    """
+
+    __slots__ = (
+        "jid",
+        "action",
+        "_action_datetime",
+        "attributes",
+        "sent_state",
+        "sent_seq",
+        "codec",
+        "address",
+        "player_id",
+        "version",
+    )
+
+    # keys stored in slots instead of the attributes dict
+    _FIELDS = ("jid", "action", "_action_datetime")
+
+    def __init__(
+        self,
+        jid: str,
+        attributes: Dict[str, Any],
+        action: Any = None,
+        action_datetime: Optional[datetime] = None,
+    ) -> None:
+        self.jid = jid
+        self.attributes = attributes
+        self.action = action
+        self._action_datetime = action_datetime
+
+        # last update sent to the player, used to build delta updates
+        self.sent_state = None
+        self.sent_seq = 0
+
+        # codec negotiated with the player
+        self.codec = None
+
+        # agent the messages of the player go to, and the id of the player in
+        # that agent when it is a PlayerPool
+        self.address = jid
+        self.player_id = None
+
+        self.version = 0
+
+    def __getitem__(self, key: str) -> Any:
+        if key in PlayerRecord._FIELDS:
+            value = getattr(self, key)
+        else:
+            value = self.attributes[key]
+        if not isinstance(value, _IMMUTABLE):
+            self.version += 1
+        return value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        # value of `key` for code that does not change it: not counted as a
+        # possible change
+        if key in PlayerRecord._FIELDS:
+            return getattr(self, key)
+        return self.attributes.get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.version += 1
+        if key in PlayerRecord._FIELDS:
+            setattr(self, key, value)
+        else:
+            self.attributes[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in PlayerRecord._FIELDS:
+            raise KeyError("Key '{}' can not be removed from a player.".format(key))
+        del self.attributes[key]
+        self.version += 1
+
+    def __contains__(self, key: object) -> bool:
+        return key in PlayerRecord._FIELDS or key in self.attributes
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.attributes
+        yield from PlayerRecord._FIELDS
+
+    def __len__(self) -> int:
+        return len(self.attributes) + len(PlayerRecord._FIELDS)
+
+    def __repr__(self) -> str:
+        return "PlayerRecord({!r})".format(self.copy())
+
+    def copy(self) -> Dict[str, Any]:
+        data = self.attributes.copy()
+        data["jid"] = self.jid
+        data["action"] = self.action
+        data["_action_datetime"] = self._action_datetime
+        return data
+
+    def public_data(self) -> Dict[str, Any]:
+        # player data as sent to the player: no jid and no control attributes
+        data = {
+            key: value
+            for key, value in self.attributes.items()
+            if not key.startswith("_")
+        }
+        data["action"] = self.action
+        return data
+
+
+class PlayerRegistry:
+    """Jid-keyed collection of player records.
+
+    Iteration, ``len``, ``append``, ``remove`` and ``copy`` work as they did on
+    the list of player dicts, while lookups by jid are O(1).
+    """
+
+    __slots__ = ("_players",)
+
+    def __init__(self) -> None:
+        self._players: Dict[str, PlayerRecord] = {}
+
+    def __iter__(self) -> Iterator[PlayerRecord]:
+        return iter(self._players.values())
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, item: Union[str, PlayerRecord]) -> bool:
+        if isinstance(item, PlayerRecord):
+            return self._players.get(item.jid) is item
+        return item in self._players
+
+    def __getitem__(self, index: int) -> PlayerRecord:
+        # positional access, kept for code written against the old list
+        return list(self._players.values())[index]
+
+    def __repr__(self) -> str:
+        return "PlayerRegistry({!r})".format(list(self._players.values()))
+
+    def get(self, player_jid: str) -> Optional[PlayerRecord]:
+        return self._players.get(player_jid)
+
+    def new_record(
+        self,
+        jid: str,
+        attributes: Dict[str, Any],
+        action_datetime: Optional[datetime] = None,
+    ) -> PlayerRecord:
+        # record of a new player, in the form this registry stores
+        return PlayerRecord(jid, attributes, action_datetime=action_datetime)
+
+    def append(self, player: PlayerRecord) -> None:
+        if player.jid in self._players:
+            raise PlayerAlreadyConnectedError(player.jid)
+        self._players[player.jid] = player
+
+    def remove(self, player: Union[str, PlayerRecord]) -> None:
+        player_jid = player.jid if isinstance(player, PlayerRecord) else player
+        if player_jid not in self._players:
+            raise PlayerNotFoundError(player_jid)
+        del self._players[player_jid]
+
+    def copy(self) -> List[PlayerRecord]:
+        return list(self._players.values())
+
+    def jids(self) -> List[str]:
+        return list(self._players.keys())
@@ -0,0 +1,290 @@
+import bisect
+import json
+import mmap
+import struct
+from array import array
+from typing import Optional, List, Dict, Tuple, Iterator, Iterable, Any
+
+from .codec import _to_builtin
+from .delta import apply_patch
+from .tracking import apply_changes
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional
+    msgpack = None
+
+# A replay file starts with MAGIC, a version byte and an encoding byte
+# (b"j" for JSON, b"m" for msgpack). Every record is then a header (payload
+# length, kind, tick) followed by its encoded payload.
+MAGIC = b"SGRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBc")
+RECORD = struct.Struct("<IBI")
+
+# record kinds and their payloads
+INIT = 1  # world model when the game starts
+ACTION = 2  # [player jid, action] accepted before the step of tick + 1
+TICK = 3  # delta patch of the world model after the step of tick
+KEYFRAME = 4  # whole world model after the step of tick
+END = 5  # game result
+
+_ENCODINGS = {"json": b"j", "msgpack": b"m"}
+
+
+def _serializers(encoding: str):
+    if encoding == "json":
+        encoder = json.JSONEncoder(
+            separators=(",", ":"), default=_to_builtin, ensure_ascii=False
+        )
+        return (lambda value: encoder.encode(value).encode("utf-8")), json.loads
+    if msgpack is None:
+        raise ImportError("msgpack replays require the 'msgpack' package.")
+    packer = msgpack.Packer(default=_to_builtin, use_bin_type=True)
+    return packer.pack, (
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False)
+    )
+
+
+class ReplayRecorder:
+    """Appends a game to a binary replay file: the initial world model, every
+    accepted action and the world model changes of each tick.
+
+    World models are recorded as delta patches, with a whole keyframe every
+    ``keyframe_interval`` ticks so replays can seek quickly. Ticks can pass
+    only the players that changed, so recording does not encode the whole
+    world model every tick.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keyframe_interval: int = 100,
+        encoding: Optional[str] = None,
+    ) -> None:
+        if encoding is None:
+            encoding = "msgpack" if msgpack is not None else "json"
+        if encoding not in _ENCODINGS:
+            raise ValueError("Unknown replay encoding '{}'.".format(encoding))
+        self.path = path
+        self.encoding = encoding
+        self.keyframe_interval = keyframe_interval
+        self._dumps, self._loads = _serializers(encoding)
+
+        self.tick = 0
+        self.closed = False
+        self._state = None
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, _ENCODINGS[encoding]))
+
+    def start(self, world: Dict[str, Any]) -> None:
+        data = self._dumps(world)
+        self._state = self._loads(data)
+        self._write(INIT, data)
+
+    def record_action(self, player_jid: str, action: Any) -> None:
+        self._write(ACTION, self._dumps([player_jid, action]))
+
+    @property
+    def keyframe_due(self) -> bool:
+        # whether the next tick is recorded with a keyframe
+        return (self.tick + 1) % self.keyframe_interval == 0
+
+    def record_tick(
+        self,
+        world: Dict[str, Any],
+        players: Optional[Dict[str, Any]] = None,
+        removed: Iterable[str] = (),
+    ) -> None:
+        # `world` is the whole world model, with its players by jid. With
+        # `players`, it is the world model without its players, `players`
+        # holds the players that changed since the previous tick and
+        # `removed` the jids of those that left.
+        self.tick += 1
+        if players is None:
+            players = world["players"]
+            world = {key: value for key, value in world.items() if key != "players"}
+            removed = [jid for jid in self._state["players"] if jid not in players]
+        # round trips, so the state holds the values as they are decoded
+        world = self._loads(self._dumps(world))
+        players = {
+            player_jid: self._loads(self._dumps(data))
+            for player_jid, data in players.items()
+        }
+        self._state, patch = apply_changes(self._state, world, players, removed)
+        self._write(TICK, self._dumps(patch))
+        if self.tick % self.keyframe_interval == 0:
+            self._write(KEYFRAME, self._dumps(self._state))
+
+    def close(self, result: Any = None) -> None:
+        if self.closed:
+            return
+        self._write(END, self._dumps(result))
+        self._file.close()
+        self.closed = True
+
+    def _write(self, kind: int, data: bytes) -> None:
+        self._file.write(RECORD.pack(len(data), kind, self.tick))
+        self._file.write(data)
+
+
+class ReplayReader:
+    """Memory-mapped access to the records of a replay file.
+
+    Opening a replay only scans the record headers. Payloads are decoded
+    when they are read.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError("'{}' is not a replay file.".format(path))
+
+        magic, version, encoding = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("'{}' is not a replay file.".format(path))
+        names = {code: name for name, code in _ENCODINGS.items()}
+        self.encoding = names[encoding]
+        self._loads = _serializers(self.encoding)[1]
+
+        # one entry per record
+        self.kinds = array("B")
+        self.ticks = array("I")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        offset, size = HEADER.size, len(self._map)
+        while offset + RECORD.size <= size:
+            length, kind, tick = RECORD.unpack_from(self._map, offset)
+            offset += RECORD.size
+            if offset + length > size:
+                break  # record cut short, e.g. the recording server crashed
+            self.kinds.append(kind)
+            self.ticks.append(tick)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            offset += length
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __enter__(self) -> "ReplayReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def payload(self, index: int) -> Any:
+        offset = self.offsets[index]
+        return self._loads(self._map[offset : offset + self.lengths[index]])
+
+    def records(self, start: int = 0) -> Iterator[Tuple[int, int, Any]]:
+        # (kind, tick, payload) of every record from `start` on
+        for index in range(start, len(self.kinds)):
+            yield self.kinds[index], self.ticks[index], self.payload(index)
+
+
+class Replay:
+    """Reproduces the world model of a recorded game at any tick.
+
+    ``state_at(tick)`` starts from the closest keyframe and applies the
+    patches up to the tick. ``frames()`` walks the whole game, one tick at a
+    time, without keeping past states.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.reader = ReplayReader(path)
+        reader = self.reader
+
+        self._init = None
+        self._end = None
+        # record of the patch of tick t at index t - 1
+        self._tick_records: List[int] = []
+        self._keyframe_ticks: List[int] = []
+        self._keyframe_records: List[int] = []
+        self._action_records: Dict[int, List[int]] = {}
+        for index, (kind, tick) in enumerate(zip(reader.kinds, reader.ticks)):
+            if kind == TICK:
+                self._tick_records.append(index)
+            elif kind == ACTION:
+                self._action_records.setdefault(tick + 1, []).append(index)
+            elif kind == KEYFRAME:
+                self._keyframe_ticks.append(tick)
+                self._keyframe_records.append(index)
+            elif kind == INIT:
+                self._init = index
+            elif kind == END:
+                self._end = index
+        if self._init is None:
+            self.close()
+            raise ValueError("Replay '{}' has no initial world model.".format(path))
+
+    def __enter__(self) -> "Replay":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.reader.close()
+
+    @property
+    def ticks(self) -> int:
+        return len(self._tick_records)
+
+    @property
+    def finished(self) -> bool:
+        return self._end is not None
+
+    @property
+    def result(self) -> Any:
+        return None if self._end is None else self.reader.payload(self._end)
+
+    def initial_state(self) -> Dict[str, Any]:
+        return self.reader.payload(self._init)
+
+    def actions(self, tick: int) -> List[Tuple[str, Any]]:
+        # actions accepted before the step of `tick`
+        return [
+            tuple(self.reader.payload(index))
+            for index in self._action_records.get(tick, ())
+        ]
+
+    def state_at(self, tick: int) -> Dict[str, Any]:
+        if not 0 <= tick <= self.ticks:
+            raise IndexError(
+                "Tick {} out of range, the replay has {} ticks.".format(
+                    tick, self.ticks
+                )
+            )
+        position = bisect.bisect_right(self._keyframe_ticks, tick) - 1
+        if position >= 0:
+            start = self._keyframe_ticks[position]
+            state = self.reader.payload(self._keyframe_records[position])
+        else:
+            start, state = 0, self.initial_state()
+        for current in range(start + 1, tick + 1):
+            patch = self.reader.payload(self._tick_records[current - 1])
+            state = apply_patch(state, patch)
+        return state
+
+    def frames(
+        self, start: int = 0
+    ) -> Iterator[Tuple[int, List[Tuple[str, Any]], Dict[str, Any]]]:
+        # (tick, actions of the step, world model after the step). The state
+        # is updated in place: copy it to keep it past the next frame.
+        state = self.state_at(start)
+        for tick in range(start + 1, self.ticks + 1):
+            state = apply_patch(
+                state, self.reader.payload(self._tick_records[tick - 1])
+            )
+            yield tick, self.actions(tick), state
@@ -0,0 +1,205 @@
+from functools import partial
+from typing import Optional, List, Dict, Tuple, Callable
+
+from spade.message import Message
+from spade.behaviour import FSMBehaviour, State
+
+from .server import Server
+from .registry import participant_jid
+from .fanout import fan_out
+from .transport import GameAgent
+
+# State definitions
+STATE_INPUT = "STATE_INPUT"
+STATE_TICK = "STATE_TICK"
+
+
+# Room Server States
+class Input(State):
+    async def run(self):
+        # sleep until a message arrives or some room needs to tick
+        msg = await self.receive(timeout=self.agent.input_timeout())
+        if msg:
+            messages = [msg]
+            while len(messages) < self.agent.max_batch_size:
+                msg = await self.receive()
+                if msg is None:
+                    break
+                messages.append(msg)
+            self.agent.ingest(messages)
+        self.set_next_state(STATE_TICK)
+
+
+class Tick(State):
+    async def run(self):
+        messages = self.agent.tick_rooms()
+        if messages:
+            report = await fan_out(
+                partial(self.agent.send_message, self),
+                messages,
+                concurrency=self.agent.send_concurrency,
+                timeout=self.agent.send_timeout,
+                slow_threshold=self.agent.slow_send_threshold,
+            )
+            self.agent.last_send_report = report
+            if not report.ok:
+                print(
+                    "[{}] Could not update players. Timed out: {}. Failed: {}.".format(
+                        str(self.agent.jid), report.timed_out, report.failed
+                    )
+                )
+        self.set_next_state(STATE_INPUT)
+
+
+# Room Server Agent
+class RoomServer(GameAgent):
+    """Agent hosting many independent games (rooms) behind one connection.
+
+    ``room_factory`` builds the game of a room from its id. The game is a
+    ``Server`` that is never started: the room server feeds it the messages
+    of its players and runs its steps on a shared tick loop. Players are
+    matched to the first room still waiting for players, and messages are
+    routed by the ``room`` metadata the players echo back. A finished room
+    is replaced by a fresh game and its id reused.
+    """
+
+    # Longest time, in seconds, the Input state waits for a message.
+    idle_timeout = 1.0
+    max_batch_size = 256
+
+    send_concurrency = 32
+    send_timeout = 5.0
+    slow_send_threshold = 0.1
+
+    def __init__(
+        self,
+        jid: str,
+        password: str,
+        room_factory: Callable[[str], Server],
+        verify_security: Optional[bool] = False,
+    ) -> None:
+        super().__init__(jid, password, verify_security)
+        self.room_factory = room_factory
+
+        self.rooms: Dict[str, Server] = {}
+        # rooms still waiting for players, in creation order
+        self._waiting_rooms: Dict[str, None] = {}
+        # room of each connected player
+        self._player_rooms: Dict[str, str] = {}
+
+        self._next_room_id = 0
+        self._free_room_ids: List[str] = []
+        self.finished_rooms = 0
+
+        self.last_send_report = None
+
+    async def setup(self) -> None:
+        fsm = FSMBehaviour()
+        fsm.add_state(name=STATE_INPUT, state=Input(), initial=True)
+        fsm.add_state(name=STATE_TICK, state=Tick())
+        fsm.add_transition(source=STATE_INPUT, dest=STATE_TICK)
+        fsm.add_transition(source=STATE_TICK, dest=STATE_INPUT)
+        self.add_behaviour(fsm)
+
+    def input_timeout(self) -> float:
+        timeout = self.idle_timeout
+        for room in self.rooms.values():
+            if room.running_steps:
+                timeout = min(timeout, room.input_timeout())
+        return timeout
+
+    def ingest(self, messages: List[Message]) -> None:
+        for message in messages:
+            sender_jid = participant_jid(
+                str(message.sender), message.get_metadata("player_id")
+            )
+            room_id = self._player_rooms.get(sender_jid)
+            if room_id is None:
+                # unknown players can only connect
+                room_id = self._matchmake(message.get_metadata("room"))
+            room = self.rooms.get(room_id)
+            if room is None:
+                print(
+                    "[{}] Message received for unknown room {}.".format(
+                        str(self.jid), room_id
+                    )
+                )
+                continue
+            room.ingest([message])
+            self._sync_player(sender_jid, room_id, room)
+
+    def tick_rooms(self) -> List[Message]:
+        messages = []
+        for room_id, room in list(self.rooms.items()):
+            if not room.running_steps:
+                if room.num_players != room.num_players_needed:
+                    continue
+                room.run_steps_init()
+                if not room.running_steps:
+                    continue
+                self._waiting_rooms.pop(room_id, None)
+            elif room.step_condition():
+                room._run_step()
+            elif not room.skip_step():
+                continue
+            room_messages, finished = self._room_output(room)
+            messages.extend(self._route(room_id, msg) for msg in room_messages)
+            if finished:
+                self._recycle(room_id, room)
+        return messages
+
+    def _room_output(self, room: Server) -> Tuple[List[Message], bool]:
+        if room.end_condition():
+            room._finish_game()
+            players = room._all_player_jids()
+            messages = room._disconnect_messages(players)
+            for player_jid in players:
+                room._process_disconnection(player_jid)
+            return messages, True
+        room.on_output_start()
+        messages = room._update_messages(room.can_receive_update)
+        room.on_output_end()
+        return messages, False
+
+    def _route(self, room_id: str, msg: Message) -> Message:
+        # players talk to the room server, never to the room itself
+        msg.sender = str(self.jid)
+        msg.set_metadata("room", room_id)
+        return msg
+
+    def _matchmake(self, room_id: Optional[str]) -> str:
+        if room_id is not None and room_id in self._waiting_rooms:
+            return room_id
+        for room_id in list(self._waiting_rooms):
+            room = self.rooms[room_id]
+            if not room.running_steps and room.num_players < room.num_players_needed:
+                return room_id
+            del self._waiting_rooms[room_id]
+        return self._open_room()
+
+    def _open_room(self) -> str:
+        if self._free_room_ids:
+            room_id = self._free_room_ids.pop()
+        else:
+            room_id = str(self._next_room_id)
+            self._next_room_id += 1
+        self.rooms[room_id] = self.room_factory(room_id)
+        self._waiting_rooms[room_id] = None
+        return room_id
+
+    def _recycle(self, room_id: str, room: Server) -> None:
+        for player_jid, player_room_id in list(self._player_rooms.items()):
+            if player_room_id == room_id:
+                del self._player_rooms[player_jid]
+        del self.rooms[room_id]
+        self._free_room_ids.append(room_id)
+        self.finished_rooms += 1
+        print("[{}] Room {} finished.".format(str(self.jid), room_id))
+
+    def _sync_player(self, player_jid: str, room_id: str, room: Server) -> None:
+        if room._find_player(player_jid) is not None:
+            self._player_rooms[player_jid] = room_id
+        else:
+            self._player_rooms.pop(player_jid, None)
+            if not room.running_steps:
+                self._waiting_rooms[room_id] = None
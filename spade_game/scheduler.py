@@ -0,0 +1,84 @@
+import time
+from typing import Callable, Dict, Any
+
+
+class TickScheduler:
+    """Fixed-rate tick schedule on the monotonic clock.
+
+    Tick ``n`` is due ``n`` periods after ``start()``, no matter how long
+    the previous steps took. When ticks fall behind, the ``"catch_up"``
+    policy runs the late ticks back to back (at most ``max_catch_up`` of
+    them) and the ``"skip"`` policy drops them and waits for the next slot.
+    """
+
+    POLICIES = ("catch_up", "skip")
+
+    def __init__(
+        self,
+        period: float,
+        policy: str = "catch_up",
+        max_catch_up: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if policy not in self.POLICIES:
+            raise ValueError("Unknown tick policy '{}'.".format(policy))
+        self.period = period
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self._clock = clock
+        self.next_tick = self._clock() + period
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self._total_lag = 0.0
+        self._max_lag = 0.0
+        self._total_jitter = 0.0
+        self._last_lag = None
+
+    def start(self) -> None:
+        self.next_tick = self._clock() + self.period
+        self._reset_stats()
+
+    def due(self) -> bool:
+        return self._clock() >= self.next_tick
+
+    def time_until_next(self) -> float:
+        return max(0.0, self.next_tick - self._clock())
+
+    def tick(self) -> None:
+        # called when the due tick runs
+        now = self._clock()
+        lag = max(0.0, now - self.next_tick)
+
+        self.ticks += 1
+        self._total_lag += lag
+        self._max_lag = max(self._max_lag, lag)
+        if self._last_lag is not None:
+            self._total_jitter += abs(lag - self._last_lag)
+        self._last_lag = lag
+        if lag > self.period:
+            self.overruns += 1
+
+        self.next_tick += self.period
+        if now >= self.next_tick:
+            late_ticks = int((now - self.next_tick) // self.period) + 1
+            if self.policy == "skip":
+                dropped = late_ticks
+            else:
+                dropped = max(0, late_ticks - self.max_catch_up)
+            self.next_tick += dropped * self.period
+            self.skipped += dropped
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "period": self.period,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "mean_lag": self._total_lag / self.ticks if self.ticks else 0.0,
+            "max_lag": self._max_lag,
+            "jitter": self._total_jitter / (self.ticks - 1) if self.ticks > 1 else 0.0,
+        }
@@ -0,0 +1,129 @@
+from typing import Optional, Union, Dict, Tuple, Iterable, Sequence, Callable, Any
+
+# (reason, key or index) of a rejected payload, e.g. ("wrong_type", "dx")
+Rejection = Tuple[str, Any]
+
+
+class Field:
+    """Constraints on one value of a payload: its types, an inclusive range
+    and a set of allowed values. ``bool`` values only match when ``bool`` is
+    one of the types."""
+
+    __slots__ = ("types", "minimum", "maximum", "choices", "optional")
+
+    def __init__(
+        self,
+        types: Union[type, Tuple[type, ...], None] = None,
+        minimum: Any = None,
+        maximum: Any = None,
+        choices: Optional[Iterable[Any]] = None,
+        optional: bool = False,
+    ) -> None:
+        if isinstance(types, type):
+            types = (types,)
+        self.types = types
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = frozenset(choices) if choices is not None else None
+        self.optional = optional
+
+    def compile(self) -> Callable[[Any], Optional[str]]:
+        # one closure per field: returns the reason a value is rejected, or
+        # None when the value is valid
+        types, minimum, maximum, choices = (
+            self.types,
+            self.minimum,
+            self.maximum,
+            self.choices,
+        )
+        reject_bool = types is not None and bool not in types
+
+        def check(value: Any) -> Optional[str]:
+            if types is not None:
+                if not isinstance(value, types):
+                    return "wrong_type"
+                if reject_bool and value.__class__ is bool:
+                    return "wrong_type"
+            if choices is not None:
+                try:
+                    if value not in choices:
+                        return "not_in_choices"
+                except TypeError:  # unhashable value
+                    return "not_in_choices"
+            try:
+                if minimum is not None and value < minimum:
+                    return "out_of_range"
+                if maximum is not None and value > maximum:
+                    return "out_of_range"
+            except TypeError:  # value can not be compared to the bounds
+                return "wrong_type"
+            return None
+
+        return check
+
+
+class Schema:
+    """Keys of a dict payload, in any order, and the ``Field`` of each one.
+
+    A key mapped to None accepts any value. Unknown keys are rejected unless
+    ``allow_extra`` is set. The checks are compiled when the schema is built.
+    """
+
+    def __init__(
+        self,
+        fields: Union[Dict[str, Optional[Field]], Iterable[str]],
+        allow_extra: bool = False,
+    ) -> None:
+        if not isinstance(fields, dict):
+            fields = {key: None for key in fields}
+        self.fields = fields
+        self.allow_extra = allow_extra
+
+        self._known = frozenset(fields)
+        self._required = frozenset(
+            key for key, field in fields.items() if field is None or not field.optional
+        )
+        self._checks = tuple(
+            (key, field.compile()) for key, field in fields.items() if field is not None
+        )
+
+    def keys(self) -> Sequence[str]:
+        return list(self.fields)
+
+    def validate(self, content: Any) -> Optional[Rejection]:
+        if not isinstance(content, dict):
+            return ("not_a_dict", None)
+        keys = content.keys()
+        if not self.allow_extra and not keys <= self._known:
+            return ("unknown_key", next(iter(keys - self._known)))
+        if not self._required <= keys:
+            return ("missing_key", next(iter(self._required - keys)))
+        for key, check in self._checks:
+            if key in content:
+                reason = check(content[key])
+                if reason is not None:
+                    return (reason, key)
+        return None
+
+
+class TupleSchema:
+    """Fixed-length list or tuple payload, with the ``Field`` of each item."""
+
+    def __init__(self, fields: Sequence[Optional[Field]]) -> None:
+        self.fields = list(fields)
+        self._checks = tuple(
+            (index, field.compile())
+            for index, field in enumerate(self.fields)
+            if field is not None
+        )
+
+    def validate(self, content: Any) -> Optional[Rejection]:
+        if not isinstance(content, (list, tuple)):
+            return ("not_a_sequence", None)
+        if len(content) != len(self.fields):
+            return ("wrong_length", len(content))
+        for index, check in self._checks:
+            reason = check(content[index])
+            if reason is not None:
+                return (reason, index)
+        return None
@@ -1,9 +1,12 @@
-import json
+import asyncio
+import copy
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
 from datetime import datetime, timedelta
-from typing import Optional, Union, List, Dict, Any
+from typing import Optional, Union, List, Dict, Tuple, Any
 from abc import ABC, abstractmethod
 
-from spade.agent import Agent
 from spade.message import Message
 from spade.behaviour import FSMBehaviour, State
 
@@ -12,7 +15,25 @@ from .exceptions import (
     PlayerAlreadyConnectedError,
     PlayerNotFoundError,
     InvalidContentError,
+    UnknownCodecError,
 )
+from .registry import PlayerRecord, PlayerRegistry, participant_jid
+from .columnar import ColumnarPlayerRegistry
+from .delta import DiffCache, diff, is_empty
+from .fanout import fan_out
+from .codec import Codec, get_codec, DEFAULT_CODEC
+from .scheduler import TickScheduler
+from .transport import GameAgent
+from .metrics import Metrics, MetricsHTTPServer
+from .interest import SpatialGrid
+from .schema import Schema
+from .replay import ReplayRecorder
+from .checkpoint import CheckpointStore, Checkpointer
+from .turns import TurnOrder, RoundRobinTurnOrder, InitiativeTurnOrder
+from .stepping import run_step_on_snapshot
+from .clock import Clock, SystemClock, VirtualClock
+from .shared import SharedSection
+from .tracking import ChangeTracker
 
 # State definitions
 STATE_INPUT = "STATE_INPUT"
@@ -23,65 +44,73 @@ STATE_OUTPUT = "STATE_OUTPUT"
 # Server States
 class Input(State):
     async def run(self):
+        with self.agent.metrics.timed("state_seconds", state="input"):
+            await self._run()
+
+    async def _run(self):
         if self.agent.num_players == self.agent.num_players_needed:
             if not self.agent.running_steps:
                 self.agent.run_steps_init()
                 self.set_next_state(STATE_OUTPUT)
             elif self.agent.step_condition():
                 self.set_next_state(STATE_STEP)
+            elif self.agent.skip_step():
+                self.set_next_state(STATE_OUTPUT)
             else:
-                await self._check_messages()
+                await self._check_messages(self.agent.input_timeout())
                 self.set_next_state(STATE_INPUT)
         else:
-            await self._check_messages()
+            await self._check_messages(self.agent.idle_timeout)
             self.set_next_state(STATE_INPUT)
 
-    async def _check_messages(self):
-        msg = await self.receive()
+    async def _check_messages(self, timeout: float):
+        # sleep until a message arrives or the timeout expires
+        msg = await self.receive(timeout=timeout)
         if msg:
-            try:
-                self.agent.decode_message(msg)
-            except Exception as e:
-                print(
-                    "[{}] Error in message received: {}".format(str(self.agent.jid), e)
-                )
+            messages = [msg]
+            if self.agent.batch_ingest:
+                # drain what is already queued before deciding on the step
+                while len(messages) < self.agent.max_batch_size:
+                    msg = await self.receive()
+                    if msg is None:
+                        break
+                    messages.append(msg)
+            self.agent.ingest_stats["mailbox_depth"] = self.mailbox_size()
+            self.agent.metrics.set_gauge("mailbox_depth", self.mailbox_size())
+            self.agent.ingest(messages)
 
 
 class Step(State):
     async def run(self):
-        self.agent.on_step_start()
-        self.agent.step()
-        self.agent.on_step_end()
+        with self.agent.metrics.timed("state_seconds", state="step"):
+            if self.agent.step_mode == "inline":
+                self.agent._run_step()
+            else:
+                await self.agent._run_step_off_loop(self)
         self.set_next_state(STATE_OUTPUT)
 
 
 class Output(State):
     async def run(self):
-        if self.agent.end_condition():
-            await self._disconnect_all_players()
-            print("[{}] Game ended. Stopping server...".format(str(self.agent.jid)))
-            await self.agent.stop()
-        else:
-            self.agent.on_output_start()
-            await self._update_players(self.agent.can_receive_update)
-            self.agent.on_output_end()
-            self.set_next_state(STATE_INPUT)
+        metrics = self.agent.metrics
+        with metrics.timed("state_seconds", state="output"):
+            if self.agent.end_condition():
+                self.agent._finish_game()
+                await self._disconnect_all_players()
+                print("[{}] Game ended. Stopping server...".format(str(self.agent.jid)))
+                await self.agent.stop()
+            else:
+                with metrics.timed("hook_seconds", hook="on_output_start"):
+                    self.agent.on_output_start()
+                await self._update_players(self.agent.can_receive_update)
+                with metrics.timed("hook_seconds", hook="on_output_end"):
+                    self.agent.on_output_end()
+                self.set_next_state(STATE_INPUT)
 
-    async def _send_update_message(self, player) -> None:
-        player_jid = player["jid"]
-        player_data = player.copy()
-        del player_data["jid"]  # no need to send player jid
-        for key in list(player_data.keys()):
-            if key.startswith("_"):  # delete control attributes
-                del player_data[key]
-        body = {"type": "update", "info": player_data}
-        msg = Message(
-            to=str(player_jid),
-            sender=str(self.agent.jid),
-            body=json.dumps(body),
-            metadata={"performative": "inform"},
-        )
-        await self.send(msg)
+    async def _send_update_message(self, player: PlayerRecord) -> None:
+        msg = self.agent._update_message(player)
+        if msg is not None:
+            await self.agent.send_message(self, msg)
 
     async def _update_player(self, player_jid) -> None:
         player = self.agent._find_player(player_jid)
@@ -89,31 +118,145 @@ class Output(State):
             await self._send_update_message(player)
 
     async def _update_players(self, player_jids) -> None:
-        for player_jid in player_jids:
-            await self._update_player(player_jid)
+        await self._send_all(self.agent._update_messages(player_jids))
 
     async def _update_all_players(self) -> None:
-        for player in self.agent.world_model["players"]:
-            await self._send_update_message(player)
+        await self._send_all(self.agent._update_messages(self.agent._all_player_jids()))
 
     async def _disconnect_all_players(self) -> None:
-        for player in self.agent.world_model["players"].copy():
-            player_jid = player["jid"]
-            body = {"type": "disconnect"}
-            msg = Message(
-                to=str(player_jid),
-                sender=str(self.agent.jid),
-                body=json.dumps(body),
-                metadata={"performative": "inform"},
-            )
-            await self.send(msg)
+        players = self.agent._all_player_jids()
+        await self._send_all(self.agent._disconnect_messages(players))
 
-            # remove player from player list
+        # remove players from player list
+        for player_jid in players:
             self.agent._process_disconnection(player_jid)
 
+    async def _send_all(self, messages: List[Message]) -> None:
+        report = await fan_out(
+            partial(self.agent.send_message, self),
+            messages,
+            concurrency=self.agent.send_concurrency,
+            timeout=self.agent.send_timeout,
+            slow_threshold=self.agent.slow_send_threshold,
+        )
+        self.agent.last_send_report = report
+        metrics = self.agent.metrics
+        metrics.observe("fan_out_seconds", report.duration)
+        metrics.inc("sends_slow", len(report.slow))
+        metrics.inc("sends_timed_out", len(report.timed_out))
+        metrics.inc("sends_failed", len(report.failed))
+        if not report.ok:
+            print(
+                "[{}] Could not update players. Timed out: {}. Failed: {}.".format(
+                    str(self.agent.jid), report.timed_out, report.failed
+                )
+            )
+
 
 # Abstract Server Agent
-class Server(Agent, ABC):
+class Server(GameAgent, ABC):
+    # "full" sends the whole player data on every update. "delta" sends only
+    # what changed since the last update sent to the player, with a full
+    # keyframe every `keyframe_interval` updates.
+    update_mode = "full"
+    keyframe_interval = 30
+
+    # Updates are sent to at most `send_concurrency` players at a time. A send
+    # is abandoned after `send_timeout` seconds and reported as slow after
+    # `slow_send_threshold` seconds.
+    send_concurrency = 32
+    send_timeout = 5.0
+    slow_send_threshold = 0.1
+
+    # Codecs the server can talk, by order of preference. Each player gets the
+    # first codec of its own preference list that is also in this one.
+    codecs = ("json", "msgpack")
+
+    # What to do with ticks that are already late when the previous one ends:
+    # "catch_up" runs them back to back, "skip" waits for the next tick.
+    tick_policy = "catch_up"
+
+    # Instrumentation, see stats(). When `metrics_port` is set, the metrics
+    # are also served over HTTP on that local port (Prometheus text on
+    # /metrics, JSON on /stats).
+    metrics_enabled = False
+    metrics_host = "127.0.0.1"
+    metrics_port = None
+
+    # Longest time, in seconds, the Input state waits for a message when no
+    # tick is coming.
+    idle_timeout = 1.0
+
+    # With `batch_ingest`, the Input state processes every queued message (up
+    # to `max_batch_size`) at once. With `coalesce_actions`, only the last
+    # action of each player in a batch is processed.
+    batch_ingest = True
+    max_batch_size = 256
+    coalesce_actions = False
+
+    # "dict" keeps every player attribute in its record. "columnar" stores the
+    # numeric `player_attributes` in NumPy arrays, one row per player, for
+    # vectorized steps (see ColumnarPlayerRegistry). Requires numpy.
+    player_storage = "dict"
+
+    # Area of interest. When `interest_radius` is set, a player sees its own
+    # data and, under "nearby", the players whose `position_attribute` is
+    # within that radius (see interest_view). A player that can not act and
+    # whose view did not change since its last update is not sent a new one.
+    interest_radius = None
+    position_attribute = "position"
+
+    # Schemas of the "info" of connect and action messages, checked before
+    # any world model lookup, e.g. `Schema({"dx": Field(int, -1, 1)})` or
+    # `TupleSchema([Field(int, 0, 2), Field(int, 0, 2)])`. By default, the
+    # keys must be the connection attributes, and those of dict actions the
+    # action attributes, in any order. Rejections are counted in stats().
+    connection_schema = None
+    action_schema = None
+
+    # When set, the game is recorded to this file (see ReplayRecorder), with a
+    # whole world model every `replay_keyframe_interval` ticks. The path is
+    # formatted with the server `jid` and the start `time`.
+    replay_path = None
+    replay_keyframe_interval = 100
+
+    # When set, the game state is checkpointed to this SQLite file every
+    # `checkpoint_interval` ticks, as deltas with a full snapshot every
+    # `checkpoint_compact_interval` checkpoints. A server started with the
+    # checkpoint of an unfinished game resumes it, and its players can
+    # connect again.
+    checkpoint_path = None
+    checkpoint_interval = 1
+    checkpoint_compact_interval = 100
+
+    # Where step() runs: "inline" (on the event loop), "thread" or "process".
+    # Off the loop, the step works on a copy of the world model (see
+    # StepView) while the messages that arrive are kept aside, and the world
+    # model it leaves replaces the current one before the Output state. Other
+    # attributes the step sets are then copied onto the server, and the
+    # messages kept aside are ingested. In "process" mode, the server class
+    # must be importable by the workers, step() only sees the values of
+    # step_context() besides the world model, and the attributes it sets
+    # must be picklable.
+    step_mode = "inline"
+    step_workers = 1
+
+    # "system" times ticks and turns with the wall clock. "virtual" uses a
+    # VirtualClock, which jumps to the next tick as soon as the step has its
+    # inputs (see inputs_ready), so games run as fast as the players answer
+    # and action timestamps are the same on every run. Turn timeouts only
+    # expire as virtual time goes by.
+    clock_mode = "system"
+
+    # When shared_state() returns a dict, every update of a round carries it
+    # under "shared", encoded once per codec and spliced into the bodies.
+    # With `shared_recipient`, the jid of a PlayerPool hosting the players,
+    # it is sent there once per round, as a "shared" message, instead, and
+    # the pool hands it to each of its players. That message and the updates of its round carry the
+    # same "round" number, so players act once they have both. The shared
+    # section is never sent as a delta.
+    shared_recipient = None
+
     def __init__(
         self,
         jid: str,
@@ -127,6 +270,9 @@ class Server(Agent, ABC):
     ) -> None:
         super().__init__(jid, password, verify_security)
 
+        if self.update_mode not in ("full", "delta"):
+            raise ValueError("Unknown update mode '{}'.".format(self.update_mode))
+
         # Decide number of players needed to start game
         self.num_players_needed = num_players_needed
         self.num_players = 0
@@ -136,7 +282,7 @@ class Server(Agent, ABC):
 
         # initialize world model
         self.world_model = game_attributes.copy()
-        self.world_model["players"] = []
+        self.world_model["players"] = self._new_player_registry(player_attributes)
 
         # set list of params to return
         self.player_attributes = player_attributes
@@ -151,12 +297,91 @@ class Server(Agent, ABC):
         # set action attributes
         self.action_attributes = action_atrributes
 
-        # List of players who can perform actions and receive updates.
-        self.can_perform_action = []
-        self.can_receive_update = []
+        # validators of the connect and action payloads
+        self._connection_schema = self.connection_schema or Schema(
+            self.connection_attributes
+        )
+        self._action_schema = self.action_schema
+        if self._action_schema is None and action_atrributes is not None:
+            self._action_schema = Schema(action_atrributes)
+        # the default schema leaves actions that are not dicts to
+        # _is_action_valid
+        self._validate_all_actions = self.action_schema is not None
+
+        # rejected messages by kind and reason, e.g. {"actions": {"wrong_type": 2}}
+        self.rejections: Dict[str, Dict[str, int]] = {
+            "connections": {},
+            "actions": {},
+        }
+
+        # Set of players who can perform actions and receive updates.
+        self.can_perform_action = set()
+        self.can_receive_update = set()
+
+        # outcome of the last batch of messages sent by the Output state
+        self.last_send_report = None
+
+        # messages ingested during the current tick and the last finished one
+        self.ingest_stats = self._new_ingest_stats()
+        self.last_tick_ingest_stats = self._new_ingest_stats()
+
+        self.metrics = Metrics(enabled=self.metrics_enabled)
+        self.metrics_server = None
 
-        self.period_timedelta = timedelta(milliseconds=1000 / frequency)
-        self.next_step_time = datetime.now() + self.period_timedelta
+        # ticks happen at fixed times on the monotonic clock
+        self.clock = self._new_clock()
+        self.scheduler = TickScheduler(
+            1 / frequency, policy=self.tick_policy, clock=self.clock.monotonic
+        )
+
+        # players that performed an action since the last step
+        self._acted_jids = set()
+
+        # number of the last update round whose shared section was relayed
+        self._shared_round = 0
+
+        # shared section of the last update round, when the players have an
+        # area of interest
+        self._sent_shared = None
+
+        # recorder of the game, opened by its first action or step, and the
+        # players changed since the last recorded tick
+        self.recorder = None
+        self._replay_tracker = ChangeTracker()
+
+        # checkpoint writer, opened by the first step, the players changed
+        # since the last checkpoint, and the players of a restored game that
+        # did not connect again yet
+        self.checkpointer = None
+        self._checkpoint_tracker = ChangeTracker()
+        self._restored_jids = set()
+        # a player connected again and waits for an update
+        self._update_pending = False
+
+        # executor of off-loop steps, created by the first one
+        self._step_executor = None
+
+        # address and id of the pooled players whose connection is in progress
+        self._pooled_players: Dict[str, Tuple[str, str]] = {}
+
+        # index of the player positions, rebuilt before each batch of updates
+        self.interest_grid = None
+        if self.interest_radius is not None:
+            self.interest_grid = SpatialGrid(self.interest_radius)
+
+    def _new_clock(self) -> Clock:
+        if self.clock_mode == "system":
+            return SystemClock()
+        if self.clock_mode == "virtual":
+            return VirtualClock()
+        raise ValueError("Unknown clock mode '{}'.".format(self.clock_mode))
+
+    def _new_player_registry(self, player_attributes: Dict[str, Any]) -> PlayerRegistry:
+        if self.player_storage == "columnar":
+            return ColumnarPlayerRegistry.from_attributes(player_attributes)
+        if self.player_storage != "dict":
+            raise ValueError("Unknown player storage '{}'.".format(self.player_storage))
+        return PlayerRegistry()
 
     async def setup(self) -> None:
         fsm = FSMBehaviour()
@@ -170,8 +395,82 @@ class Server(Agent, ABC):
         fsm.add_transition(source=STATE_OUTPUT, dest=STATE_INPUT)
         self.add_behaviour(fsm)
 
+        if self.checkpoint_path is not None:
+            self.restore_checkpoint()
+
+        if self.metrics_port is not None:
+            self.metrics_server = MetricsHTTPServer(
+                self.metrics, self.stats, self.metrics_host, self.metrics_port
+            )
+            await self.metrics_server.start()
+
+    async def stop(self) -> None:
+        self._end_recording()
+        if self.checkpointer is not None and not self.checkpointer.closed:
+            # the checkpoint is kept, so the game can be resumed
+            self.checkpointer.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+        if self._step_executor is not None:
+            self._step_executor.shutdown(wait=False)
+            self._step_executor = None
+        await super().stop()
+
+    @property
+    def period_timedelta(self) -> timedelta:
+        # time between two ticks, kept for code written before TickScheduler
+        return timedelta(seconds=self.scheduler.period)
+
+    @property
+    def next_step_time(self) -> datetime:
+        # time the next tick is due, kept for code written before
+        # TickScheduler. Use `scheduler.next_tick` for monotonic timing.
+        return self.clock.now() + timedelta(seconds=self.scheduler.time_until_next())
+
+    def stats(self) -> Dict[str, Any]:
+        report = self.last_send_report
+        return {
+            "players": self.num_players,
+            "running_steps": self.running_steps,
+            "scheduler": self.scheduler.stats(),
+            "ingest": dict(self.ingest_stats),
+            "rejections": {
+                kind: dict(reasons) for kind, reasons in self.rejections.items()
+            },
+            "last_tick_ingest": dict(self.last_tick_ingest_stats),
+            "last_send": (
+                None
+                if report is None
+                else {
+                    "sent": report.sent,
+                    "slow": len(report.slow),
+                    "timed_out": len(report.timed_out),
+                    "failed": len(report.failed),
+                    "duration": report.duration,
+                }
+            ),
+            "metrics": self.metrics.snapshot(),
+        }
+
     def step_condition(self) -> bool:
-        return datetime.now() > self.next_step_time
+        self._advance_clock()
+        return self.scheduler.due()
+
+    def inputs_ready(self) -> bool:
+        # whether the inputs the next step needs were received, regardless of
+        # the tick schedule. With a virtual clock, every player that can act
+        # must have acted since the last step.
+        if self.clock_mode == "virtual":
+            return self.can_perform_action <= self._acted_jids
+        return True
+
+    def skip_step(self) -> bool:
+        # whether the players must be updated without a step, e.g. because a
+        # player of a restored game connected again
+        pending = self._update_pending
+        self._update_pending = False
+        return pending
 
     @abstractmethod
     def step(self) -> None:
@@ -181,6 +480,326 @@ class Server(Agent, ABC):
     def end_condition(self) -> bool:
         raise NotImplementedError("Subclasses must implement this.")
 
+    def game_result(self) -> Any:
+        # summary of a finished game, reported by tournaments
+        return None
+
+    def step_context(self) -> Dict[str, Any]:
+        # attributes of the server that step() reads in "process" step mode.
+        # Values must be picklable.
+        return {
+            "jid": str(self.jid),
+            "num_players": self.num_players,
+            "num_players_needed": self.num_players_needed,
+            "player_attributes": self.player_attributes,
+            "action_attributes": self.action_attributes,
+            "running_steps": self.running_steps,
+        }
+
+    def _run_step(self) -> None:
+        self._start_step()
+        with self.metrics.timed("hook_seconds", hook="step"):
+            self.step()
+        self._end_step()
+
+    async def _run_step_off_loop(self, behaviour: State) -> None:
+        self._start_step()
+        if self._step_executor is None:
+            self._step_executor = self._new_step_executor()
+        loop = asyncio.get_running_loop()
+        if self.step_mode == "process":
+            # sending the world model to the worker copies it
+            stepping = loop.run_in_executor(
+                self._step_executor,
+                run_step_on_snapshot,
+                type(self),
+                self.world_model,
+                self.step_context(),
+            )
+        else:
+            # the loop keeps messages aside until the step ends, so the world
+            # model does not change meanwhile and is copied in the worker too
+            stepping = loop.run_in_executor(self._step_executor, self._thread_step)
+
+        with self.metrics.timed("hook_seconds", hook="step"):
+            messages = await self._receive_until(behaviour, stepping)
+        try:
+            world_model, assigned = stepping.result()
+            self._adopt_step_world(world_model)
+            for name, value in assigned.items():
+                setattr(self, name, value)
+        except Exception as e:
+            # the step worked on a copy: the world model stays as it was and
+            # the tick goes on, so the messages received meanwhile are kept
+            self.metrics.inc("step_errors")
+            print("[{}] Error in step: {}".format(str(self.jid), e))
+        self._end_step()
+        self.metrics.inc("messages_deferred", len(messages))
+        if messages:
+            self.ingest(messages)
+
+    def _thread_step(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return run_step_on_snapshot(type(self), self._step_snapshot(), {}, self)
+
+    def _step_snapshot(self) -> Dict[str, Any]:
+        # copy of the world model for a thread step. The updates last sent to
+        # the players are left out and the actions are shared, as the step
+        # does not change them.
+        memo = {}
+        for player in self.world_model["players"]:
+            memo[id(player.sent_state)] = None
+            memo[id(player.action)] = player.action
+        return copy.deepcopy(self.world_model, memo)
+
+    def _adopt_step_world(self, world_model: Dict[str, Any]) -> None:
+        # the players keep their sent updates, and their actions when the
+        # step left them alone, so change tracking does not see every player
+        # as changed
+        players = self.world_model["players"]
+        for player in world_model["players"]:
+            previous = players.get(player.jid)
+            if previous is None:
+                continue
+            player.sent_state = previous.sent_state
+            if player.action is not previous.action and (
+                player.action == previous.action
+            ):
+                player.action = previous.action
+        self.world_model = world_model
+
+    def _new_step_executor(self) -> Executor:
+        if self.step_mode == "thread":
+            return ThreadPoolExecutor(
+                max_workers=self.step_workers,
+                thread_name_prefix="step-{}".format(str(self.jid)),
+            )
+        if self.step_mode == "process":
+            return ProcessPoolExecutor(max_workers=self.step_workers)
+        raise ValueError("Unknown step mode '{}'.".format(self.step_mode))
+
+    async def _receive_until(
+        self, behaviour: State, future: asyncio.Future
+    ) -> List[Message]:
+        # messages received until the future is done, not processed
+        messages = []
+        receiving = None
+        try:
+            while not future.done():
+                if receiving is None:
+                    receiving = asyncio.ensure_future(
+                        behaviour.receive(timeout=self.idle_timeout)
+                    )
+                await asyncio.wait(
+                    {future, receiving}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if receiving.done():
+                    msg = receiving.result()
+                    receiving = None
+                    if msg:
+                        messages.append(msg)
+        finally:
+            if receiving is not None:
+                receiving.cancel()
+        return messages
+
+    def _advance_clock(self) -> None:
+        # a virtual clock jumps to the next tick once the step has its inputs
+        if (
+            isinstance(self.clock, VirtualClock)
+            and self.running_steps
+            and self.inputs_ready()
+        ):
+            self.clock.advance_to(self.scheduler.next_tick)
+
+    def _start_step(self) -> None:
+        self.scheduler.tick()
+        self._acted_jids.clear()
+        # the output of the step updates the players
+        self._update_pending = False
+        self._close_ingest_tick()
+        self._recording()
+        with self.metrics.timed("hook_seconds", hook="on_step_start"):
+            self.on_step_start()
+
+    def _end_step(self) -> None:
+        recorder = self._recording()
+        metrics = self.metrics
+        with metrics.timed("hook_seconds", hook="on_step_end"):
+            self.on_step_end()
+        if recorder is not None:
+            with metrics.timed("hook_seconds", hook="record"):
+                self._record_tick(recorder)
+        if (
+            self.checkpoint_path is not None
+            and self.scheduler.ticks % self.checkpoint_interval == 0
+        ):
+            with metrics.timed("hook_seconds", hook="checkpoint"):
+                self._checkpoint()
+
+    def _recording(self) -> Optional[ReplayRecorder]:
+        if self.replay_path is None:
+            return None
+        if self.recorder is None:
+            path = self.replay_path.format(
+                jid=str(self.jid), time=time.strftime("%Y%m%d-%H%M%S")
+            )
+            self.recorder = ReplayRecorder(path, self.replay_keyframe_interval)
+            self._replay_tracker.changes(self.world_model["players"])
+            self.recorder.start(self._world_snapshot())
+        return None if self.recorder.closed else self.recorder
+
+    def _record_tick(self, recorder: ReplayRecorder) -> None:
+        # only the players that changed are encoded, except on keyframes
+        players, removed = self._replay_tracker.changes(
+            self.world_model["players"], full=recorder.keyframe_due
+        )
+        recorder.record_tick(
+            self._world_without_players(),
+            {player.jid: self._player_snapshot(player) for player in players},
+            removed,
+        )
+
+    def _end_recording(self) -> None:
+        if self.recorder is not None and not self.recorder.closed:
+            self.recorder.close(self.game_result())
+
+    def _finish_game(self) -> None:
+        # the game ended: close its replay and drop its checkpoint
+        self._end_recording()
+        if self.checkpointer is None and self.checkpoint_path is not None:
+            self.checkpointer = Checkpointer(self.checkpoint_path)
+        if self.checkpointer is not None and not self.checkpointer.closed:
+            self.checkpointer.close(finished=True)
+
+    def _checkpoint(self) -> None:
+        if self.checkpointer is None:
+            self.checkpointer = Checkpointer(
+                self.checkpoint_path, self.checkpoint_compact_interval
+            )
+        if not self.checkpointer.closed:
+            # only the players that changed are encoded, except on compactions
+            players, removed = self._checkpoint_tracker.changes(
+                self.world_model["players"], full=self.checkpointer.compaction_due
+            )
+            self.checkpointer.checkpoint(
+                self.scheduler.ticks,
+                self.checkpoint_state(),
+                {player.jid: self.checkpoint_player(player) for player in players},
+                removed,
+            )
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        # everything needed to resume the game but the players, as plain
+        # values
+        return {
+            "world": self._world_without_players(),
+            "running_steps": self.running_steps,
+            "can_perform_action": sorted(self.can_perform_action),
+            "can_receive_update": sorted(self.can_receive_update),
+            "ticks": self.scheduler.ticks,
+        }
+
+    @staticmethod
+    def checkpoint_player(player: PlayerRecord) -> Dict[str, Any]:
+        # what is needed to restore a player, as plain values
+        attributes = player.copy()
+        for key in PlayerRecord._FIELDS:
+            del attributes[key]
+        action_datetime = player["_action_datetime"]
+        return {
+            "attributes": attributes,
+            "action": player.action,
+            "action_datetime": action_datetime.isoformat() if action_datetime else None,
+            "codec": player.codec.name if player.codec else None,
+            "address": player.address,
+            "player_id": player.player_id,
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        players = self._new_player_registry(self.player_attributes)
+        for player_jid, data in state["players"].items():
+            action_datetime = data["action_datetime"]
+            player = players.new_record(
+                player_jid,
+                data["attributes"],
+                action_datetime=(
+                    datetime.fromisoformat(action_datetime) if action_datetime else None
+                ),
+            )
+            player.action = data["action"]
+            player.address = data["address"]
+            player.player_id = data["player_id"]
+            if data["codec"] is not None:
+                player.codec = self._negotiate_codec([data["codec"]])
+            players.append(player)
+
+        self.world_model = dict(state["world"])
+        self.world_model["players"] = players
+        self.num_players = len(players)
+        self.can_perform_action = set(state["can_perform_action"])
+        self.can_receive_update = set(state["can_receive_update"])
+        self.running_steps = state["running_steps"]
+        if self.running_steps:
+            self.scheduler.start()
+        self._restored_jids = set(players.jids())
+
+    def restore_checkpoint(self, path: Optional[str] = None) -> bool:
+        # resumes the game of a checkpoint, if there is one
+        store = CheckpointStore(path or self.checkpoint_path)
+        try:
+            state = store.load()
+        finally:
+            store.close()
+        if state is None:
+            return False
+        self.restore_state(state)
+        print(
+            "[{}] Game restored at tick {} with players {}.".format(
+                str(self.jid), state["ticks"], list(state["players"])
+            )
+        )
+        return True
+
+    def _world_snapshot(self) -> Dict[str, Any]:
+        # world model as recorded: players by jid, without their action time
+        snapshot = self._world_without_players()
+        snapshot["players"] = {
+            player.jid: self._player_snapshot(player)
+            for player in self.world_model["players"]
+        }
+        return snapshot
+
+    def _world_without_players(self) -> Dict[str, Any]:
+        return {
+            key: value for key, value in self.world_model.items() if key != "players"
+        }
+
+    @staticmethod
+    def _player_snapshot(player: PlayerRecord) -> Dict[str, Any]:
+        data = player.copy()
+        del data["jid"]
+        del data["_action_datetime"]
+        return data
+
+    def input_timeout(self) -> float:
+        # wait for messages until the next tick is due. Past that, the step is
+        # waiting for something else (e.g. a player action), so only a
+        # message can change the outcome. Virtual time does not pass while
+        # waiting.
+        if self.running_steps and not isinstance(self.clock, VirtualClock):
+            remaining = self.scheduler.time_until_next()
+            if remaining > 0:
+                return remaining
+            if self.inputs_ready():
+                # the tick fell due after the step condition was checked
+                return 0.0
+        return self.idle_timeout
+
+    def shared_state(self) -> Optional[Dict[str, Any]]:
+        # part of the world model that every player sees, e.g. a board. Players
+        # get it apart from their own data, see `shared_recipient`.
+        return None
+
     def on_step_start(self) -> None:
         pass
 
@@ -191,30 +810,124 @@ class Server(Agent, ABC):
         pass
 
     def on_output_end(self) -> None:
-        self.next_step_time = datetime.now() + self.period_timedelta
+        pass
+
+    def interest_view(
+        self, player: PlayerRecord, peers: List[PlayerRecord]
+    ) -> Dict[str, Any]:
+        # what a player sees when `interest_radius` is set. Override to add
+        # the part of the world state around the player.
+        data = player.public_data()
+        data["nearby"] = {peer.jid: peer.public_data() for peer in peers}
+        return data
 
     def run_steps_init(self) -> None:
-        self.next_step_time = datetime.now() + self.period_timedelta
-        self.can_perform_action = self._all_player_jids()
-        self.can_receive_update = self._all_player_jids()
+        self.scheduler.start()
+        self.can_perform_action = set(self._all_player_jids())
+        self.can_receive_update = set(self._all_player_jids())
         self.running_steps = True
 
+    def ingest(self, messages: List[Message]) -> None:
+        stats = self.ingest_stats
+        stats["batches"] += 1
+        stats["messages"] += len(messages)
+        stats["max_batch"] = max(stats["max_batch"], len(messages))
+
+        if not self.coalesce_actions:
+            for message in messages:
+                self._safe_process(self.decode_message, message)
+            return
+
+        decoded = []
+        for message in messages:
+            item = self._safe_process(self._decode_content, message)
+            if item is not None:
+                decoded.append(item)
+
+        # index of the last action sent by each player in this batch
+        last_action = {
+            sender_jid: index
+            for index, (sender_jid, content) in enumerate(decoded)
+            if content.get("type") == "action"
+        }
+        for index, (sender_jid, content) in enumerate(decoded):
+            if content.get("type") == "action" and last_action[sender_jid] != index:
+                stats["coalesced"] += 1
+                continue
+            self._safe_process(self._process_content, sender_jid, content)
+
+    def _safe_process(self, function, *args) -> Any:
+        try:
+            return function(*args)
+        except Exception as e:
+            self.ingest_stats["errors"] += 1
+            print("[{}] Error in message received: {}".format(str(self.jid), e))
+            return None
+
+    @staticmethod
+    def _new_ingest_stats() -> Dict[str, int]:
+        return {
+            "messages": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "mailbox_depth": 0,
+        }
+
+    def _close_ingest_tick(self) -> None:
+        self.last_tick_ingest_stats = self.ingest_stats
+        self.ingest_stats = self._new_ingest_stats()
+        self.ingest_stats["mailbox_depth"] = self.last_tick_ingest_stats[
+            "mailbox_depth"
+        ]
+
     def decode_message(self, message: Message) -> None:
-        sender_jid = str(message.sender)
-        content = json.loads(message.body)
+        self._process_content(*self._decode_content(message))
 
+    def _decode_content(self, message: Message) -> Tuple[str, Dict[str, Any]]:
+        # players hosted by a PlayerPool are told apart by their player id
+        address = str(message.sender)
+        player_id = message.get_metadata("player_id")
+        sender_jid = participant_jid(address, player_id)
+        codec = get_codec(message.get_metadata("codec") or DEFAULT_CODEC)
+        with self.metrics.timed("decode_seconds", codec=codec.name):
+            content = codec.decode(message.body)
+        if not isinstance(content, dict) or "type" not in content:
+            raise MessageTypeError(None)
+        if player_id is not None and content["type"] == "connect":
+            self._pooled_players[sender_jid] = (address, player_id)
+        return sender_jid, content
+
+    def _process_content(self, sender_jid: str, content: Dict[str, Any]) -> None:
+        self.metrics.inc("messages_in", type=str(content["type"]))
         if content["type"] == "connect":
-            self._process_connection(sender_jid, content["info"])
+            self._process_connection(sender_jid, content["info"], content.get("codecs"))
         elif content["type"] == "disconnect":
             self._process_disconnection(sender_jid)
         elif content["type"] == "action":
             self._process_action(sender_jid, content["info"])
+        elif content["type"] == "resync":
+            self._process_resync(sender_jid)
         else:
             raise MessageTypeError(content["type"])
 
-    def _process_connection(self, sender_jid: str, content: Dict[str, Any]) -> None:
+    def _process_connection(
+        self,
+        sender_jid: str,
+        content: Dict[str, Any],
+        codecs: Optional[List[str]] = None,
+    ) -> None:
+        address, player_id = self._pooled_players.pop(sender_jid, (sender_jid, None))
+
+        # players of a restored game connect again
+        if sender_jid in self._restored_jids:
+            self._readmit(sender_jid, codecs)
+            return
+
         # if game is already running, player can't connect
         if self.running_steps:
+            self._reject("connections", "game_started")
             print(
                 "[{}] Player {} connection not allowed. Game already started.".format(
                     str(self.jid), sender_jid
@@ -222,28 +935,48 @@ class Server(Agent, ABC):
             )
             return
 
+        # check if data necessary for connection is being received
+        rejection = self._connection_schema.validate(content)
+        if rejection is not None:
+            self._reject("connections", rejection[0])
+            raise InvalidContentError(
+                "connect",
+                list(content.keys()) if isinstance(content, dict) else content,
+                self._connection_schema.keys(),
+            )
+
         # check if player is already connected
         if self._find_player(sender_jid) is not None:
             raise PlayerAlreadyConnectedError(sender_jid)
 
-        # check if data necessary for connection is being received
-        if list(content.keys()) == self.connection_attributes:
-            # initialize player data
-            player_data = self.player_attributes.copy()
-            for key, value in player_data.items():
-                if value is None:
-                    player_data[key] = content[key]
-            player_data["jid"] = str(sender_jid)
-            player_data["action"] = None
-            player_data["_action_datetime"] = datetime.now()
-
-            # add player data to world model
-            self.world_model["players"].append(player_data)
-            self.num_players += 1
-        else:
-            raise InvalidContentError(
-                "connect", list(content.keys()), self.connection_attributes
-            )
+        # initialize player data
+        attributes = self.player_attributes.copy()
+        for key, value in attributes.items():
+            if value is None:
+                attributes[key] = content.get(key)
+        player = self.world_model["players"].new_record(
+            str(sender_jid), attributes, action_datetime=self.clock.now()
+        )
+        player.codec = self._negotiate_codec(codecs)
+        player.address = address
+        player.player_id = player_id
+
+        # add player data to world model
+        self.world_model["players"].append(player)
+        self.num_players += 1
+
+    def _readmit(self, sender_jid: str, codecs: Optional[List[str]]) -> None:
+        self._restored_jids.discard(sender_jid)
+        player = self._find_player(sender_jid)
+        if player is not None:
+            player.codec = self._negotiate_codec(codecs)
+            # the player lost its world model: next update is a keyframe
+            player.sent_state = None
+            # checkpoints store the codec
+            player.version += 1
+            if sender_jid in self.can_receive_update:
+                self._update_pending = True
+            print("[{}] Player {} connected again.".format(str(self.jid), sender_jid))
 
     def _process_disconnection(self, sender_jid: str) -> None:
         player = self._find_player(sender_jid)
@@ -253,67 +986,264 @@ class Server(Agent, ABC):
         else:
             self.world_model["players"].remove(player)
             self.num_players -= 1
-            # the player can be in the list of players who can perform
+            # the player can be in the set of players who can perform
             # actions or receive updates. We must take it.
-            try:
-                self.can_perform_action.remove(sender_jid)
-                self.can_receive_update.remove(sender_jid)
-            except:
-                # if it's not, nothing needs to me done.
-                pass
+            self.can_perform_action.discard(sender_jid)
+            self.can_receive_update.discard(sender_jid)
             print("[{}] Player {} disconnected.".format(str(self.jid), sender_jid))
 
     def _process_action(
         self, sender_jid: str, content: Union[Dict[str, Any], Any]
     ) -> None:
         if sender_jid not in self.can_perform_action:
-            print(
-                "[{}] Player {} is not allowed to perform actions.".format(
-                    str(self.jid), sender_jid
-                )
-            )
+            self._reject("actions", "not_allowed")
             return
 
+        # check if action has the expected form
+        schema = self._action_schema
+        if schema is not None and (
+            self._validate_all_actions or isinstance(content, dict)
+        ):
+            rejection = schema.validate(content)
+            if rejection is not None:
+                self._reject("actions", rejection[0])
+                return
+
         player = self._find_player(sender_jid)
 
         if player is None:
             raise PlayerNotFoundError(sender_jid)
         else:
-            if isinstance(content, dict):
-                # check if action has the expected attributes
-                if list(content.keys()) != self.action_attributes:
-                    raise InvalidContentError(
-                        "action", list(content.keys()), self.action_attributes
-                    )
             if self._is_action_valid(content):
+                recorder = self._recording()
+                if recorder is not None:
+                    recorder.record_action(sender_jid, content)
                 player["action"] = content
-                player["_action_datetime"] = datetime.now()
+                player["_action_datetime"] = self.clock.now()
+                self._acted_jids.add(sender_jid)
                 # register action as last performed
                 self.world_model["_last_action_performed"] = content
                 self.world_model["_last_action_player"] = sender_jid
             else:
-                print(
-                    "[{}] Player {} sent an invalid action, so it's being disconsidered.".format(
-                        str(self.jid), sender_jid
+                self._reject("actions", "invalid_action")
+
+    def _reject(self, kind: str, reason: str) -> None:
+        reasons = self.rejections[kind]
+        reasons[reason] = reasons.get(reason, 0) + 1
+        self.metrics.inc("rejected_" + kind, reason=reason)
+
+    def _process_resync(self, sender_jid: str) -> None:
+        player = self._find_player(sender_jid)
+
+        if player is None:
+            raise PlayerNotFoundError(sender_jid)
+        else:
+            # player lost track of the updates: next one is a keyframe
+            player.sent_state = None
+
+    def _negotiate_codec(self, codecs: Optional[List[str]]) -> Codec:
+        # players that do not send their codecs talk the default one
+        for name in codecs or [DEFAULT_CODEC]:
+            if name in self.codecs:
+                try:
+                    return get_codec(name)
+                except UnknownCodecError:
+                    continue
+        return get_codec(DEFAULT_CODEC)
+
+    def _build_message(
+        self,
+        player_jid: str,
+        body: Dict[str, Any],
+        codec: Optional[Codec] = None,
+        player_id: Optional[str] = None,
+        shared: Optional[SharedSection] = None,
+    ) -> Message:
+        codec = codec or get_codec(DEFAULT_CODEC)
+        self.metrics.inc("messages_out", type=body["type"])
+        with self.metrics.timed("encode_seconds", codec=codec.name):
+            if shared is None:
+                encoded = codec.encode(body)
+            else:
+                encoded = codec.splice(body, "shared", shared.part(codec))
+        metadata = {"performative": "inform", "codec": codec.name}
+        if player_id is not None:
+            metadata["player_id"] = player_id
+        return Message(
+            to=str(player_jid),
+            sender=str(self.jid),
+            body=encoded,
+            metadata=metadata,
+        )
+
+    def _update_message(
+        self,
+        player: PlayerRecord,
+        shared: Optional[SharedSection] = None,
+        cache: Optional[DiffCache] = None,
+        round_id: Optional[int] = None,
+    ) -> Optional[Message]:
+        # `round_id` is the round of `shared` when it is relayed apart
+        if shared is None and self.shared_recipient is None:
+            shared = self._shared_section()
+        force = (shared is not None and shared.changed) or self._owes_update(player)
+        body = self._update_body(player, force, cache)
+        if body is None:
+            return None
+        if round_id is not None:
+            body["round"] = round_id
+            shared = None
+        return self._build_message(
+            player.address, body, player.codec, player.player_id, shared
+        )
+
+    def _update_messages(self, player_jids) -> List[Message]:
+        if self.interest_grid is not None:
+            self._index_positions()
+        messages = []
+        shared = self._shared_section()
+        round_id = None
+        if shared is not None and self.shared_recipient is not None:
+            self._shared_round += 1
+            round_id = self._shared_round
+            body = {"type": "shared", "round": round_id, "info": shared.state}
+            messages.append(self._build_message(self.shared_recipient, body))
+        # players that see the same objects share their copies and diffs
+        cache = DiffCache()
+        for player_jid in player_jids:
+            player = self._find_player(player_jid)
+            if player is not None:
+                msg = self._update_message(player, shared, cache, round_id)
+                if msg is not None:
+                    messages.append(msg)
+        if shared is not None:
+            self.metrics.inc("shared_encodes", shared.encodes)
+        return messages
+
+    def _shared_section(self) -> Optional[SharedSection]:
+        state = self.shared_state()
+        if state is None:
+            return None
+        changed = True
+        if self.interest_grid is not None:
+            # players whose view did not change still need a changed section
+            changed = state != self._sent_shared
+            if changed:
+                self._sent_shared = copy.deepcopy(state)
+        return SharedSection(state, changed)
+
+    def _disconnect_messages(self, player_jids) -> List[Message]:
+        messages = []
+        for player_jid in player_jids:
+            player = self._find_player(player_jid)
+            if player is not None:
+                body = {"type": "disconnect"}
+                messages.append(
+                    self._build_message(
+                        player.address, body, player.codec, player.player_id
                     )
                 )
+        return messages
+
+    def _owes_update(self, player: PlayerRecord) -> bool:
+        # whether the player must get an update even if nothing it sees
+        # changed: players act on their updates, so those that can act get
+        # one every round, if only an empty delta
+        return player.jid in self.can_perform_action
+
+    def _update_body(
+        self,
+        player: PlayerRecord,
+        force: bool = False,
+        cache: Optional[DiffCache] = None,
+    ) -> Optional[Dict[str, Any]]:
+        # player jid and control attributes are not sent. Without `force`,
+        # players whose data did not change since their last update get none.
+        cache = cache or DiffCache()
+        data = self._player_data(player)
+        if self.interest_grid is not None:
+            if (
+                not force
+                and player.sent_state is not None
+                and data == player.sent_state
+            ):
+                # nothing the player cares about changed
+                self.metrics.inc("updates_skipped")
+                return None
+        if self.update_mode == "full":
+            if self.interest_grid is not None:
+                player.sent_state = cache.copy(data)
+            return {"type": "update", "info": data}
+
+        seq = player.sent_seq + 1
+        if player.sent_state is None or seq % self.keyframe_interval == 0:
+            body = {"type": "update", "seq": seq, "info": data}
+        else:
+            patch = diff(player.sent_state, data, cache)
+            if not force and is_empty(patch):
+                self.metrics.inc("updates_skipped")
+                return None
+            body = {"type": "delta", "seq": seq, "info": patch}
+        player.sent_seq = seq
+        # sent states are never changed, so they can share their objects
+        player.sent_state = cache.copy(data)
+        return body
+
+    def _player_data(self, player: PlayerRecord) -> Dict[str, Any]:
+        # what the updates of the player carry. With an interest grid, the
+        # positions must be indexed first.
+        if self.interest_grid is None:
+            return player.public_data()
+        return self._player_view(player)
+
+    def _index_positions(self) -> None:
+        position_attribute = self.position_attribute
+        self.interest_grid.rebuild(
+            (player.jid, player.peek(position_attribute))
+            for player in self.world_model["players"]
+            if player.peek(position_attribute) is not None
+        )
+
+    def _player_view(self, player: PlayerRecord) -> Dict[str, Any]:
+        peers = []
+        position = player.peek(self.position_attribute)
+        if position is not None:
+            for peer_jid in self.interest_grid.query(position, self.interest_radius):
+                if peer_jid != player.jid:
+                    peer = self._find_player(peer_jid)
+                    if peer is not None:
+                        peers.append(peer)
+        return self.interest_view(player, peers)
 
     def _is_action_valid(self, content: Union[Dict[str, Any], Any]) -> bool:
         return True
 
-    def _find_player(self, player_jid) -> Union[Dict[str, Any], None]:
+    def _find_player(self, player_jid) -> Union[PlayerRecord, None]:
         # look for player in world model
-        for player in self.world_model["players"]:
-            if player["jid"] == player_jid:
-                return player
-        return None
+        return self.world_model["players"].get(player_jid)
 
-    def _all_player_jids(self) -> Union[List[Dict[str, Any]], None]:
-        return [player["jid"] for player in self.world_model["players"]]
+    def _all_player_jids(self) -> List[str]:
+        return self.world_model["players"].jids()
 
 
 # Abstract Turn-Based Server
 class TurnBasedServer(Server):
+    # a turn that comes late waits for the next tick instead of being rushed
+    tick_policy = "skip"
+
+    # With `event_driven_turns`, a step runs as soon as the current player
+    # performs a valid action, instead of on the next tick.
+    event_driven_turns = False
+
+    # Order of the turns: "round_robin" (order of connection) or "initiative"
+    # (in every round, by decreasing `initiative_attribute` of the players).
+    # See _new_turn_order to use another TurnOrder.
+    turn_order = "round_robin"
+    initiative_attribute = "initiative"
+
+    # A player that does not act within `turn_timeout` seconds loses its turn.
+    turn_timeout = None
+
     def __init__(
         self,
         jid: str,
@@ -338,45 +1268,123 @@ class TurnBasedServer(Server):
         # initialize first player turn
         self._current_player_jid = None
 
+        self.turns = self._new_turn_order()
+        self.skipped_turns = 0
+        self._turn_deadline = None
+        # the turn changed outside a step and the new player has no update yet
+        self._turn_changed = False
+
+    def _new_turn_order(self) -> TurnOrder:
+        if self.turn_order == "round_robin":
+            return RoundRobinTurnOrder()
+        if self.turn_order == "initiative":
+            attribute = self.initiative_attribute
+            return InitiativeTurnOrder(
+                lambda player_jid: self._find_player(player_jid)[attribute]
+            )
+        raise ValueError("Unknown turn order '{}'.".format(self.turn_order))
+
     def step_condition(self) -> bool:
-        if datetime.now() <= self.next_step_time:
+        self._advance_clock()
+        if not self.event_driven_turns and not self.scheduler.due():
             return False
+        return self.inputs_ready()
+
+    def skip_step(self) -> bool:
         if (
-            "_last_action_performed" not in self.world_model
-            or "_last_action_player" not in self.world_model
+            self._turn_deadline is not None
+            and self.clock.monotonic() >= self._turn_deadline
+            and not self.inputs_ready()
         ):
-            return False
-        if self.world_model["_last_action_player"] not in self.can_perform_action:
-            return False
-        return True
+            print(
+                "[{}] Player {} timed out. Skipping turn.".format(
+                    str(self.jid), self._current_player_jid
+                )
+            )
+            self.skipped_turns += 1
+            self._start_turn(self._next_player_jid())
+            self._turn_changed = True
+        changed = self._turn_changed
+        self._turn_changed = False
+        return super().skip_step() or changed
+
+    def input_timeout(self) -> float:
+        timeout = (
+            self.idle_timeout if self.event_driven_turns else super().input_timeout()
+        )
+        if self._turn_deadline is not None:
+            timeout = min(
+                timeout, max(0.0, self._turn_deadline - self.clock.monotonic())
+            )
+        return timeout
+
+    def inputs_ready(self) -> bool:
+        # the current player performed a valid action since its turn started.
+        # The last action of the world model may be from an earlier turn,
+        # e.g. when the other players timed out.
+        return self._current_player_jid in self._acted_jids
 
     def on_step_end(self) -> None:
-        self._current_player_jid = self._next_player_jid()
-        self.can_perform_action = [self._current_player_jid]
-        self.can_receive_update = [self._current_player_jid]
+        self._start_turn(self._next_player_jid())
 
-    def on_output_end(self) -> None:
-        self.next_step_time = datetime.now() + self.period_timedelta
+    def _start_turn(self, player_jid: Optional[str]) -> None:
+        self._current_player_jid = player_jid
+        self._acted_jids.clear()
+        self.can_perform_action = {player_jid} if player_jid is not None else set()
+        self.can_receive_update = set(self.can_perform_action)
+        if self.turn_timeout is not None and player_jid is not None:
+            self._turn_deadline = self.clock.monotonic() + self.turn_timeout
+        else:
+            self._turn_deadline = None
+
+    def _process_connection(
+        self,
+        sender_jid: str,
+        content: Dict[str, Any],
+        codecs: Optional[List[str]] = None,
+    ) -> None:
+        super()._process_connection(sender_jid, content, codecs)
+        if self._find_player(sender_jid) is not None:
+            self.turns.add(sender_jid)
+
+    def _process_disconnection(self, sender_jid: str) -> None:
+        super()._process_disconnection(sender_jid)
+        self.turns.remove(sender_jid)
+        if self.running_steps and sender_jid == self._current_player_jid:
+            self._start_turn(self._next_player_jid())
+            self._turn_changed = True
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        state = super().checkpoint_state()
+        state["current_player_jid"] = self._current_player_jid
+        return state
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        super().restore_state(state)
+        # players queue again by the time of their last action, and the
+        # current player gets its turn back
+        self.turns = self._new_turn_order()
+        players = sorted(self.world_model["players"], key=lambda p: p._action_datetime)
+        for player in players:
+            self.turns.add(player.jid)
+        current_player_jid = state["current_player_jid"]
+        for _ in range(len(players)):
+            if self._next_player_jid() == current_player_jid:
+                break
+        self._start_turn(current_player_jid)
 
     def run_steps_init(self) -> None:
-        self._current_player_jid = self._next_player_jid()
-        if self._current_player_jid is None:
+        self.scheduler.start()
+        player_jid = self._next_player_jid()
+        if player_jid is None:
             print(
                 "[{}] Server could not define the next player in the game.".format(
                     str(self.jid),
                 )
             )
         else:
-            self.can_perform_action = [self._current_player_jid]
-            self.can_receive_update = [self._current_player_jid]
+            self._start_turn(player_jid)
             self.running_steps = True
 
     def _next_player_jid(self) -> Union[str, None]:
-        oldest_play_datetime = datetime.now()
-        next_player_jid = None
-
-        for player in self.world_model["players"]:
-            if player["_action_datetime"] < oldest_play_datetime:
-                oldest_play_datetime = player["_action_datetime"]
-                next_player_jid = player["jid"]
-        return next_player_jid
+        return self.turns.next()
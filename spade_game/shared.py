@@ -0,0 +1,27 @@
+from typing import Dict, Any
+
+from .codec import Codec
+
+
+class SharedSection:
+    """Part of an update round that is the same for every player.
+
+    The section is encoded at most once per codec, however many players it
+    is sent to (see ``Codec.splice``).
+    """
+
+    def __init__(self, state: Dict[str, Any], changed: bool = True) -> None:
+        self.state = state
+        # whether the state differs from the one of the previous round
+        self.changed = changed
+        self._parts: Dict[str, Any] = {}
+
+    @property
+    def encodes(self) -> int:
+        return len(self._parts)
+
+    def part(self, codec: Codec) -> Any:
+        part = self._parts.get(codec.name)
+        if part is None:
+            part = self._parts[codec.name] = codec.encode_part(self.state)
+        return part
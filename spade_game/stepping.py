@@ -0,0 +1,65 @@
+import inspect
+from typing import Optional, Dict, Tuple, Any
+
+
+class StepView:
+    """Stand-in for the server while its step runs off the event loop.
+
+    ``world_model`` is the copy of the world model the step works on, and the
+    values of ``Server.step_context`` are attributes of the view. Methods of
+    the server class are bound to the view, so helpers like ``_find_player``
+    read the copy too. In threads, other attributes are read from the server
+    itself. The view records the other attributes the step sets, so they can
+    be copied onto the server once it is done. Players decide on a view too,
+    in "thread" decision mode.
+    """
+
+    def __init__(
+        self,
+        server_class: type,
+        world_model: Dict[str, Any],
+        context: Dict[str, Any],
+        server: Optional[Any] = None,
+    ) -> None:
+        self.__dict__.update(context)
+        self.__dict__.update(
+            _server_class=server_class,
+            _server=server,
+            world_model=world_model,
+            assigned=set(),
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self.__dict__[name] = value
+        if name != "world_model":
+            self.assigned.add(name)
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for what is not an attribute of the view. Attributes of
+        # the server come before the defaults of its class.
+        if self._server is not None and name in vars(self._server):
+            return vars(self._server)[name]
+        try:
+            value = inspect.getattr_static(self._server_class, name)
+        except AttributeError:
+            if self._server is None:
+                raise
+            return getattr(self._server, name)
+        # methods and properties are bound to the view
+        if hasattr(value, "__get__"):
+            return value.__get__(self, self._server_class)
+        return value
+
+
+def run_step_on_snapshot(
+    server_class: type,
+    world_model: Dict[str, Any],
+    context: Dict[str, Any],
+    server: Optional[Any] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # runs the step of `server_class` on `world_model` and returns the world
+    # model it left and the other attributes it set. Module-level, so it can
+    # be sent to worker processes.
+    view = StepView(server_class, world_model, context, server)
+    server_class.step(view)
+    return view.world_model, {name: view.__dict__[name] for name in view.assigned}
@@ -0,0 +1,243 @@
+import contextlib
+import copy
+import io
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional, List, Dict, Tuple, Callable, Any
+
+from .player import Player
+from .server import Server
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+
+class GameResult:
+    """Outcome of one headless game."""
+
+    __slots__ = (
+        "index",
+        "seed",
+        "result",
+        "steps",
+        "duration",
+        "decisions",
+        "decision_time",
+        "error",
+    )
+
+    def __init__(self, index: int, seed: int) -> None:
+        self.index = index
+        self.seed = seed
+        self.result = None
+        self.steps = 0
+        self.duration = 0.0
+        self.decisions = 0
+        self.decision_time = 0.0
+        self.error = None
+
+    def __repr__(self) -> str:
+        return "GameResult(index={}, result={!r}, steps={}, duration={:.4f})".format(
+            self.index, self.result, self.steps, self.duration
+        )
+
+
+def play_game(
+    server_factory: Callable[[], Server],
+    player_factories: List[Callable[[], Player]],
+    game: Tuple[int, int],
+    max_steps: int = 10000,
+    quiet: bool = True,
+) -> GameResult:
+    """Plays a whole game without agents nor real-time ticks.
+
+    The server and the players are built by the factories and never started.
+    After each output, the players that receive an update decide their action
+    right away and the server steps as soon as its inputs are ready.
+    """
+    index, seed = game
+    result = GameResult(index, seed)
+    random.seed(seed)
+    if np is not None:
+        np.random.seed(seed % 2**32)
+
+    output = io.StringIO() if quiet else None
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            _play(server_factory, player_factories, max_steps, result)
+    except Exception as e:
+        result.error = "{}: {}".format(type(e).__name__, e)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def _play(
+    server_factory: Callable[[], Server],
+    player_factories: List[Callable[[], Player]],
+    max_steps: int,
+    result: GameResult,
+) -> None:
+    server = server_factory()
+    players = {}
+    for player_factory in player_factories:
+        player = player_factory()
+        player_jid = str(player.jid)
+        server._process_connection(player_jid, copy.deepcopy(player.initial_attributes))
+        players[player_jid] = player
+
+    server.run_steps_init()
+    if not server.running_steps:
+        raise RuntimeError("Server could not start the game.")
+
+    stalled = 0
+    while not server.end_condition():
+        # output: players receive their update and act on it
+        server.on_output_start()
+        # the shared section is copied once per round, as it is encoded once
+        shared = server.shared_state()
+        if shared is not None:
+            shared = copy.deepcopy(shared)
+        if server.interest_grid is not None:
+            server._index_positions()
+        # in registry order, so the actions do not depend on set iteration
+        # order and games replay the same from their seed
+        for player_jid in server._all_player_jids():
+            if player_jid not in server.can_receive_update:
+                continue
+            record = server._find_player(player_jid)
+            player = players[player_jid]
+            if shared is not None:
+                player._process_shared(player.server_jid, shared)
+            # the player must not share objects with the server world model
+            player._process_update(
+                player.server_jid, copy.deepcopy(server._player_data(record))
+            )
+            decision_start = time.perf_counter()
+            action = player._next_action()
+            result.decision_time += time.perf_counter() - decision_start
+            result.decisions += 1
+            server._process_action(player_jid, copy.deepcopy(action))
+        server.on_output_end()
+
+        if result.steps >= max_steps:
+            raise RuntimeError("Game did not end after {} steps.".format(max_steps))
+        if not server.inputs_ready():
+            # e.g. an invalid action: the players get a new update and retry
+            stalled += 1
+            if stalled > max_steps:
+                raise RuntimeError("Game stalled waiting for valid actions.")
+            continue
+        stalled = 0
+        # with a virtual clock, time moves one tick per step
+        server._advance_clock()
+        server._run_step()
+        result.steps += 1
+
+    result.result = server.game_result()
+    server._finish_game()
+
+
+class TournamentReport:
+    """Results of every game of a tournament and their aggregate."""
+
+    def __init__(self, results: List[GameResult], wall_time: float) -> None:
+        self.results = results
+        self.wall_time = wall_time
+
+    def summary(self) -> Dict[str, Any]:
+        finished = [result for result in self.results if result.error is None]
+        durations = sorted(result.duration for result in finished)
+        decisions = sum(result.decisions for result in finished)
+        return {
+            "games": len(self.results),
+            "errors": len(self.results) - len(finished),
+            "outcomes": Counter(_hashable(result.result) for result in finished),
+            "wall_time": self.wall_time,
+            "games_per_second": (
+                len(self.results) / self.wall_time if self.wall_time else 0.0
+            ),
+            "mean_steps": (
+                statistics.mean(result.steps for result in finished)
+                if finished
+                else 0.0
+            ),
+            "mean_duration": statistics.mean(durations) if durations else 0.0,
+            "p50_duration": _percentile(durations, 0.50),
+            "p95_duration": _percentile(durations, 0.95),
+            "max_duration": durations[-1] if durations else 0.0,
+            "mean_decision_time": (
+                sum(result.decision_time for result in finished) / decisions
+                if decisions
+                else 0.0
+            ),
+        }
+
+
+class Tournament:
+    """Plays many headless games across a process pool.
+
+    Factories must be picklable (e.g. classes or ``functools.partial`` of
+    module-level classes) when ``workers`` is not 0. Game ``i`` is seeded with
+    ``seed + i``, so a tournament can be replayed game by game.
+    """
+
+    def __init__(
+        self,
+        server_factory: Callable[[], Server],
+        player_factories: List[Callable[[], Player]],
+        games: int = 100,
+        workers: Optional[int] = None,
+        seed: int = 0,
+        max_steps: int = 10000,
+        quiet: bool = True,
+    ) -> None:
+        self.server_factory = server_factory
+        self.player_factories = player_factories
+        self.games = games
+        self.workers = workers
+        self.seed = seed
+        self.max_steps = max_steps
+        self.quiet = quiet
+
+    def run(self) -> TournamentReport:
+        game = partial(
+            play_game,
+            self.server_factory,
+            self.player_factories,
+            max_steps=self.max_steps,
+            quiet=self.quiet,
+        )
+        games = [(index, self.seed + index) for index in range(self.games)]
+
+        start = time.perf_counter()
+        if self.workers == 0:
+            # run in this process, e.g. to debug a game
+            results = [game(item) for item in games]
+        else:
+            workers = self.workers or os.cpu_count() or 1
+            chunksize = max(1, len(games) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(game, games, chunksize=chunksize))
+        return TournamentReport(results, time.perf_counter() - start)
+
+
+def _hashable(value: Any) -> Any:
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
@@ -0,0 +1,112 @@
+from typing import Optional, List, Dict, Tuple, Set, Iterable, Any
+
+from .columnar import ColumnarPlayerRegistry, np
+from .delta import Patch, diff
+from .registry import PlayerRecord, PlayerRegistry
+
+
+class ChangeTracker:
+    """Players that may have changed since the previous call of ``changes``.
+
+    A record counts as changed when its ``version`` or its action changed.
+    The columns of a ``ColumnarPlayerRegistry`` are compared with their
+    values at the previous call. Values changed through another reference
+    (e.g. a list shared with the world model) are not seen: ``full=True``
+    returns every player, to catch up with them now and then.
+    """
+
+    def __init__(self) -> None:
+        # (version, action, action time) of each player at the last call
+        self._marks: Dict[str, Tuple[int, Any, Any]] = {}
+        # columns at the last call, and the jid of each of their rows
+        self._columns: Dict[str, Any] = {}
+        self._slot_jids: List[str] = []
+
+    def changes(
+        self, registry: PlayerRegistry, full: bool = False
+    ) -> Tuple[List[PlayerRecord], List[str]]:
+        # (records that changed or joined, jids of the players that left)
+        changed_rows = set()
+        if isinstance(registry, ColumnarPlayerRegistry):
+            changed_rows = self._changed_rows(registry)
+        marks = {}
+        changed = []
+        for player in registry:
+            mark = (player.version, player.action, player._action_datetime)
+            old = self._marks.get(player.jid)
+            marks[player.jid] = mark
+            if (
+                full
+                or old is None
+                or old[0] != mark[0]
+                or old[1] is not mark[1]
+                or old[2] != mark[2]
+                or player.jid in changed_rows
+            ):
+                changed.append(player)
+        removed = [player_jid for player_jid in self._marks if player_jid not in marks]
+        self._marks = marks
+        return changed, removed
+
+    def _changed_rows(self, registry: ColumnarPlayerRegistry) -> Set[str]:
+        size = registry.size
+        slot_jids = [player.jid for player in registry.by_slot()]
+        known = min(size, len(self._slot_jids))
+        changed = np.zeros(size, dtype=bool)
+        changed[known:] = True
+        for name, column in registry.columns.items():
+            old = self._columns.get(name)
+            current = column[:size]
+            if old is None or old.shape[1:] != current.shape[1:]:
+                changed[:] = True
+                continue
+            different = current[:known] != old[:known]
+            if different.ndim > 1:
+                different = different.reshape(known, -1).any(axis=1)
+            changed[:known] |= different
+        for slot in range(known):
+            # the row was taken by another player
+            if slot_jids[slot] != self._slot_jids[slot]:
+                changed[slot] = True
+        self._columns = {
+            name: column[:size].copy() for name, column in registry.columns.items()
+        }
+        self._slot_jids = slot_jids
+        return {slot_jids[slot] for slot in np.flatnonzero(changed)}
+
+
+def apply_changes(
+    state: Optional[Dict[str, Any]],
+    world: Dict[str, Any],
+    players: Dict[str, Any],
+    removed: Iterable[str] = (),
+) -> Tuple[Dict[str, Any], Patch]:
+    # `state` is a world model with its players by jid under "players".
+    # Returns the world model made of `world` (without players) and of the
+    # players of `state` updated with `players` and `removed`, and the patch
+    # from `state` to it. The players dict of `state` is reused.
+    old_players = {} if state is None else state["players"]
+    old_world = (
+        {} if state is None else {k: v for k, v in state.items() if k != "players"}
+    )
+    patch = diff(old_world, world)
+    if state is None:
+        patch["set"].append([["players"], {}])
+    for player_jid in removed:
+        if old_players.pop(player_jid, None) is not None:
+            patch["del"].append(["players", player_jid])
+    for player_jid, data in players.items():
+        old = old_players.get(player_jid)
+        if old is None:
+            patch["set"].append([["players", player_jid], data])
+        else:
+            prefix = ["players", player_jid]
+            player_patch = diff(old, data)
+            patch["set"].extend(
+                [prefix + path, value] for path, value in player_patch["set"]
+            )
+            patch["del"].extend(prefix + path for path in player_patch["del"])
+        old_players[player_jid] = data
+    new_state = dict(world)
+    new_state["players"] = old_players
+    return new_state, patch
@@ -0,0 +1,83 @@
+from typing import Optional, Dict
+
+from spade.agent import Agent
+from spade.message import Message
+from spade.behaviour import FSMBehaviour
+
+from .exceptions import AgentAlreadyAttachedError, UnknownRecipientError
+
+
+class LocalTransport:
+    """In-process transport for agents living in the same Python process.
+
+    Agents started on a local transport do not connect to any XMPP server:
+    messages are delivered straight to the behaviour queues of the receiving
+    agent. Every agent of a game must be started on the same transport.
+    """
+
+    def __init__(self) -> None:
+        self._agents: Dict[str, Agent] = {}
+
+    def __contains__(self, jid: str) -> bool:
+        return str(jid) in self._agents
+
+    async def attach(self, agent: Agent) -> None:
+        jid = str(agent.jid)
+        if jid in self._agents:
+            raise AgentAlreadyAttachedError(jid)
+        self._agents[jid] = agent
+        agent.transport = self
+
+        # same start sequence as spade, without the XMPP connection
+        await agent.setup()
+        agent._alive.set()
+        for behaviour in agent.behaviours:
+            if not behaviour.is_running:
+                behaviour.set_agent(agent)
+                if isinstance(behaviour, FSMBehaviour):
+                    for _, state in behaviour.get_states().items():
+                        state.set_agent(agent)
+                behaviour.start()
+
+    async def detach(self, agent: Agent) -> None:
+        for behaviour in agent.behaviours:
+            behaviour.kill()
+        agent._alive.clear()
+        self._agents.pop(str(agent.jid), None)
+
+    async def send(self, msg: Message) -> None:
+        agent = self._agents.get(str(msg.to))
+        if agent is None:
+            raise UnknownRecipientError(str(msg.to))
+        agent.dispatch(msg)
+
+
+class GameAgent(Agent):
+    """Base agent of the game: runs over XMPP, or over a local transport when
+    one is given to ``start``."""
+
+    def __init__(
+        self, jid: str, password: str, verify_security: Optional[bool] = False
+    ) -> None:
+        super().__init__(jid, password, verify_security)
+        self.transport = None
+
+    async def start(
+        self,
+        auto_register: bool = True,
+        transport: Optional[LocalTransport] = None,
+    ) -> None:
+        if transport is None:
+            return await super().start(auto_register)
+        await transport.attach(self)
+
+    async def stop(self) -> None:
+        if self.transport is None:
+            return await super().stop()
+        await self.transport.detach(self)
+
+    async def send_message(self, behaviour, msg: Message) -> None:
+        if self.transport is None:
+            await behaviour.send(msg)
+        else:
+            await self.transport.send(msg)
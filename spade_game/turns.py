@@ -0,0 +1,79 @@
+import heapq
+import itertools
+from abc import ABC, abstractmethod
+from typing import Optional, List, Tuple, Callable, Any
+
+
+class TurnOrder(ABC):
+    """Priority queue of the players waiting for their turn.
+
+    ``next`` gives the player whose turn it is and queues it again for the
+    next round, in O(log n). Within a round, players go by ``key`` and then
+    by the order they were queued in.
+    """
+
+    def __init__(self) -> None:
+        # entries are [(round, *key), insertion count, jid]. A removed player
+        # keeps its entry in the heap with a None jid until it is popped.
+        self._heap: List[list] = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self.round = 0
+
+    @abstractmethod
+    def key(self, player_jid: str) -> Tuple[Any, ...]:
+        raise NotImplementedError("Subclasses must implement this.")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, player_jid: str) -> bool:
+        return player_jid in self._entries
+
+    def add(self, player_jid: str) -> None:
+        # new players play in the current round, after the ones queued before
+        if player_jid not in self._entries:
+            self._push(player_jid, self.round)
+
+    def remove(self, player_jid: str) -> None:
+        entry = self._entries.pop(player_jid, None)
+        if entry is not None:
+            entry[2] = None
+            if len(self._heap) > 2 * len(self._entries) + 16:
+                self._heap = [entry for entry in self._heap if entry[2] is not None]
+                heapq.heapify(self._heap)
+
+    def next(self) -> Optional[str]:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            player_jid = entry[2]
+            if player_jid is None:
+                continue
+            self.round = entry[0][0]
+            self._push(player_jid, self.round + 1)
+            return player_jid
+        return None
+
+    def _push(self, player_jid: str, turn_round: int) -> None:
+        entry = [(turn_round,) + self.key(player_jid), next(self._counter), player_jid]
+        self._entries[player_jid] = entry
+        heapq.heappush(self._heap, entry)
+
+
+class RoundRobinTurnOrder(TurnOrder):
+    """Players take turns in the order they joined."""
+
+    def key(self, player_jid: str) -> Tuple[Any, ...]:
+        return ()
+
+
+class InitiativeTurnOrder(TurnOrder):
+    """In every round, players go by decreasing initiative. The initiative of
+    a player is read when it is queued for a round."""
+
+    def __init__(self, initiative: Callable[[str], float]) -> None:
+        super().__init__()
+        self.initiative = initiative
+
+    def key(self, player_jid: str) -> Tuple[Any, ...]:
+        return (-self.initiative(player_jid),)
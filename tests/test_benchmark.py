@@ -0,0 +1,58 @@
+import importlib.util
+import io
+import json
+import os
+
+import pytest
+
+BENCHMARK = os.path.join(
+    os.path.dirname(__file__), os.pardir, "benchmarks", "bench_server.py"
+)
+
+
+@pytest.fixture(scope="module")
+def bench():
+    # the benchmarks are a script, not a module of the package
+    spec = importlib.util.spec_from_file_location("bench_server", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def entry(name: str, p50: float, **params) -> dict:
+    return {"name": name, "params": params, "p50": p50}
+
+
+def test_compare_lists_the_slower_benchmarks(bench):
+    baseline = {
+        "results": [
+            entry("decode", 1.0, players=2),
+            entry("decode", 1.0, players=100),
+            entry("gone", 1.0),
+        ]
+    }
+    current = {
+        "results": [
+            entry("decode", 1.05, players=2),
+            entry("decode", 1.2, players=100),
+            entry("new", 5.0),
+        ]
+    }
+    report = io.StringIO()
+    regressions = bench.compare(current, baseline, 0.10, report)
+    assert len(regressions) == 1
+    assert '"players": 100' in regressions[0]
+    # benchmarks missing from either run are not compared
+    assert len(report.getvalue().splitlines()) == 2
+
+
+def test_results_are_written_as_json(bench, tmp_path):
+    output = tmp_path / "bench.json"
+    argv = ["--players", "2", "--state-sizes", "16", "--repeat", "1"]
+    assert bench.main(argv + ["--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert "commit" in results["meta"]
+    names = {result["name"] for result in results["results"]}
+    assert {"server._update_message", "player.decode_message"} <= names
+    # a run is never slower than itself by more than 100x
+    assert bench.main(argv + ["--compare", str(output), "--threshold", "100"]) == 0
@@ -0,0 +1,79 @@
+from functools import partial
+
+from spade_game import Server, Player, DecisionCache, shared_cache, play_game
+
+SERVER_JID = "server@localhost"
+
+
+def test_equal_states_get_the_same_key():
+    key = DecisionCache.key
+    assert key({"a": 1, "b": [1, 2]}) == key({"b": [1, 2], "a": 1})
+    assert key({"a": 1}) != key({"a": 2})
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = DecisionCache(max_size=2)
+    assert cache.lookup("a") == (False, None)
+    cache.put("a", None)
+    cache.put("b", {"move": 1})
+    # actions can be None
+    assert cache.lookup("a") == (True, None)
+    cache.put("c", {"move": 2})
+    assert "a" in cache and "b" not in cache and "c" in cache
+    assert cache.stats() == {
+        "size": 2,
+        "max_size": 2,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+        "hit_rate": 0.5,
+    }
+
+
+def test_saved_caches_load_in_the_same_order(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = DecisionCache(path=path)
+    for key in "abc":
+        cache.put(key, {"move": key})
+    cache.lookup("a")
+    cache.save()
+    loaded = DecisionCache(max_size=2, path=path)
+    # "b" was the least recently used
+    assert "b" not in loaded
+    assert loaded.lookup("a") == (True, {"move": "a"})
+
+
+def test_shared_caches_are_found_by_name():
+    assert shared_cache("test") is shared_cache("test")
+    assert shared_cache("test") is not shared_cache("other")
+
+
+class StillServer(Server):
+    # the players always see the same world
+    clock_mode = "virtual"
+    steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+
+    def end_condition(self) -> bool:
+        return self.steps >= 5
+
+
+class CachedPlayer(Player):
+    decision_cache = DecisionCache()
+    decisions = 0
+
+    def decide_action(self) -> dict:
+        type(self).decisions += 1
+        return {"move": 1}
+
+
+def test_players_decide_once_per_state():
+    server = partial(StillServer, SERVER_JID, "password", 1, {}, {}, ["move"])
+    player = partial(CachedPlayer, "p@localhost", "password", SERVER_JID)
+    result = play_game(server, [player], (0, 0))
+    assert result.error is None
+    # the first update has no action yet, the next ones all have the same
+    assert CachedPlayer.decisions == 2
+    assert CachedPlayer.decision_cache.hits == result.decisions - 2
@@ -0,0 +1,111 @@
+import asyncio
+import copy
+
+from spade_game import TurnBasedServer, Player, LocalTransport
+
+SERVER_JID = "server@localhost"
+PLAYER_JIDS = ("a@localhost", "b@localhost")
+
+
+class CountingServer(TurnBasedServer):
+    # each action adds to the count, the game ends when it reaches `target`
+    event_driven_turns = True
+    target = 6
+
+    def __init__(self, checkpoint_path: str) -> None:
+        self.checkpoint_path = checkpoint_path
+        super().__init__(SERVER_JID, "password", 2, {}, {"name": None}, frequency=50)
+        self.world_model["count"] = 0
+
+    def step(self) -> None:
+        self.world_model["count"] += self.world_model["_last_action_performed"]
+        for player in self.world_model["players"]:
+            player["count"] = self.world_model["count"]
+
+    def end_condition(self) -> bool:
+        return self.world_model["count"] >= self.target
+
+    def game_result(self) -> int:
+        return self.world_model["count"]
+
+
+class CountingPlayer(Player):
+    idle_timeout = 0.05
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.decisions = 0
+
+    def decide_action(self) -> int:
+        self.decisions += 1
+        return 1
+
+
+def play_turns(server: CountingServer, turns: int) -> None:
+    # plays without agents, as a tournament does
+    players = {
+        player_jid: CountingPlayer(player_jid, "password", SERVER_JID)
+        for player_jid in PLAYER_JIDS
+    }
+    for player_jid in PLAYER_JIDS:
+        server._process_connection(player_jid, {"name": player_jid})
+    server.run_steps_init()
+    for _ in range(turns):
+        for player_jid in list(server.can_receive_update):
+            player = players[player_jid]
+            player._process_update(
+                SERVER_JID, copy.deepcopy(server._find_player(player_jid).public_data())
+            )
+            server._process_action(player_jid, player._next_action())
+        server._run_step()
+    # the checkpoint is kept, as when the server stops
+    server.checkpointer.close().result()
+
+
+async def resume(server: CountingServer) -> int:
+    transport = LocalTransport()
+    await server.start(transport=transport)
+    players = [
+        CountingPlayer(player_jid, "password", SERVER_JID, {"name": player_jid})
+        for player_jid in PLAYER_JIDS
+    ]
+    for player in players:
+        await player.start(transport=transport)
+    try:
+        for _ in range(1000):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in players + [server]:
+            if agent.is_alive():
+                await agent.stop()
+    return sum(player.decisions for player in players)
+
+
+def test_restore_and_reconnect(tmp_path):
+    path = str(tmp_path / "checkpoint.db")
+    play_turns(CountingServer(path), 3)
+
+    # the server restores the game when it starts, the players connect
+    # again and the game goes on from where it stopped
+    server = CountingServer(path)
+    decisions = asyncio.run(resume(server))
+    assert server.game_result() == CountingServer.target
+    assert decisions == CountingServer.target - 3
+
+
+def test_checkpoint_keeps_every_player(tmp_path):
+    path = str(tmp_path / "checkpoint.db")
+    server = CountingServer(path)
+    server.checkpoint_compact_interval = 2
+    play_turns(server, 5)
+
+    restored = CountingServer(path)
+    assert restored.restore_checkpoint()
+    assert restored.world_model["count"] == 5
+    for player_jid in PLAYER_JIDS:
+        player = restored._find_player(player_jid)
+        assert player["name"] == player_jid
+        assert player["count"] == 5
+    assert restored._current_player_jid == server._current_player_jid
@@ -0,0 +1,115 @@
+import asyncio
+import copy
+
+import pytest
+
+from spade_game import codec as codecs
+from spade_game import Server, Player, LocalTransport
+from spade_game import Codec, register_codec, get_codec
+from spade_game.codec import available_codecs
+from spade_game.exceptions import UnknownCodecError
+
+SERVER_JID = "server@localhost"
+
+CONTENT = {
+    "type": "update",
+    "info": {"position": [1, -2], "name": "é", "hp": 0.5, "items": None},
+}
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_round_trip(name):
+    codec = get_codec(name)
+    body = codec.encode(CONTENT)
+    assert isinstance(body, str)
+    assert codec.decode(body) == CONTENT
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_spliced_part_decodes_as_the_whole_body(name):
+    codec = get_codec(name)
+    shared = {"map": list(range(10))}
+    part = codec.encode_part(shared)
+    body = codec.splice({"type": "update", "round": 3}, "shared", part)
+    assert codec.decode(body) == {"type": "update", "round": 3, "shared": shared}
+
+
+def test_numpy_values_are_sent_as_plain_values():
+    np = pytest.importorskip("numpy")
+    codec = get_codec("json")
+    content = {"grid": np.zeros((2, 2), dtype=np.int32), "hp": np.float64(1.5)}
+    assert codec.decode(codec.encode(content)) == {"grid": [[0, 0], [0, 0]], "hp": 1.5}
+
+
+class ReprCodec(Codec):
+    name = "repr"
+
+    def encode(self, content):
+        return repr(content)
+
+    def decode(self, body):
+        return eval(body)
+
+
+def test_custom_codecs_are_found_by_name(monkeypatch):
+    # registered for this test only
+    monkeypatch.setattr(codecs, "_codecs", dict(codecs._codecs))
+    with pytest.raises(UnknownCodecError):
+        get_codec("repr")
+    register_codec(ReprCodec())
+    codec = get_codec("repr")
+    # codecs without a faster way encode the whole body when splicing
+    body = codec.splice({"type": "update"}, "shared", {"a": 1})
+    assert codec.decode(body) == {"type": "update", "shared": {"a": 1}}
+    # copies of the world model share the codecs
+    assert copy.deepcopy({"codec": codec})["codec"] is codec
+
+
+class FirstToTenServer(Server):
+    def step(self) -> None:
+        for player in self.world_model["players"]:
+            if player["action"] is not None:
+                player["total"] += player["action"]["add"]
+
+    def end_condition(self) -> bool:
+        return any(player["total"] >= 10 for player in self.world_model["players"])
+
+
+class AddingPlayer(Player):
+    codecs = ("msgpack", "json")
+
+    def decide_action(self) -> dict:
+        return {"add": 1}
+
+
+async def play() -> tuple:
+    transport = LocalTransport()
+    server = FirstToTenServer(
+        SERVER_JID,
+        "password",
+        1,
+        {},
+        {"name": None, "total": 0},
+        ["add"],
+        frequency=50,
+    )
+    player = AddingPlayer("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(300):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+    return server, player
+
+
+def test_players_talk_the_first_codec_the_server_knows():
+    pytest.importorskip("msgpack")
+    server, player = asyncio.run(play())
+    assert not server.is_alive()
+    assert player.codec.name == "msgpack"
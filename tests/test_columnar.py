@@ -0,0 +1,80 @@
+import pytest
+
+from spade_game import ColumnarPlayerRegistry, Server
+
+np = pytest.importorskip("numpy")
+
+ATTRIBUTES = {"name": None, "hp": 10, "position": [0.0, 0.0], "tags": [[1], [1, 2]]}
+
+
+def registry_of(count: int, capacity: int = 16) -> ColumnarPlayerRegistry:
+    registry = ColumnarPlayerRegistry.from_attributes(ATTRIBUTES, capacity)
+    for index in range(count):
+        jid = "p{}@localhost".format(index)
+        registry.append(
+            registry.new_record(
+                jid, {"name": str(index), "hp": index, "position": [index, 0.0]}
+            )
+        )
+    return registry
+
+
+def test_numeric_attributes_become_columns():
+    registry = registry_of(0)
+    assert set(registry.columns) == {"hp", "position"}
+    assert registry.columns["position"].shape == (16, 2)
+
+
+def test_records_read_and_write_their_row():
+    registry = registry_of(3)
+    player = registry.get("p1@localhost")
+    assert player["hp"] == 1 and type(player["hp"]) is int
+    assert player["name"] == "1"
+    player["hp"] = 7
+    # vector values are views on the column
+    player["position"][1] = 5.0
+    assert registry.column("hp").tolist() == [0, 7, 2]
+    assert registry.column("position")[1].tolist() == [1.0, 5.0]
+    # vectorized updates are seen by the records
+    registry.column("hp")[:] += 1
+    assert player["hp"] == 8
+    assert player.public_data() == {
+        "name": "1",
+        "hp": 8,
+        "position": [1.0, 5.0],
+        "action": None,
+    }
+
+
+def test_columns_grow_and_stay_contiguous():
+    registry = registry_of(5, capacity=2)
+    assert registry.capacity >= 5
+    assert registry.column("hp").tolist() == [0, 1, 2, 3, 4]
+    removed = registry.get("p1@localhost")
+    registry.remove(removed)
+    # the last player takes the free slot
+    assert registry.column("hp").tolist() == [0, 4, 2, 3]
+    assert [player.jid for player in registry.by_slot()][1] == "p4@localhost"
+    assert registry.get("p4@localhost")["hp"] == 4
+    # a removed record keeps its values
+    assert removed["hp"] == 1 and removed["position"] == [1.0, 0.0]
+
+
+def test_server_stores_players_in_columns():
+    class ColumnServer(Server):
+        player_storage = "columnar"
+
+        def step(self) -> None:
+            self.world_model["players"].column("hp")[:] -= 1
+
+        def end_condition(self) -> bool:
+            return False
+
+    server = ColumnServer("server@localhost", "password", 2, {}, ATTRIBUTES, ["move"])
+    for name in "ab":
+        server._process_connection("{}@localhost".format(name), {"name": name})
+    server.run_steps_init()
+    server._run_step()
+    players = server.world_model["players"]
+    assert isinstance(players, ColumnarPlayerRegistry)
+    assert players.column("hp").tolist() == [9, 9]
@@ -0,0 +1,83 @@
+import asyncio
+
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+
+from spade_game import GameAgent, Player, LocalTransport, get_codec
+
+SERVER_JID = "server@localhost"
+PLAYER_JID = "p@localhost"
+
+
+class Collect(CyclicBehaviour):
+    async def run(self):
+        msg = await self.receive(timeout=1)
+        if msg is not None:
+            self.agent.received.append(get_codec("json").decode(msg.body))
+
+
+class FakeServer(GameAgent):
+    # stands for the server: keeps what the player sends
+    async def setup(self):
+        self.received = []
+        self.add_behaviour(Collect())
+
+
+class TickPlayer(Player):
+    def decide_action(self) -> dict:
+        self.seen.append(self.world_model["tick"])
+        return {"tick": self.world_model["tick"]}
+
+
+def update(tick: int) -> Message:
+    return Message(
+        to=PLAYER_JID,
+        sender=SERVER_JID,
+        body=get_codec("json").encode({"type": "update", "info": {"tick": tick}}),
+        metadata={"performative": "inform", "codec": "json"},
+    )
+
+
+def sent_actions(server: FakeServer) -> list:
+    return [body["info"] for body in server.received if body["type"] == "action"]
+
+
+async def burst(input_mode: str) -> tuple:
+    transport = LocalTransport()
+    server = FakeServer(SERVER_JID, "password")
+    player = TickPlayer(PLAYER_JID, "password", SERVER_JID, {"name": "p"})
+    player.input_mode = input_mode
+    player.seen = []
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        # the player is waiting for its first update
+        for _ in range(100):
+            if server.received:
+                break
+            await asyncio.sleep(0.01)
+        # queued at once, before the player wakes up
+        for tick in range(5):
+            await transport.send(update(tick))
+        for _ in range(100):
+            if sent_actions(server)[-1:] == [{"tick": 4}]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await player.stop()
+        await server.stop()
+    return player, sent_actions(server)
+
+
+def test_conflated_player_decides_on_the_latest_update():
+    player, actions = asyncio.run(burst("conflate"))
+    assert player.seen == [4]
+    assert actions == [{"tick": 4}]
+    assert player.superseded_updates == 4
+
+
+def test_player_decides_on_every_update_by_default():
+    player, actions = asyncio.run(burst("every"))
+    assert player.seen == [0, 1, 2, 3, 4]
+    assert actions == [{"tick": tick} for tick in range(5)]
+    assert player.superseded_updates == 0
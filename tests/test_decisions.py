@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+from spade_game import Server, Player, LocalTransport
+
+SERVER_JID = "server@localhost"
+
+
+class SumServer(Server):
+    # keeps the moves it was sent; ends once they add up to 3
+    total = 0
+
+    def _is_action_valid(self, content) -> bool:
+        self.moves.append(content["move"])
+        return True
+
+    def step(self) -> None:
+        for player in self.world_model["players"]:
+            if player["action"] is not None:
+                self.total += player["action"]["move"]
+
+    def end_condition(self) -> bool:
+        return self.total >= 3
+
+
+class ThreadPlayer(Player):
+    decision_mode = "thread"
+    decisions = 0
+
+    def decide_action(self) -> dict:
+        self.decisions += 1
+        self.thread_name = threading.current_thread().name
+        return {"move": 1}
+
+
+class SlowPlayer(Player):
+    decision_mode = "thread"
+    decision_timeout = 0.05
+
+    def decide_action(self) -> dict:
+        self.propose_action({"move": 1})
+        time.sleep(0.2)
+        return {"move": 100}
+
+
+def decide_in_process(world_model: dict) -> dict:
+    return {"move": 1}
+
+
+class ProcessPlayer(Player):
+    decision_mode = "process"
+    decision_function = decide_in_process
+
+
+async def play(player_class) -> tuple:
+    transport = LocalTransport()
+    server = SumServer(
+        SERVER_JID, "password", 1, {}, {"name": None}, ["move"], frequency=50
+    )
+    server.moves = []
+    player = player_class("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(500):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+    return server, player
+
+
+def test_thread_decisions_keep_the_attributes_they_set():
+    server, player = asyncio.run(play(ThreadPlayer))
+    assert not server.is_alive()
+    assert player.thread_name.startswith("decide-")
+    assert player.decisions == len(server.moves) >= 3
+
+
+def test_timed_out_decisions_send_the_proposed_action():
+    server, player = asyncio.run(play(SlowPlayer))
+    assert not server.is_alive()
+    assert player.decisions_timed_out >= 1
+    assert set(server.moves) == {1}
+
+
+def test_process_decisions_call_the_decision_function():
+    server, player = asyncio.run(play(ProcessPlayer))
+    assert not server.is_alive()
+    assert set(server.moves) == {1}
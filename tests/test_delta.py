@@ -0,0 +1,101 @@
+import asyncio
+
+from spade_game import Server, Player, LocalTransport
+from spade_game.delta import DiffCache, diff, apply_patch, is_empty
+
+SERVER_JID = "server@localhost"
+
+
+def round_trip(old, new):
+    patch = diff(old, new, DiffCache())
+    return apply_patch(DiffCache().copy(old), patch), patch
+
+
+def test_patch_turns_the_old_state_into_the_new_one():
+    old = {"position": [0, 0], "map": list(range(100)), "name": "a", "gone": 1}
+    new = {"position": [0, 1], "map": list(range(100)), "name": "b", "hp": 3}
+    new["map"][42] = -1
+    state, patch = round_trip(old, new)
+    assert state == new
+    assert ["gone"] in patch["del"]
+    assert [["map", 42], -1] in patch["set"]
+
+
+def test_unchanged_state_gives_an_empty_patch():
+    state = {"map": list(range(4096)), "grid": [[0, 1], [2, 3]]}
+    assert is_empty(diff(state, DiffCache().copy(state)))
+
+
+def test_type_changes_are_kept():
+    # 0 and 0.0 are equal but not encoded the same way
+    state, patch = round_trip({"values": [0, 1, 2]}, {"values": [0.0, 1, 2]})
+    assert patch["set"] == [[["values", 0], 0.0]]
+    assert type(state["values"][0]) is float
+
+
+def test_mostly_changed_list_is_sent_whole():
+    old = {"values": list(range(10))}
+    new = {"values": [value + 1 for value in range(10)]}
+    state, patch = round_trip(old, new)
+    assert patch["set"] == [[["values"], new["values"]]]
+    assert state == new
+
+
+def test_copies_do_not_follow_the_original():
+    shared = list(range(64))
+    state = {"a": shared, "b": shared, "nested": {"grid": [[1, 2]]}}
+    copied = DiffCache().copy(state)
+    shared[0] = -1
+    state["nested"]["grid"][0][0] = -1
+    assert copied == {
+        "a": list(range(64)),
+        "b": list(range(64)),
+        "nested": {"grid": [[1, 2]]},
+    }
+    # objects seen twice are copied once
+    assert copied["a"] is copied["b"]
+
+
+class StillServer(Server):
+    # real-time game where nothing the player sees ever changes
+    update_mode = "delta"
+    steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+
+    def end_condition(self) -> bool:
+        return self.steps >= 10
+
+
+class CountingPlayer(Player):
+    decisions = 0
+
+    def decide_action(self) -> dict:
+        self.decisions += 1
+        return {"move": 0}
+
+
+async def play() -> CountingPlayer:
+    transport = LocalTransport()
+    server = StillServer(
+        SERVER_JID, "password", 1, {}, {"name": None}, ["move"], frequency=50
+    )
+    player = CountingPlayer("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(300):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+    return player
+
+
+def test_players_whose_view_did_not_change_keep_acting():
+    player = asyncio.run(play())
+    assert player.decisions >= 5
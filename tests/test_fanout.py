@@ -0,0 +1,44 @@
+import asyncio
+
+from spade.message import Message
+
+from spade_game.fanout import fan_out
+
+
+def messages(count: int) -> list:
+    return [Message(to="p{}@localhost".format(index)) for index in range(count)]
+
+
+def test_sends_every_message_at_most_concurrency_at_a_time():
+    running = 0
+    peak = 0
+
+    async def send(msg: Message) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    report = asyncio.run(fan_out(send, messages(20), concurrency=4))
+    assert report.ok
+    assert report.sent == 20
+    assert peak == 4
+
+
+def test_stuck_and_failing_sends_do_not_hold_the_others():
+    async def send(msg: Message) -> None:
+        if str(msg.to) == "p0@localhost":
+            await asyncio.sleep(10)
+        elif str(msg.to) == "p1@localhost":
+            raise ConnectionError("gone")
+        elif str(msg.to) == "p2@localhost":
+            await asyncio.sleep(0.05)
+
+    report = asyncio.run(fan_out(send, messages(5), timeout=0.2, slow_threshold=0.03))
+    assert not report.ok
+    assert report.sent == 3
+    assert report.timed_out == ["p0@localhost"]
+    assert report.failed == ["p1@localhost"]
+    assert report.slow == ["p2@localhost"]
+    assert report.duration < 1
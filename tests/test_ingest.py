@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from spade.message import Message
+
+from spade_game import Server, Player, LocalTransport, get_codec
+
+SERVER_JID = "server@localhost"
+
+
+class CountingServer(Server):
+    steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+
+    def end_condition(self) -> bool:
+        return self.steps >= 5
+
+
+class IdlePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 0}
+
+
+def new_server(server_class=CountingServer, **attributes) -> Server:
+    server = server_class(
+        SERVER_JID, "password", 1, {}, {"name": None}, ["move"], frequency=50
+    )
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    return server
+
+
+async def play(server: Server) -> None:
+    transport = LocalTransport()
+    player = IdlePlayer("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(300):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+
+
+def test_input_waits_until_the_next_tick():
+    server = new_server()
+    assert server.input_timeout() == server.idle_timeout
+    server._process_connection("p@localhost", {"name": "p"})
+    server.run_steps_init()
+    assert 0 < server.input_timeout() <= 1 / 50
+    # a tick that fell due after the step condition was checked is not slept
+    # through
+    time.sleep(1 / 50)
+    assert server.input_timeout() == 0
+
+
+def test_messages_wake_the_input_before_its_timeout():
+    # with nothing to wake it, the server would wait 5 seconds for the player
+    server = new_server(idle_timeout=5.0)
+    start = time.monotonic()
+    asyncio.run(play(server))
+    assert not server.is_alive()
+    assert server.steps == 5
+    assert time.monotonic() - start < 2.5
+
+
+class RecordingServer(CountingServer):
+    # keeps every action it was asked to validate
+    def _is_action_valid(self, content) -> bool:
+        self.validated.append(content)
+        return True
+
+
+def action(sender: str, move: int) -> Message:
+    return Message(
+        to=SERVER_JID,
+        sender=sender,
+        body=get_codec("json").encode({"type": "action", "info": {"move": move}}),
+        metadata={"performative": "inform", "codec": "json"},
+    )
+
+
+def running_server(**attributes) -> RecordingServer:
+    server = new_server(RecordingServer, num_players_needed=2, **attributes)
+    server.validated = []
+    for jid in ("p@localhost", "q@localhost"):
+        server._process_connection(jid, {"name": jid})
+    server.run_steps_init()
+    return server
+
+
+def test_batch_processes_every_message_in_order():
+    server = running_server()
+    broken = Message(to=SERVER_JID, sender="p@localhost", body="{")
+    server.ingest(
+        [
+            action("p@localhost", 1),
+            broken,
+            action("q@localhost", 2),
+            action("p@localhost", 3),
+        ]
+    )
+    assert server.validated == [{"move": 1}, {"move": 2}, {"move": 3}]
+    assert server._find_player("p@localhost")["action"] == {"move": 3}
+    stats = server.ingest_stats
+    assert (stats["batches"], stats["messages"], stats["max_batch"]) == (1, 4, 4)
+    assert stats["errors"] == 1
+
+
+def test_coalescing_keeps_the_last_action_of_each_player():
+    server = running_server(coalesce_actions=True)
+    server.ingest(
+        [action("p@localhost", 1), action("q@localhost", 2), action("p@localhost", 3)]
+    )
+    assert server.validated == [{"move": 2}, {"move": 3}]
+    assert server._find_player("p@localhost")["action"] == {"move": 3}
+    assert server.ingest_stats["coalesced"] == 1
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from spade_game import Server, Player, SpatialGrid, play_game
+
+SERVER_JID = "server@localhost"
+
+
+def test_query_finds_the_keys_within_the_radius():
+    rng = random.Random(1)
+    points = {
+        index: (rng.uniform(-50, 50), rng.uniform(-50, 50)) for index in range(300)
+    }
+    for cell_size in (1.0, 7.5, 100.0):
+        grid = SpatialGrid(cell_size)
+        grid.rebuild(points.items())
+        for _ in range(20):
+            center = (rng.uniform(-60, 60), rng.uniform(-60, 60))
+            radius = rng.uniform(0, 30)
+            expected = {
+                key
+                for key, (x, y) in points.items()
+                if (x - center[0]) ** 2 + (y - center[1]) ** 2 <= radius**2
+            }
+            assert set(grid.query(center, radius)) == expected
+
+
+def test_keys_move_and_leave():
+    grid = SpatialGrid(2.0)
+    grid.insert("a", (0, 0))
+    grid.insert("b", (3, 4))
+    # borders are included
+    assert sorted(grid.query((0, 0), 5)) == ["a", "b"]
+    grid.insert("b", (30, 40))
+    assert grid.query((0, 0), 5) == ["a"] and len(grid) == 2
+    grid.remove("b")
+    assert "b" not in grid and grid.query((30, 40), 1) == []
+    with pytest.raises(ValueError):
+        SpatialGrid(0)
+
+
+class FieldServer(Server):
+    # players stand still where their name says
+    interest_radius = 5
+    clock_mode = "virtual"
+    steps = 0
+
+    def __init__(self) -> None:
+        super().__init__(
+            SERVER_JID, "password", 3, {}, {"name": None, "position": None}, ["move"]
+        )
+
+    def step(self) -> None:
+        self.steps += 1
+
+    def end_condition(self) -> bool:
+        return self.steps >= 2
+
+
+class LookingPlayer(Player):
+    def __init__(self, name: str, position: list, seen: dict) -> None:
+        super().__init__(
+            "{}@localhost".format(name),
+            "password",
+            SERVER_JID,
+            {"name": name, "position": position},
+        )
+        self.seen = seen.setdefault(name, [])
+
+    def decide_action(self) -> dict:
+        self.seen.append(sorted(self.world_model.get("nearby", {})))
+        return {"move": 0}
+
+
+def test_players_only_see_the_players_near_them():
+    seen = {}
+    players = [
+        lambda: LookingPlayer("a", [0, 0], seen),
+        lambda: LookingPlayer("b", [3, 0], seen),
+        lambda: LookingPlayer("c", [20, 0], seen),
+    ]
+    result = play_game(FieldServer, players, (0, 0))
+    assert result.error is None
+    assert seen["a"] and all(view == ["b@localhost"] for view in seen["a"])
+    assert seen["b"] and all(view == ["a@localhost"] for view in seen["b"])
+    assert seen["c"] and all(view == [] for view in seen["c"])
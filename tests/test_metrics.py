@@ -0,0 +1,122 @@
+import asyncio
+import json
+import socket
+
+from spade_game import Server, Player, LocalTransport, Metrics, MetricsHTTPServer
+
+SERVER_JID = "server@localhost"
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    metrics.inc("messages")
+    metrics.set_gauge("mailbox_depth", 3)
+    with metrics.timed("state_seconds", state="input"):
+        pass
+    assert metrics.snapshot() == {"counters": {}, "gauges": {}, "histograms": {}}
+
+
+def test_values_are_kept_by_name_and_labels():
+    metrics = Metrics(enabled=True)
+    metrics.inc("rejected", reason="late")
+    metrics.inc("rejected", 2, reason="late")
+    metrics.inc("rejected", reason="invalid")
+    metrics.set_gauge("mailbox_depth", 3)
+    metrics.observe("step_seconds", 0.002)
+    metrics.observe("step_seconds", 2.0)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"rejected": {"reason=invalid": 1, "reason=late": 3}}
+    assert snapshot["gauges"] == {"mailbox_depth": {"": 3}}
+    histogram = snapshot["histograms"]["step_seconds"][""]
+    assert histogram["count"] == 2
+    assert histogram["buckets"]["0.001"] == 0
+    assert histogram["buckets"]["0.005"] == 1
+    assert histogram["buckets"]["+Inf"] == 2
+
+    text = metrics.render_prometheus()
+    assert "# TYPE spade_game_rejected counter" in text
+    assert 'spade_game_rejected{reason="late"} 3' in text
+    assert 'spade_game_step_seconds_bucket{le="+Inf"} 2' in text
+    assert "spade_game_step_seconds_count 2" in text
+
+    metrics.reset()
+    assert metrics.snapshot()["counters"] == {}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port: int, path: str) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write("GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n".format(path).encode())
+    await writer.drain()
+    response = (await reader.read()).decode("utf-8")
+    writer.close()
+    head, _, body = response.partition("\r\n\r\n")
+    return head.splitlines()[0], body
+
+
+async def serve() -> list:
+    metrics = Metrics(enabled=True)
+    metrics.inc("messages")
+    port = free_port()
+    http = MetricsHTTPServer(metrics, lambda: {"tick": 7}, port=port)
+    await http.start()
+    try:
+        return [await fetch(port, path) for path in ("/metrics", "/stats", "/")]
+    finally:
+        await http.stop()
+
+
+def test_http_server_serves_metrics_and_stats():
+    (status, text), (_, stats), (missing, _) = asyncio.run(serve())
+    assert status == "HTTP/1.1 200 OK"
+    assert "spade_game_messages 1" in text
+    assert json.loads(stats) == {"tick": 7}
+    assert missing == "HTTP/1.1 404 Not Found"
+
+
+class ShortServer(Server):
+    metrics_enabled = True
+    steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+
+    def end_condition(self) -> bool:
+        return self.steps >= 3
+
+
+class IdlePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 0}
+
+
+async def play() -> Server:
+    transport = LocalTransport()
+    server = ShortServer(
+        SERVER_JID, "password", 1, {}, {"name": None}, ["move"], frequency=50
+    )
+    player = IdlePlayer("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(300):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+    return server
+
+
+def test_server_times_its_states():
+    server = asyncio.run(play())
+    states = server.metrics.snapshot()["histograms"]["state_seconds"]
+    assert set(states) == {"state=input", "state=output", "state=step"}
+    assert states["state=step"]["count"] == 3
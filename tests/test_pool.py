@@ -0,0 +1,89 @@
+import asyncio
+
+from spade_game import Server, Player, PlayerPool, LocalTransport
+
+SERVER_JID = "server@localhost"
+POOL_JID = "pool@localhost"
+
+
+class CountingServer(Server):
+    # every player adds its move to its own total; the board is shared
+    shared_recipient = POOL_JID
+
+    def step(self) -> None:
+        self.world_model["tick"] += 1
+        for player in self.world_model["players"]:
+            if player["action"] is not None:
+                player["total"] += player["action"]["move"]
+            player["tick"] = self.world_model["tick"]
+
+    def shared_state(self) -> dict:
+        return {"tick": self.world_model["tick"]}
+
+    def end_condition(self) -> bool:
+        return self.world_model["tick"] >= 10
+
+
+class MovePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 1}
+
+
+class BrokenPlayer(Player):
+    def decide_action(self) -> dict:
+        raise RuntimeError("no idea")
+
+
+async def play(players: list) -> CountingServer:
+    transport = LocalTransport()
+    server = CountingServer(
+        SERVER_JID,
+        "password",
+        len(players),
+        {"tick": 0},
+        {"name": None, "tick": 0, "total": 0},
+        ["move"],
+        frequency=50,
+    )
+    pool = PlayerPool(POOL_JID, "password", players)
+    await server.start(transport=transport)
+    await pool.start(transport=transport)
+    try:
+        for _ in range(500):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (pool, server):
+            if agent.is_alive():
+                await agent.stop()
+    return server
+
+
+def new_player(cls: type, name: str) -> Player:
+    return cls("{}@localhost".format(name), "password", SERVER_JID, {"name": name})
+
+
+def test_pool_plays_for_its_players():
+    players = [new_player(MovePlayer, str(i)) for i in range(3)]
+    server = asyncio.run(play(players))
+    assert not server.is_alive()
+    for player in players:
+        assert player.world_model["total"] > 0
+        assert player.shared_state is not None
+
+
+def test_failing_player_does_not_stop_the_pool():
+    players = [new_player(MovePlayer, "good"), new_player(BrokenPlayer, "bad")]
+    players[1].action = {"move": 0}
+    server = asyncio.run(play(players))
+    # the game ended: the pool kept answering for both players
+    assert server.world_model["tick"] >= 10
+    assert players[0].world_model["total"] > 0
+    assert players[1].action == {"move": 0}
+
+
+def test_shared_section_is_decoded_once_for_the_pool():
+    players = [new_player(MovePlayer, str(i)) for i in range(3)]
+    asyncio.run(play(players))
+    assert players[0].shared_state is players[1].shared_state
@@ -0,0 +1,66 @@
+import pytest
+
+from spade_game import PlayerRecord, PlayerRegistry
+from spade_game.exceptions import PlayerAlreadyConnectedError, PlayerNotFoundError
+
+
+def record(jid: str, **attributes) -> PlayerRecord:
+    return PlayerRecord(jid, dict(attributes))
+
+
+def test_record_reads_and_writes_like_the_player_dict():
+    player = record("a@localhost", score=1, _secret=2)
+    player["score"] += 1
+    player["action"] = {"move": "up"}
+    assert player["jid"] == "a@localhost"
+    assert player.copy() == {
+        "score": 2,
+        "_secret": 2,
+        "jid": "a@localhost",
+        "action": {"move": "up"},
+        "_action_datetime": None,
+    }
+    # the jid and control attributes are not sent to the player
+    assert player.public_data() == {"score": 2, "action": {"move": "up"}}
+    with pytest.raises(KeyError):
+        del player["jid"]
+
+
+def test_version_counts_possible_changes():
+    player = record("a@localhost", score=1, position=[0, 0])
+    version = player.version
+    player["score"]
+    player.peek("position")
+    assert player.version == version
+    # a list read by key may be changed in place
+    player["position"][0] = 1
+    assert player.version > version
+    version = player.version
+    player["score"] = 2
+    assert player.version > version
+
+
+def test_registry_finds_players_by_jid_in_order_of_connection():
+    registry = PlayerRegistry()
+    players = [record("{}@localhost".format(name)) for name in "cab"]
+    for player in players:
+        registry.append(player)
+    assert list(registry) == players
+    assert registry[1] is players[1]
+    assert registry.get("a@localhost") is players[1]
+    assert registry.get("z@localhost") is None
+    assert "b@localhost" in registry and players[2] in registry
+    registry.remove("a@localhost")
+    registry.remove(players[2])
+    assert registry.jids() == ["c@localhost"]
+
+
+def test_registry_rejects_duplicates_and_unknown_players():
+    registry = PlayerRegistry()
+    registry.append(record("a@localhost"))
+    with pytest.raises(PlayerAlreadyConnectedError):
+        registry.append(record("a@localhost"))
+    with pytest.raises(PlayerNotFoundError):
+        registry.remove("b@localhost")
+    # a record that was replaced is not in the registry
+    assert record("a@localhost") not in registry
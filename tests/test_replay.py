@@ -0,0 +1,102 @@
+import copy
+from functools import partial
+
+import pytest
+
+from spade_game import Server, Player, Replay, ReplayRecorder, play_game
+from spade_game.replay import msgpack
+
+SERVER_JID = "server@localhost"
+ENCODINGS = ["json"] + (["msgpack"] if msgpack is not None else [])
+
+
+def recorded_worlds() -> list:
+    # world models after each tick, players by jid; a player leaves at tick 4
+    world = {"tick": 0, "players": {"a": {"x": 0}, "b": {"x": 0, "items": []}}}
+    worlds = [copy.deepcopy(world)]
+    for tick in range(1, 8):
+        world["tick"] = tick
+        world["players"]["a"]["x"] += 1
+        if tick == 4:
+            del world["players"]["b"]
+        elif "b" in world["players"]:
+            world["players"]["b"]["items"].append(tick)
+        worlds.append(copy.deepcopy(world))
+    return worlds
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_replay_seeks_to_every_tick(tmp_path, encoding):
+    path = str(tmp_path / "game.replay")
+    worlds = recorded_worlds()
+    recorder = ReplayRecorder(path, keyframe_interval=3, encoding=encoding)
+    recorder.start(worlds[0])
+    for tick, world in enumerate(worlds[1:], 1):
+        recorder.record_action("a", {"move": tick})
+        recorder.record_tick(world)
+    recorder.close({"winner": "a"})
+
+    with Replay(path) as replay:
+        assert replay.ticks == 7
+        assert replay.finished and replay.result == {"winner": "a"}
+        assert replay.initial_state() == worlds[0]
+        # from the closest keyframe, or from the start
+        for tick in (7, 0, 5, 3, 1):
+            assert replay.state_at(tick) == worlds[tick]
+        assert replay.actions(2) == [("a", {"move": 2})]
+        frames = [(tick, copy.deepcopy(state)) for tick, _, state in replay.frames(2)]
+        assert frames == [(tick, worlds[tick]) for tick in range(3, 8)]
+        with pytest.raises(IndexError):
+            replay.state_at(8)
+
+
+class RaceServer(Server):
+    clock_mode = "virtual"
+
+    def step(self) -> None:
+        for player in self.world_model["players"]:
+            player["total"] += player["action"]["move"]
+
+    def end_condition(self) -> bool:
+        return any(player["total"] >= 5 for player in self.world_model["players"])
+
+    def game_result(self) -> str:
+        return max(self.world_model["players"], key=lambda p: p["total"])["jid"]
+
+
+class MovePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": self.initial_attributes["speed"]}
+
+
+def test_games_are_recorded(tmp_path):
+    path = str(tmp_path / "race.replay")
+    server_class = type("RecordedServer", (RaceServer,), {"replay_path": path})
+    server = partial(
+        server_class,
+        SERVER_JID,
+        "password",
+        2,
+        {},
+        {"speed": None, "total": 0},
+        ["move"],
+    )
+    players = [
+        partial(MovePlayer, "a@localhost", "password", SERVER_JID, {"speed": 1}),
+        partial(MovePlayer, "b@localhost", "password", SERVER_JID, {"speed": 2}),
+    ]
+    result = play_game(server, players, (0, 0))
+    assert result.error is None
+
+    with Replay(path) as replay:
+        assert replay.result == result.result == "b@localhost"
+        assert replay.ticks == result.steps == 3
+        assert replay.actions(1) == [
+            ("a@localhost", {"move": 1}),
+            ("b@localhost", {"move": 2}),
+        ]
+        totals = {
+            jid: player["total"]
+            for jid, player in replay.state_at(replay.ticks)["players"].items()
+        }
+        assert totals == {"a@localhost": 3, "b@localhost": 6}
@@ -0,0 +1,94 @@
+import asyncio
+
+from spade.message import Message
+
+from spade_game import Server, Player, RoomServer, LocalTransport, get_codec
+
+ROOMS_JID = "rooms@localhost"
+
+
+class RaceServer(Server):
+    # first player to reach 3 wins
+    def step(self) -> None:
+        for player in self.world_model["players"]:
+            if player["action"] is not None:
+                player["total"] += player["action"]["move"]
+
+    def end_condition(self) -> bool:
+        return any(player["total"] >= 3 for player in self.world_model["players"])
+
+
+def new_room(room_id: str) -> RaceServer:
+    return RaceServer(
+        "room{}@localhost".format(room_id),
+        "password",
+        2,
+        {},
+        {"name": None, "total": 0},
+        ["move"],
+        frequency=50,
+    )
+
+
+class RacePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 1}
+
+
+def connection(sender: str) -> Message:
+    return Message(
+        to=ROOMS_JID,
+        sender=sender,
+        body=get_codec("json").encode({"type": "connect", "info": {"name": sender}}),
+        metadata={"performative": "inform", "codec": "json"},
+    )
+
+
+def test_players_fill_one_room_before_the_next():
+    rooms = RoomServer(ROOMS_JID, "password", new_room)
+    rooms.ingest([connection("p{}@localhost".format(index)) for index in range(3)])
+    assert sorted(rooms.rooms) == ["0", "1"]
+    assert rooms.rooms["0"]._all_player_jids() == ["p0@localhost", "p1@localhost"]
+    assert rooms.rooms["1"]._all_player_jids() == ["p2@localhost"]
+    # a player that is already in a room does not join another one
+    rooms.ingest([connection("p2@localhost")])
+    assert rooms.rooms["1"].num_players == 1
+
+
+async def play(num_players: int) -> tuple:
+    transport = LocalTransport()
+    rooms = RoomServer(ROOMS_JID, "password", new_room)
+    players = [
+        RacePlayer(
+            "p{}@localhost".format(index),
+            "password",
+            ROOMS_JID,
+            {"name": str(index)},
+        )
+        for index in range(num_players)
+    ]
+    await rooms.start(transport=transport)
+    try:
+        for player in players:
+            await player.start(transport=transport)
+        for _ in range(300):
+            if not any(player.is_alive() for player in players):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in players + [rooms]:
+            if agent.is_alive():
+                await agent.stop()
+    return rooms, players
+
+
+def test_finished_rooms_are_recycled():
+    rooms, players = asyncio.run(play(4))
+    assert not any(player.is_alive() for player in players)
+    assert rooms.finished_rooms == 2
+    assert rooms.rooms == {}
+    # players were told which room they played in
+    assert sorted(player.room_id for player in players) == ["0", "0", "1", "1"]
+    # the ids of the finished rooms are given to the next ones
+    rooms.ingest([connection("p9@localhost")])
+    assert list(rooms.rooms) in (["0"], ["1"])
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+
+from spade_game import Server
+from spade_game.scheduler import TickScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.time = 100.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+class IdleServer(Server):
+    def step(self) -> None:
+        pass
+
+    def end_condition(self) -> bool:
+        return False
+
+
+def test_ticks_do_not_drift():
+    clock = FakeClock()
+    scheduler = TickScheduler(0.1, clock=clock)
+    scheduler.start()
+    assert not scheduler.due()
+    for n in range(1, 4):
+        # each tick runs a bit late, but the next one keeps its slot
+        clock.time = 100.0 + n * 0.1 + 0.03
+        assert scheduler.due()
+        scheduler.tick()
+        assert abs(scheduler.next_tick - (100.0 + (n + 1) * 0.1)) < 1e-9
+    assert scheduler.stats()["ticks"] == 3
+    assert scheduler.stats()["overruns"] == 0
+
+
+def test_catch_up_runs_late_ticks_up_to_a_bound():
+    clock = FakeClock()
+    scheduler = TickScheduler(1.0, policy="catch_up", max_catch_up=2, clock=clock)
+    scheduler.start()
+    clock.time += 6.5
+    scheduler.tick()
+    # ticks 2 to 6 are late: 2 of them run back to back, the others are dropped
+    assert scheduler.skipped == 3
+    assert scheduler.due()
+    scheduler.tick()
+    assert scheduler.due()
+    scheduler.tick()
+    assert not scheduler.due()
+    # the first two ran more than a period late
+    assert scheduler.stats()["overruns"] == 2
+
+
+def test_skip_drops_late_ticks():
+    clock = FakeClock()
+    scheduler = TickScheduler(1.0, policy="skip", clock=clock)
+    scheduler.start()
+    clock.time += 3.5
+    scheduler.tick()
+    assert scheduler.skipped == 2
+    assert not scheduler.due()
+    assert scheduler.time_until_next() == 0.5
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        TickScheduler(1.0, policy="sometimes")
+
+
+def test_server_keeps_step_timing_attributes():
+    server = IdleServer("server@localhost", "password", 1, {}, {}, frequency=4)
+    assert server.period_timedelta == timedelta(seconds=0.25)
+    wait = server.next_step_time - server.clock.now()
+    assert timedelta(0) <= wait <= timedelta(seconds=0.25)
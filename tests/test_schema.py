@@ -0,0 +1,79 @@
+import pytest
+from spade.message import Message
+
+from spade_game import Server, Schema, TupleSchema, Field, get_codec
+from spade_game.exceptions import InvalidContentError
+
+SERVER_JID = "server@localhost"
+
+
+def test_schema_checks_the_keys_in_any_order():
+    schema = Schema(["dx", "dy"])
+    assert schema.validate({"dy": 1, "dx": "anything"}) is None
+    assert schema.validate({"dx": 1}) == ("missing_key", "dy")
+    assert schema.validate({"dx": 1, "dy": 1, "dz": 1}) == ("unknown_key", "dz")
+    assert schema.validate([1, 1]) == ("not_a_dict", None)
+    assert Schema(["dx"], allow_extra=True).validate({"dx": 1, "dz": 1}) is None
+
+
+def test_fields_check_types_ranges_and_choices():
+    schema = Schema(
+        {
+            "dx": Field(int, -1, 1),
+            "speed": Field((int, float), maximum=2.5),
+            "mode": Field(choices=["walk", "run"]),
+            "note": Field(str, optional=True),
+        }
+    )
+    valid = {"dx": 0, "speed": 2.5, "mode": "run"}
+    assert schema.validate(valid) is None
+    assert schema.validate(dict(valid, note="hi")) is None
+    assert schema.validate(dict(valid, dx=2)) == ("out_of_range", "dx")
+    assert schema.validate(dict(valid, dx=1.0)) == ("wrong_type", "dx")
+    # bool is an int, but not a valid one unless asked for
+    assert schema.validate(dict(valid, dx=True)) == ("wrong_type", "dx")
+    assert schema.validate(dict(valid, mode="fly")) == ("not_in_choices", "mode")
+    assert schema.validate(dict(valid, mode=["run"])) == ("not_in_choices", "mode")
+    assert schema.validate(dict(valid, note=3)) == ("wrong_type", "note")
+    # values that can not be compared to the bounds
+    assert Schema({"x": Field(minimum=0)}).validate({"x": "a"}) == ("wrong_type", "x")
+
+
+def test_tuple_schema_checks_each_item():
+    schema = TupleSchema([Field(int, 0, 2), Field(int, 0, 2), None])
+    assert schema.validate([0, 2, "any"]) is None
+    assert schema.validate((1, 1, None)) is None
+    assert schema.validate([0, 3, None]) == ("out_of_range", 1)
+    assert schema.validate([0, 1]) == ("wrong_length", 2)
+    assert schema.validate({"x": 0}) == ("not_a_sequence", None)
+
+
+class BoardServer(Server):
+    action_schema = TupleSchema([Field(int, 0, 2), Field(int, 0, 2)])
+
+    def step(self) -> None:
+        pass
+
+    def end_condition(self) -> bool:
+        return False
+
+
+def action(info) -> Message:
+    return Message(
+        to=SERVER_JID,
+        sender="p@localhost",
+        body=get_codec("json").encode({"type": "action", "info": info}),
+        metadata={"performative": "inform", "codec": "json"},
+    )
+
+
+def test_server_counts_the_rejected_actions():
+    server = BoardServer(SERVER_JID, "password", 1, {}, {"name": None})
+    with pytest.raises(InvalidContentError):
+        server._process_connection("p@localhost", {"name": "p", "extra": 1})
+    assert server.rejections["connections"] == {"unknown_key": 1}
+    server._process_connection("p@localhost", {"name": "p"})
+    server.run_steps_init()
+    server.ingest([action([1, 5]), action("center"), action([2, 0])])
+    assert server.rejections["actions"] == {"out_of_range": 1, "not_a_sequence": 1}
+    assert server._find_player("p@localhost")["action"] == [2, 0]
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from spade.message import Message
+
+from spade_game import Player
+
+SERVER_JID = "server@localhost"
+RELAY_JID = "relay@localhost"
+
+
+class RelayedPlayer(Player):
+    shared_sender = RELAY_JID
+
+    def decide_action(self) -> None:
+        return None
+
+
+def receive(player: Player, sender: str, body: dict) -> str:
+    msg = Message(to=str(player.jid), sender=sender, body=json.dumps(body))
+    return asyncio.run(player.decode_message(msg))
+
+
+def update(round_id: int, tick: int) -> dict:
+    return {"type": "update", "seq": tick, "round": round_id, "info": {"tick": tick}}
+
+
+def shared(round_id: int, tick: int) -> dict:
+    return {"type": "shared", "round": round_id, "info": {"tick": tick}}
+
+
+def test_update_waits_for_its_shared_section():
+    player = RelayedPlayer("p@localhost", "password", SERVER_JID)
+    assert receive(player, SERVER_JID, update(1, 1)) == "shared"
+    assert receive(player, RELAY_JID, shared(1, 1)) == "update"
+    assert player.shared_state == {"tick": 1}
+
+
+def test_shared_section_before_its_update():
+    player = RelayedPlayer("p@localhost", "password", SERVER_JID)
+    assert receive(player, RELAY_JID, shared(1, 1)) == "shared"
+    assert receive(player, RELAY_JID, shared(2, 2)) == "shared"
+    assert player.shared_state is None
+
+    assert receive(player, SERVER_JID, update(1, 1)) == "update"
+    assert player.shared_state == {"tick": 1}
+    assert receive(player, SERVER_JID, update(2, 2)) == "update"
+    assert player.shared_state == {"tick": 2}
+
+
+def test_cache_state_holds_shared_state():
+    player = RelayedPlayer("p@localhost", "password", SERVER_JID)
+    receive(player, RELAY_JID, shared(1, 5))
+    receive(player, SERVER_JID, update(1, 1))
+    assert player.cache_state() == {"world": {"tick": 1}, "shared": {"tick": 5}}
+
+
+def test_update_only_takes_the_section_of_its_round():
+    player = RelayedPlayer("p@localhost", "password", SERVER_JID)
+    receive(player, RELAY_JID, shared(1, 1))
+    receive(player, RELAY_JID, shared(3, 3))
+    # the section of round 2 is missing: round 3 does not stand in for it
+    assert receive(player, SERVER_JID, update(2, 2)) == "shared"
+    assert player.shared_state is None
+    # nor does round 1 serve a later update
+    assert receive(player, SERVER_JID, update(3, 3)) == "update"
+    assert player.shared_state == {"tick": 3}
+    assert receive(player, RELAY_JID, shared(1, 1)) == "shared"
+    assert player.shared_state == {"tick": 3}
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from spade_game import Server, Player, LocalTransport
+
+SERVER_JID = "server@localhost"
+
+
+class CountingServer(Server):
+    # the game ends after a number of steps counted on the server itself
+    steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+        for player in self.world_model["players"]:
+            if player["action"] is not None:
+                player["total"] += player["action"]["move"]
+
+    def end_condition(self) -> bool:
+        return self.steps >= 5
+
+    def step_context(self) -> dict:
+        context = super().step_context()
+        context["steps"] = self.steps
+        return context
+
+
+class MovePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 1}
+
+
+async def play(step_mode: str) -> CountingServer:
+    transport = LocalTransport()
+    server = CountingServer(
+        SERVER_JID,
+        "password",
+        1,
+        {},
+        {"name": None, "total": 0},
+        ["move"],
+        frequency=50,
+    )
+    server.step_mode = step_mode
+    player = MovePlayer("p@localhost", "password", SERVER_JID, {"name": "p"})
+    await server.start(transport=transport)
+    await player.start(transport=transport)
+    try:
+        for _ in range(300):
+            if not server.is_alive():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for agent in (player, server):
+            if agent.is_alive():
+                await agent.stop()
+    return server
+
+
+@pytest.mark.parametrize("step_mode", ["inline", "thread", "process"])
+def test_step_attributes_reach_the_server(step_mode):
+    server = asyncio.run(play(step_mode))
+    assert not server.is_alive()
+    assert server.steps == 5
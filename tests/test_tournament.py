@@ -0,0 +1,123 @@
+import random
+from functools import partial
+
+from spade_game import Server, TurnBasedServer, Player, Tournament, play_game
+
+SERVER_JID = "server@localhost"
+PLAYER_JIDS = ["p{}@localhost".format(i) for i in range(8)]
+
+
+class LogServer(Server):
+    # logs the last player to act before each step
+    clock_mode = "virtual"
+
+    def __init__(self) -> None:
+        super().__init__(SERVER_JID, "password", len(PLAYER_JIDS), {}, {}, ["move"])
+        self.world_model["log"] = []
+
+    def step(self) -> None:
+        self.world_model["log"].append(self.world_model["_last_action_player"])
+
+    def end_condition(self) -> bool:
+        return len(self.world_model["log"]) >= 3
+
+    def game_result(self) -> list:
+        return self.world_model["log"]
+
+
+class MovePlayer(Player):
+    def decide_action(self) -> dict:
+        return {"move": 1}
+
+
+def test_players_act_in_connection_order():
+    players = [
+        (lambda player_jid=player_jid: MovePlayer(player_jid, "password", SERVER_JID))
+        for player_jid in PLAYER_JIDS
+    ]
+    result = play_game(LogServer, players, (0, 1))
+    assert result.error is None
+    assert result.result == [PLAYER_JIDS[-1]] * 3
+
+
+class NimServer(TurnBasedServer):
+    # players take 1 to 3 stones from a shared pile; who takes the last wins
+    event_driven_turns = True
+
+    def __init__(self) -> None:
+        super().__init__(SERVER_JID, "password", 2, {}, {}, frequency=10)
+        self.world_model["pile"] = 10
+        self.winner = None
+
+    def step(self) -> None:
+        self.world_model["pile"] -= self.world_model["_last_action_performed"]
+        if self.world_model["pile"] == 0:
+            self.winner = self.world_model["_last_action_player"]
+
+    def shared_state(self) -> dict:
+        return {"pile": self.world_model["pile"]}
+
+    def end_condition(self) -> bool:
+        return self.world_model["pile"] == 0
+
+    def game_result(self) -> str:
+        return self.winner
+
+    def _is_action_valid(self, content: int) -> bool:
+        return 1 <= content <= min(3, self.world_model["pile"])
+
+
+class NimPlayer(Player):
+    def decide_action(self) -> int:
+        # the pile is only in the shared section
+        return random.randint(1, min(3, self.shared_state["pile"]))
+
+
+def nim_players() -> list:
+    return [
+        partial(NimPlayer, player_jid, "password", SERVER_JID)
+        for player_jid in PLAYER_JIDS[:2]
+    ]
+
+
+def test_players_get_the_shared_section():
+    result = play_game(NimServer, nim_players(), (0, 7))
+    assert result.error is None
+    assert result.result in PLAYER_JIDS[:2]
+    assert result.steps >= 4
+
+
+def test_tournament_replays_from_its_seed():
+    reports = [
+        Tournament(NimServer, nim_players(), games=20, workers=0, seed=3).run()
+        for _ in range(2)
+    ]
+    results = [[game.result for game in report.results] for report in reports]
+    assert results[0] == results[1]
+    summary = reports[0].summary()
+    assert summary["games"] == 20
+    assert summary["errors"] == 0
+
+
+def test_process_pool_plays_the_same_games():
+    pooled = Tournament(NimServer, nim_players(), games=8, workers=2, seed=5).run()
+    local = Tournament(NimServer, nim_players(), games=8, workers=0, seed=5).run()
+    assert [game.index for game in pooled.results] == list(range(8))
+    assert [game.result for game in pooled.results] == [
+        game.result for game in local.results
+    ]
+
+
+class BrokenServer(NimServer):
+    def step(self) -> None:
+        super().step()
+        if self.world_model["pile"] < 5:
+            raise RuntimeError("broken rules")
+
+
+def test_failing_games_are_reported():
+    report = Tournament(BrokenServer, nim_players(), games=3, workers=0).run()
+    assert all(game.error == "RuntimeError: broken rules" for game in report.results)
+    summary = report.summary()
+    assert summary["errors"] == 3
+    assert summary["outcomes"] == {}
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+
+from spade_game import GameAgent, LocalTransport
+from spade_game.exceptions import AgentAlreadyAttachedError, UnknownRecipientError
+
+
+class Receive(CyclicBehaviour):
+    async def run(self):
+        msg = await self.receive(timeout=1)
+        if msg is not None:
+            self.agent.received.append(msg.body)
+
+
+class EchoAgent(GameAgent):
+    async def setup(self):
+        self.received = []
+        self.add_behaviour(Receive())
+
+
+async def exchange() -> tuple:
+    transport = LocalTransport()
+    a = EchoAgent("a@localhost", "password")
+    b = EchoAgent("b@localhost", "password")
+    await a.start(transport=transport)
+    await b.start(transport=transport)
+    try:
+        assert "a@localhost" in transport and "b@localhost" in transport
+        behaviour = next(iter(a.behaviours))
+        await a.send_message(behaviour, Message(to="b@localhost", body="hello"))
+        with pytest.raises(UnknownRecipientError):
+            await a.send_message(behaviour, Message(to="c@localhost", body="lost"))
+        for _ in range(100):
+            if b.received:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await a.stop()
+        await b.stop()
+    return transport, b
+
+
+def test_messages_go_straight_to_the_recipient():
+    transport, b = asyncio.run(exchange())
+    assert b.received == ["hello"]
+    # stopped agents leave the transport
+    assert "a@localhost" not in transport and not b.is_alive()
+
+
+async def attach_twice() -> None:
+    transport = LocalTransport()
+    first = EchoAgent("a@localhost", "password")
+    await first.start(transport=transport)
+    try:
+        with pytest.raises(AgentAlreadyAttachedError):
+            await EchoAgent("a@localhost", "password").start(transport=transport)
+    finally:
+        await first.stop()
+
+
+def test_a_jid_is_attached_once():
+    asyncio.run(attach_twice())
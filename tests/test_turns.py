@@ -0,0 +1,62 @@
+from spade_game import TurnBasedServer
+
+PLAYER_JIDS = ("a@localhost", "b@localhost")
+
+
+class SumServer(TurnBasedServer):
+    # each action adds to the total
+    event_driven_turns = True
+    clock_mode = "virtual"
+    turn_timeout = 1.0
+
+    def __init__(self) -> None:
+        super().__init__("server@localhost", "password", 2, {}, {}, frequency=10)
+        self.world_model["total"] = 0
+
+    def step(self) -> None:
+        self.world_model["total"] += self.world_model["_last_action_performed"]
+
+    def end_condition(self) -> bool:
+        return False
+
+
+def start_game() -> SumServer:
+    server = SumServer()
+    for player_jid in PLAYER_JIDS:
+        server._process_connection(player_jid, {})
+    server.run_steps_init()
+    return server
+
+
+def test_turn_ends_with_action():
+    server = start_game()
+    player_jid = server._current_player_jid
+    assert not server.inputs_ready()
+
+    server._process_action(player_jid, 1)
+    assert server.inputs_ready()
+    server._run_step()
+    assert server.world_model["total"] == 1
+    assert server._current_player_jid != player_jid
+    assert not server.inputs_ready()
+
+
+def test_timed_out_turn_does_not_repeat_last_action():
+    server = start_game()
+    first_jid = server._current_player_jid
+    server._process_action(first_jid, 1)
+    server._run_step()
+
+    # the other player times out and the turn goes back to the first one
+    server.clock.advance(SumServer.turn_timeout)
+    assert server.skip_step()
+    assert server._current_player_jid == first_jid
+    assert server.skipped_turns == 1
+
+    # its action of the previous turn is not applied again
+    assert not server.inputs_ready()
+    assert not server.step_condition()
+    server._process_action(first_jid, 2)
+    assert server.step_condition()
+    server._run_step()
+    assert server.world_model["total"] == 3